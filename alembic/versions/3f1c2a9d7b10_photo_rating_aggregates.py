@@ -0,0 +1,49 @@
+"""photo rating aggregates
+
+Revision ID: 3f1c2a9d7b10
+Revises: 195bcba1d037
+Create Date: 2026-10-19 09:12:04.118230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9d7b10'
+down_revision: Union[str, None] = '195bcba1d037'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('photos', sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('photos', sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_index(op.f('ix_photos_rating'), 'photos', ['rating'], unique=False)
+    op.add_column('opinions', sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True))
+    op.add_column('opinions', sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True))
+    op.create_index(op.f('ix_opinions_photo_id'), 'opinions', ['photo_id'], unique=False)
+    # keep only the latest vote of every user before enforcing one vote per photo
+    op.execute(
+        "DELETE FROM opinions o USING opinions newer "
+        "WHERE o.user_id = newer.user_id AND o.photo_id = newer.photo_id AND o.id < newer.id"
+    )
+    op.create_unique_constraint('uq_opinions_user_photo', 'opinions', ['user_id', 'photo_id'])
+    op.execute(
+        "UPDATE photos SET rating_sum = agg.rating_sum, rating_count = agg.rating_count, "
+        "rating = agg.rating_sum::float / agg.rating_count "
+        "FROM (SELECT photo_id, SUM(vote) AS rating_sum, COUNT(*) AS rating_count "
+        "FROM opinions GROUP BY photo_id) AS agg WHERE photos.id = agg.photo_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_opinions_user_photo', 'opinions', type_='unique')
+    op.drop_index(op.f('ix_opinions_photo_id'), table_name='opinions')
+    op.drop_column('opinions', 'updated_at')
+    op.drop_column('opinions', 'created_at')
+    op.drop_index(op.f('ix_photos_rating'), table_name='photos')
+    op.drop_column('photos', 'rating_count')
+    op.drop_column('photos', 'rating_sum')
@@ -0,0 +1,37 @@
+"""user activity counters
+
+Revision ID: 8a4e6d21c5f3
+Revises: 3f1c2a9d7b10
+Create Date: 2026-10-19 10:41:37.502114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4e6d21c5f3'
+down_revision: Union[str, None] = '3f1c2a9d7b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('photo_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('votes_received', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE users SET "
+        "photo_count = (SELECT COUNT(*) FROM photos WHERE photos.user_id = users.id), "
+        "comment_count = (SELECT COUNT(*) FROM comments WHERE comments.user_id = users.id), "
+        "votes_received = (SELECT COUNT(*) FROM opinions JOIN photos ON photos.id = opinions.photo_id "
+        "WHERE photos.user_id = users.id)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'votes_received')
+    op.drop_column('users', 'comment_count')
+    op.drop_column('users', 'photo_count')
@@ -0,0 +1,41 @@
+"""follows
+
+Revision ID: 8d4a61f0b2c5
+Revises: 5b2e9f4c1d73
+Create Date: 2026-10-19 18:02:41.771930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d4a61f0b2c5'
+down_revision: Union[str, None] = '5b2e9f4c1d73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('follows',
+    sa.Column('follower_id', sa.Integer(), nullable=False),
+    sa.Column('followee_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['followee_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['follower_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('follower_id', 'followee_id')
+    )
+    op.create_index('ix_follows_followee_id', 'follows', ['followee_id'], unique=False)
+    op.add_column('users', sa.Column('follower_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('following_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_photos_user_id_id', 'photos', ['user_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_photos_user_id_id', table_name='photos')
+    op.drop_column('users', 'following_count')
+    op.drop_column('users', 'follower_count')
+    op.drop_index('ix_follows_followee_id', table_name='follows')
+    op.drop_table('follows')
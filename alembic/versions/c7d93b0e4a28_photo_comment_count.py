@@ -0,0 +1,36 @@
+"""photo comment count
+
+Revision ID: c7d93b0e4a28
+Revises: 8a4e6d21c5f3
+Create Date: 2026-10-19 11:58:20.841377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d93b0e4a28'
+down_revision: Union[str, None] = '8a4e6d21c5f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('photos', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE photos SET comment_count = "
+        "(SELECT COUNT(*) FROM comments WHERE comments.photo_id = photos.id)"
+    )
+    op.create_index('ix_comments_photo_id_created_at_id', 'comments', ['photo_id', 'created_at', 'id'], unique=False)
+    op.drop_constraint('comments_photo_id_fkey', 'comments', type_='foreignkey')
+    op.create_foreign_key('comments_photo_id_fkey', 'comments', 'photos', ['photo_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    op.drop_constraint('comments_photo_id_fkey', 'comments', type_='foreignkey')
+    op.create_foreign_key('comments_photo_id_fkey', 'comments', 'photos', ['photo_id'], ['id'])
+    op.drop_index('ix_comments_photo_id_created_at_id', table_name='comments')
+    op.drop_column('photos', 'comment_count')
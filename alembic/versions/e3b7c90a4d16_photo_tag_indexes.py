@@ -0,0 +1,28 @@
+"""photo tag indexes
+
+Revision ID: e3b7c90a4d16
+Revises: 8d4a61f0b2c5
+Create Date: 2026-10-19 19:24:08.316254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b7c90a4d16'
+down_revision: Union[str, None] = '8d4a61f0b2c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_photo_tag_tag_id_photo_id', 'photo_tag', ['tag_id', 'photo_id'], unique=False)
+    op.create_index('ix_photo_tag_photo_id_tag_id', 'photo_tag', ['photo_id', 'tag_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_photo_tag_photo_id_tag_id', table_name='photo_tag')
+    op.drop_index('ix_photo_tag_tag_id_photo_id', table_name='photo_tag')
@@ -0,0 +1,43 @@
+from fastapi_app.benchmarks import datagen
+from fastapi_app.src.repository.search_filter import get_description, get_tag
+from fastapi_app.src.repository.tags import create_tags
+from fastapi_app.src.repository.users import get_profile
+from fastapi_app.src.services.photo_service import PhotoService
+
+
+def test_create_tags_existing(bench, db):
+    names = [datagen.word(rank) for rank in range(5)]
+
+    tags = bench(create_tags, names, db)
+
+    assert [tag.name for tag in tags] == names
+
+
+def test_get_tag_popular(bench, db):
+    photos = bench(get_tag, db, datagen.word(0))
+
+    assert photos
+
+
+def test_get_tag_rare(bench, db):
+    photos = bench(get_tag, db, datagen.word(400))
+
+    assert isinstance(photos, list)
+
+
+def test_get_description(bench, db):
+    photos = bench(get_description, db, datagen.word(0))
+
+    assert photos
+
+
+def test_photo_service_get(bench, db):
+    photo = bench(PhotoService.get, db, 1000)
+
+    assert photo.id == 1000
+
+
+def test_get_profile(bench, db):
+    profile = bench(get_profile, f"{datagen.USER_PREFIX}0", db)
+
+    assert profile["username"] == f"{datagen.USER_PREFIX}0"
@@ -0,0 +1,36 @@
+import asyncio
+from typing import List
+
+import pytest
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from redis.exceptions import RedisError
+from sqlalchemy.orm import selectinload
+
+from fastapi_app.benchmarks import datagen
+from fastapi_app.src.database.models import Photo
+from fastapi_app.src.schemas import TagSearch
+from fastapi_app.src.services.auth import auth_service
+
+
+def test_get_current_user_cached(bench, db):
+    try:
+        auth_service.r.ping()
+    except RedisError:
+        pytest.skip("Redis is not available")
+    email = f"{datagen.USER_PREFIX}1@example.com"
+    token = asyncio.run(auth_service.create_access_token(data={"sub": email}))
+
+    user = bench(auth_service.get_current_user, token, db)
+
+    assert user.email == email
+
+
+@pytest.mark.parametrize("size", [100, 1000])
+def test_serialize_tag_search(bench, db, size):
+    photos = db.query(Photo).options(selectinload(Photo.tags)).order_by(Photo.id).limit(size).all()
+    field = create_response_field(name="response", type_=List[TagSearch])
+
+    content = bench(serialize_response, field=field, response_content=photos)
+
+    assert len(content) == size
@@ -0,0 +1,196 @@
+"""
+Fixtures of the microbenchmarks.
+
+The benchmarks run against a SQLite database seeded by :mod:`fastapi_app.benchmarks.datagen` and,
+when ``BENCHMARK_POSTGRES_URL`` is set, against that PostgreSQL database too. Its tables are
+emptied and reseeded, so never point it at a database holding real data.
+
+The median time per call is compared with ``baselines.json``: a benchmark fails when it is slower
+than its baseline by more than the tolerance. A benchmark without a baseline is not checked: it
+warns, or fails with ``--bench-strict``. Baselines depend on the machine, record them on the
+machine running the gate with ``--bench-save``.
+"""
+import asyncio
+import inspect
+import json
+import os
+import platform
+import statistics
+import time
+import warnings
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from fastapi_app.benchmarks import datagen
+from fastapi_app.src.database.models import Base
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+DATASET = {"users": 200, "photos": 2000, "tags": 500, "seed": 7}
+MIN_ROUND_SECONDS = 0.001
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("microbenchmarks")
+    group.addoption("--bench-tolerance", type=float, default=float(os.getenv("BENCH_TOLERANCE", 0.25)),
+                    help="allowed slowdown of the median against the baseline, 0.25 means 25%%")
+    group.addoption("--bench-rounds", type=int, default=30, help="measured rounds per benchmark")
+    group.addoption("--bench-save", action="store_true", help="record the results as the new baselines")
+    group.addoption("--bench-baselines", default=BASELINES_PATH, help="baseline file")
+    group.addoption("--bench-strict", action="store_true",
+                    help="fail the benchmarks without a baseline instead of warning, for the gate")
+
+
+def pytest_configure(config):
+    config.bench_results = {}
+    try:
+        with open(config.getoption("--bench-baselines")) as file:
+            config.bench_baselines = json.load(file)["results"]
+    except (OSError, KeyError, ValueError):
+        config.bench_baselines = {}
+
+
+def pytest_sessionfinish(session, exitstatus):
+    config = session.config
+    if not config.getoption("--bench-save") or not config.bench_results:
+        return
+    baselines = dict(config.bench_baselines, **config.bench_results)
+    with open(config.getoption("--bench-baselines"), "w") as file:
+        json.dump({"machine": {"python": platform.python_version(), "platform": platform.platform(),
+                               "processor": platform.processor()},
+                   "results": dict(sorted(baselines.items()))}, file, indent=2)
+        file.write("\n")
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    if not config.bench_results:
+        return
+    terminalreporter.section("microbenchmarks")
+    terminalreporter.write_line(f"{'benchmark':<60}{'median us':>12}{'baseline us':>14}{'change':>9}")
+    for name, result in sorted(config.bench_results.items()):
+        baseline = config.bench_baselines.get(name)
+        if baseline:
+            reference = f"{baseline['median_us']:>14.1f}"
+            change = f"{(result['median_us'] / baseline['median_us'] - 1) * 100:>+8.1f}%"
+        else:
+            reference, change = f"{'-':>14}", f"{'new':>9}"
+        terminalreporter.write_line(f"{name:<60}{result['median_us']:>12.1f}{reference}{change}")
+    missing = [name for name in config.bench_results if name not in config.bench_baselines]
+    if missing and not config.getoption("--bench-save"):
+        terminalreporter.write_line(f"{len(missing)} of {len(config.bench_results)} benchmarks have no baseline "
+                                    f"and were not checked for regressions, record them with --bench-save",
+                                    yellow=True, bold=True)
+
+
+class Bench:
+    """
+    Measures a function and checks the result against its baseline.
+
+    Each round calls the function enough times to last at least a millisecond, so the timer
+    resolution does not matter; the median over the rounds is robust against scheduler noise.
+    Coroutine functions are run to completion on a private event loop.
+
+    :param name: The name of the benchmark in the baselines.
+    :type name: str
+    :param rounds: Number of measured rounds.
+    :type rounds: int
+    :param baseline: The baseline result, if any.
+    :type baseline: dict | None
+    :param tolerance: Allowed relative slowdown of the median, or None to skip the check.
+    :type tolerance: float | None
+    :param strict: Fails instead of warning when there is no baseline to check against.
+    :type strict: bool
+    """
+
+    def __init__(self, name: str, rounds: int, baseline: dict | None, tolerance: float | None,
+                 strict: bool = False):
+        self.name = name
+        self.rounds = rounds
+        self.baseline = baseline
+        self.tolerance = tolerance
+        self.strict = strict
+        self.result = None
+        self.loop = asyncio.new_event_loop()
+
+    def __call__(self, func, *args, **kwargs):
+        if inspect.iscoroutinefunction(func):
+            def call():
+                return self.loop.run_until_complete(func(*args, **kwargs))
+        else:
+            def call():
+                return func(*args, **kwargs)
+
+        value = call()
+        iterations = 1
+        while self._round(call, iterations) < MIN_ROUND_SECONDS:
+            iterations *= 2
+        timings = [self._round(call, iterations) / iterations for _ in range(self.rounds)]
+        self.result = {
+            "median_us": round(statistics.median(timings) * 1e6, 3),
+            "mean_us": round(statistics.fmean(timings) * 1e6, 3),
+            "min_us": round(min(timings) * 1e6, 3),
+            "stdev_us": round(statistics.stdev(timings) * 1e6, 3) if len(timings) > 1 else 0.0,
+            "rounds": self.rounds,
+            "iterations": iterations,
+        }
+        if not self.baseline and self.tolerance is not None:
+            message = f"{self.name} has no baseline, it is not checked for regressions; record one with --bench-save"
+            if self.strict:
+                pytest.fail(message)
+            warnings.warn(pytest.PytestWarning(message))
+        if self.baseline and self.tolerance is not None:
+            limit = self.baseline["median_us"] * (1 + self.tolerance)
+            if self.result["median_us"] > limit:
+                pytest.fail(f"{self.name} regressed: median {self.result['median_us']:.1f} us, "
+                            f"baseline {self.baseline['median_us']:.1f} us, limit {limit:.1f} us")
+        return value
+
+    @staticmethod
+    def _round(call, iterations: int) -> float:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            call()
+        return time.perf_counter() - start
+
+    def close(self) -> None:
+        self.loop.close()
+
+
+@pytest.fixture
+def bench(request):
+    config = request.config
+    name = request.node.nodeid
+    tolerance = None if config.getoption("--bench-save") else config.getoption("--bench-tolerance")
+    bench = Bench(name, config.getoption("--bench-rounds"), config.bench_baselines.get(name), tolerance,
+                  config.getoption("--bench-strict"))
+    yield bench
+    bench.close()
+    if bench.result is not None:
+        config.bench_results[name] = bench.result
+
+
+@pytest.fixture(scope="session", params=["sqlite", "postgresql"])
+def engine(request, tmp_path_factory):
+    if request.param == "sqlite":
+        url = f"sqlite:///{tmp_path_factory.mktemp('bench') / 'bench.db'}"
+    else:
+        url = os.getenv("BENCHMARK_POSTGRES_URL")
+        if not url:
+            pytest.skip("BENCHMARK_POSTGRES_URL is not set")
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    datagen.reset(engine)
+    datagen.load(engine, datagen.generate(**DATASET))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
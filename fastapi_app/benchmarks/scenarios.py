@@ -0,0 +1,98 @@
+"""
+Scripted user actions driven by the load generator.
+
+Every scenario sends one API request as a virtual user and returns the response. The inputs are
+drawn from the dataset manifest written by :mod:`fastapi_app.benchmarks.datagen`, with the same
+Zipf skew as the data, so popular tags and words are searched most often.
+"""
+import random
+
+import httpx
+
+from fastapi_app.benchmarks.datagen import Zipf
+
+# a tiny JPEG, the API stores uploads as they are
+PHOTO = bytes.fromhex("ffd8ffe000104a46494600010100000100010000ffd9")
+
+
+class VirtualUser:
+    """
+    State of one simulated user: its credentials, token and random inputs.
+
+    :param index: Index of the user in the dataset.
+    :type index: int
+    :param manifest: The dataset manifest.
+    :type manifest: dict
+    :param rng: The random number generator of the user.
+    :type rng: random.Random
+    """
+
+    def __init__(self, index: int, manifest: dict, rng: random.Random):
+        self.username = f"{manifest['user_prefix']}{index}"
+        self.password = manifest["password"]
+        self.manifest = manifest
+        self.rng = rng
+        self.token = None
+        self.tags = Zipf(len(manifest["tags"]), manifest["zipf_s"], rng)
+        self.words = Zipf(len(manifest["words"]), manifest["zipf_s"], rng)
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
+    def tag(self) -> str:
+        return self.manifest["tags"][self.tags.sample()]
+
+    def word(self) -> str:
+        return self.manifest["words"][self.words.sample()]
+
+    def photo_id(self) -> int:
+        return self.rng.randint(1, self.manifest["counts"]["photos"])
+
+    def other_username(self) -> str:
+        return f"{self.manifest['user_prefix']}{self.rng.randrange(self.manifest['counts']['users'])}"
+
+
+async def login(client: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+    response = await client.post("/api/auth/login", data={"username": user.username, "password": user.password})
+    if response.status_code == 200:
+        user.token = response.json()["access_token"]
+    return response
+
+
+async def upload(client: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+    tags = dict.fromkeys((user.tag(), user.tag()))
+    params = {"description": " ".join(user.word() for _ in range(5)), "tags": " ".join(tags)}
+    return await client.post("/api/photos/photos/", params=params, headers=user.headers,
+                             files={"file": ("bench.jpg", PHOTO, "image/jpeg")})
+
+
+async def tag_search(client: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+    return await client.get(f"/api/search_filter/photos/search/tag/{user.tag()}")
+
+
+async def description_search(client: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+    return await client.get(f"/api/search_filter/photos/search/{user.word()}")
+
+
+async def profile_view(client: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+    return await client.get(f"/api/users/{user.other_username()}")
+
+
+async def comment(client: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+    content = " ".join(user.word() for _ in range(user.rng.randint(2, 12)))
+    return await client.post(f"/api/comments/photos/{user.photo_id()}/comments/", json={"content": content},
+                             headers=user.headers)
+
+
+SCENARIOS = {
+    "login": login,
+    "upload": upload,
+    "tag_search": tag_search,
+    "description_search": description_search,
+    "profile_view": profile_view,
+    "comment": comment,
+}
+
+# default traffic mix, read heavy like the production traffic
+DEFAULT_MIX = {"login": 1, "upload": 2, "tag_search": 35, "description_search": 25, "profile_view": 27, "comment": 10}
@@ -0,0 +1,61 @@
+"""
+Compares two load test results written by :mod:`fastapi_app.benchmarks.loadgen`. Usage::
+
+    python -m fastapi_app.benchmarks.compare benchmarks/results/before.json benchmarks/results/after.json
+"""
+import argparse
+import json
+
+
+def change(before: float, after: float) -> str:
+    """
+    Formats the relative change between two values.
+
+    :param before: The baseline value.
+    :type before: float
+    :param after: The new value.
+    :type after: float
+    :return: The change in percent, e.g. ``+12.5%``.
+    :rtype: str
+    """
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def compare(before: dict, after: dict) -> list[str]:
+    """
+    Builds a table of throughput and latency changes per scenario.
+
+    :param before: The baseline result.
+    :type before: dict
+    :param after: The new result.
+    :type after: dict
+    :return: The lines of the table.
+    :rtype: list[str]
+    """
+    lines = [f"{'scenario':<20}{'rps':>26}{'p50 ms':>26}{'p95 ms':>26}{'p99 ms':>26}"]
+    rows = [("total", before["totals"], after["totals"])]
+    rows += [(name, before["scenarios"][name], after["scenarios"][name])
+             for name in after["scenarios"] if name in before["scenarios"]]
+    for name, old, new in rows:
+        cells = [f"{old['throughput_rps']:>8.1f} {new['throughput_rps']:>6.1f} {change(old['throughput_rps'], new['throughput_rps']):>6}"]
+        if "latency_ms" in new:
+            for key in ("p50", "p95", "p99"):
+                old_value, new_value = old["latency_ms"][key], new["latency_ms"][key]
+                cells.append(f"{old_value:>9.1f} {new_value:>8.1f} {change(old_value, new_value):>7}")
+        lines.append(f"{name:<20}" + "".join(f"{cell:>26}" for cell in cells))
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two load test results.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+    with open(args.before) as before, open(args.after) as after:
+        print("\n".join(compare(json.load(before), json.load(after))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+Synthetic dataset generator for the benchmarks.
+
+Generates users, photos, tags, comments and opinions with a fixed seed, so every run loads the
+same data. Tag and description word popularity follow a Zipf law, as do the photo owners: a few
+tags and users account for most of the rows, which is what makes real search and profile
+queries skewed. On PostgreSQL the rows are bulk loaded with ``COPY``, on other databases with
+``executemany`` inserts. Usage::
+
+    python -m fastapi_app.benchmarks.datagen --users 1000 --photos 20000 --reset
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from passlib.context import CryptContext
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.engine import Engine
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.models import Base, Comment, Opinion, Photo, Tag, User, photo_tag_table
+
+SYLLABLES = ("ka", "lo", "mi", "ne", "ru", "sa", "te", "vi", "zo", "pa", "de", "gu", "ho", "ji", "ba", "fe")
+USER_PREFIX = "bench_user_"
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset.json")
+# Same hashing as the auth service, which can't be imported on its own: it and the user repository import each other.
+PASSWORD_CONTEXT = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# column order of the generated rows, also used as the COPY column lists
+COLUMNS = {
+    User.__table__: ("id", "username", "email", "password", "role", "crated_at", "confirmed",
+                     "photo_count", "comment_count", "votes_received"),
+    Tag.__table__: ("id", "name", "user_id"),
+    Photo.__table__: ("id", "user_id", "url", "description", "created_at", "rating", "rating_sum",
+                      "rating_count", "comment_count"),
+    photo_tag_table: ("photo_id", "tag_id"),
+    Comment.__table__: ("id", "photo_id", "user_id", "content", "created_at", "updated_at"),
+    Opinion.__table__: ("id", "vote", "user_id", "photo_id", "created_at", "updated_at"),
+}
+
+
+def word(index: int) -> str:
+    """
+    Returns a unique pronounceable pseudo-word for an index.
+
+    :param index: The index of the word.
+    :type index: int
+    :return: The word.
+    :rtype: str
+    """
+    syllables = []
+    index += len(SYLLABLES)
+    while index:
+        index, rest = divmod(index, len(SYLLABLES))
+        syllables.append(SYLLABLES[rest])
+    return "".join(reversed(syllables))
+
+
+class Zipf:
+    """
+    Samples ranks ``0..n-1`` with probabilities proportional to ``1 / (rank + 1) ** s``.
+
+    :param n: Number of ranks.
+    :type n: int
+    :param s: Exponent of the distribution, higher values concentrate the samples on the first ranks.
+    :type s: float
+    :param rng: The random number generator.
+    :type rng: random.Random
+    """
+
+    def __init__(self, n: int, s: float, rng: random.Random):
+        self.rng = rng
+        self.cum_weights = list(accumulate(1 / (rank + 1) ** s for rank in range(n)))
+
+    def sample(self) -> int:
+        """
+        Draws one rank.
+
+        :return: The rank, 0 being the most frequent.
+        :rtype: int
+        """
+        return bisect_left(self.cum_weights, self.rng.random() * self.cum_weights[-1])
+
+    def distinct(self, k: int) -> list[int]:
+        """
+        Draws up to ``k`` distinct ranks.
+
+        :param k: Number of draws.
+        :type k: int
+        :return: The distinct ranks.
+        :rtype: list[int]
+        """
+        return list(dict.fromkeys(self.sample() for _ in range(k)))
+
+
+def generate(users: int, photos: int, tags: int, vocabulary: int = 2000, comments_per_photo: float = 3,
+             opinions_per_photo: float = 5, zipf_s: float = 1.1, days: int = 90, seed: int = 42,
+             password: str = "Benchmark!1") -> dict:
+    """
+    Generates the rows of the dataset.
+
+    The denormalized counters and rating aggregates are calculated from the generated rows, so the
+    dataset is consistent with what the API would have written.
+
+    :param users: Number of users; the first one is an admin.
+    :type users: int
+    :param photos: Number of photos.
+    :type photos: int
+    :param tags: Number of distinct tags.
+    :type tags: int
+    :param vocabulary: Number of distinct description words.
+    :type vocabulary: int
+    :param comments_per_photo: Mean number of comments per photo.
+    :type comments_per_photo: float
+    :param opinions_per_photo: Mean number of votes per photo.
+    :type opinions_per_photo: float
+    :param zipf_s: Exponent of the Zipf distributions.
+    :type zipf_s: float
+    :param days: The rows are created over this many past days.
+    :type days: int
+    :param seed: Seed of the random number generator.
+    :type seed: int
+    :param password: Password of all users.
+    :type password: str
+    :return: Lists of rows by table, in the order of ``COLUMNS``.
+    :rtype: dict
+    """
+    rng = random.Random(seed)
+    tag_ranks = Zipf(tags, zipf_s, rng)
+    word_ranks = Zipf(vocabulary, zipf_s, rng)
+    owner_ranks = Zipf(users, zipf_s, rng)
+    end = datetime.utcnow()
+    start = end - timedelta(days=days)
+
+    def moment(after: datetime = start) -> datetime:
+        return after + (end - after) * rng.random()
+
+    hashed = PASSWORD_CONTEXT.hash(password)
+    user_stats = [[0, 0, 0] for _ in range(users)]  # photo_count, comment_count, votes_received
+    tag_rows = [(rank + 1, word(rank), 1) for rank in range(tags)]
+    photo_rows, photo_tag_rows, comment_rows, opinion_rows = [], [], [], []
+
+    for photo_id in range(1, photos + 1):
+        owner = owner_ranks.sample()
+        created = moment()
+        description = " ".join(word(rank) for rank in word_ranks.distinct(rng.randint(3, 8)))
+        photo_tag_rows.extend((photo_id, rank + 1) for rank in tag_ranks.distinct(rng.randint(1, 5)))
+        user_stats[owner][0] += 1
+
+        voters = rng.sample(range(users), min(rng.randint(0, int(2 * opinions_per_photo)), users))
+        votes = []
+        for voter in voters:
+            if voter == owner:
+                continue
+            vote = rng.choices((1, 2, 3, 4, 5), weights=(1, 1, 3, 5, 4))[0]
+            voted = moment(created)
+            votes.append(vote)
+            opinion_rows.append((len(opinion_rows) + 1, vote, voter + 1, photo_id, voted, voted))
+        user_stats[owner][2] += len(votes)
+
+        comment_count = rng.randint(0, int(2 * comments_per_photo))
+        for _ in range(comment_count):
+            author = rng.randrange(users)
+            commented = moment(created)
+            content = " ".join(word(rank) for rank in word_ranks.distinct(rng.randint(2, 12)))
+            comment_rows.append((len(comment_rows) + 1, photo_id, author + 1, content, commented, commented))
+            user_stats[author][1] += 1
+
+        rating = sum(votes) / len(votes) if votes else 0.0
+        photo_rows.append((photo_id, owner + 1, f"uploads/bench/{photo_id}.jpg", description, created, rating,
+                           sum(votes), len(votes), comment_count))
+
+    user_rows = [
+        (index + 1, f"{USER_PREFIX}{index}", f"{USER_PREFIX}{index}@example.com", hashed,
+         "admin" if index == 0 else "user", start, True, *user_stats[index])
+        for index in range(users)
+    ]
+    return {
+        User.__table__: user_rows,
+        Tag.__table__: tag_rows,
+        Photo.__table__: photo_rows,
+        photo_tag_table: photo_tag_rows,
+        Comment.__table__: comment_rows,
+        Opinion.__table__: opinion_rows,
+    }
+
+
+def reset(engine: Engine) -> None:
+    """
+    Deletes all rows of the tables filled by the generator.
+
+    :param engine: The database engine.
+    :type engine: Engine
+    """
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            names = ", ".join(table.name for table in COLUMNS)
+            conn.execute(text(f"TRUNCATE {names} RESTART IDENTITY CASCADE"))
+        else:
+            for table in reversed(Base.metadata.sorted_tables):
+                conn.execute(table.delete())
+
+
+def _copy(engine: Engine, dataset: dict) -> None:
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for table, rows in dataset.items():
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {table.name} ({', '.join(COLUMNS[table])}) FROM STDIN WITH (FORMAT csv)", buffer)
+            if "id" in table.c:
+                # the rows carry explicit IDs, move the sequence past them
+                cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                               f"GREATEST((SELECT max(id) FROM {table.name}), 1))")
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _insert(engine: Engine, dataset: dict) -> None:
+    with engine.begin() as conn:
+        for table, rows in dataset.items():
+            if rows:
+                conn.execute(table.insert(), [dict(zip(COLUMNS[table], row)) for row in rows])
+
+
+def load(engine: Engine, dataset: dict) -> None:
+    """
+    Loads a generated dataset into empty tables.
+
+    :param engine: The database engine.
+    :type engine: Engine
+    :param dataset: The rows by table, as returned by :func:`generate`.
+    :type dataset: dict
+    :raises RuntimeError: If the tables already contain users.
+    """
+    with engine.connect() as conn:
+        if conn.execute(select(func.count()).select_from(User.__table__)).scalar():
+            raise RuntimeError("The database is not empty, run with --reset to replace its data")
+    if engine.dialect.name == "postgresql":
+        _copy(engine, dataset)
+    else:
+        _insert(engine, dataset)
+
+
+def manifest(dataset: dict, password: str, seed: int, zipf_s: float, top: int = 1000) -> dict:
+    """
+    Describes a loaded dataset for the load generator.
+
+    :param dataset: The rows by table, as returned by :func:`generate`.
+    :type dataset: dict
+    :param password: Password of all users.
+    :type password: str
+    :param seed: Seed the dataset was generated with.
+    :type seed: int
+    :param zipf_s: Exponent of the Zipf distributions.
+    :type zipf_s: float
+    :param top: Number of tags and description words listed, most frequent first.
+    :type top: int
+    :return: The manifest.
+    :rtype: dict
+    """
+    word_counts = {}
+    for row in dataset[Photo.__table__]:
+        for item in row[3].split():
+            word_counts[item] = word_counts.get(item, 0) + 1
+    return {
+        "seed": seed,
+        "zipf_s": zipf_s,
+        "password": password,
+        "user_prefix": USER_PREFIX,
+        "counts": {table.name: len(rows) for table, rows in dataset.items()},
+        "tags": [row[1] for row in dataset[Tag.__table__][:top]],
+        "words": sorted(word_counts, key=word_counts.get, reverse=True)[:top],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate and bulk load a synthetic benchmark dataset.")
+    parser.add_argument("--database-url", default=settings.sqlalchemy_database_url)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--photos", type=int, default=20000)
+    parser.add_argument("--tags", type=int, default=5000)
+    parser.add_argument("--vocabulary", type=int, default=2000)
+    parser.add_argument("--comments-per-photo", type=float, default=3)
+    parser.add_argument("--opinions-per-photo", type=float, default=5)
+    parser.add_argument("--zipf-s", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", default="Benchmark!1")
+    parser.add_argument("--reset", action="store_true", help="delete the existing rows first")
+    parser.add_argument("--create-tables", action="store_true", help="create missing tables, e.g. on SQLite")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="where to write the dataset manifest")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    if args.create_tables:
+        Base.metadata.create_all(engine)
+    if args.reset:
+        reset(engine)
+    dataset = generate(args.users, args.photos, args.tags, args.vocabulary, args.comments_per_photo,
+                       args.opinions_per_photo, args.zipf_s, seed=args.seed, password=args.password)
+    load(engine, dataset)
+    with open(args.manifest, "w") as file:
+        json.dump(manifest(dataset, args.password, args.seed, args.zipf_s), file, indent=2)
+    print(", ".join(f"{len(rows)} {table.name}" for table, rows in dataset.items()))
+
+
+if __name__ == "__main__":
+    main()
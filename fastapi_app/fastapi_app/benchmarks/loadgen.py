@@ -0,0 +1,254 @@
+"""
+Asynchronous closed-loop load generator.
+
+Each virtual user logs in, then runs scenarios picked by the configured traffic mix back to back
+until the duration ends. Latencies are recorded per scenario after a warm-up period and written
+as JSON, to be compared between runs with :mod:`fastapi_app.benchmarks.compare`. Usage::
+
+    python -m fastapi_app.benchmarks.loadgen --spawn --workers 2 --concurrency 50 --duration 60 \\
+        --output fastapi_app/benchmarks/results/run.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from fastapi_app.benchmarks.datagen import MANIFEST_PATH
+from fastapi_app.benchmarks.scenarios import DEFAULT_MIX, SCENARIOS, VirtualUser
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """
+    Returns a percentile of sorted values by the nearest-rank method.
+
+    :param ordered: The values in ascending order.
+    :type ordered: list[float]
+    :param fraction: The percentile as a fraction, e.g. 0.99.
+    :type fraction: float
+    :return: The percentile, 0 for no values.
+    :rtype: float
+    """
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+class Recorder:
+    """
+    Collects the outcome of every measured scenario run.
+    """
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {name: [] for name in SCENARIOS}
+        self.statuses: dict[str, dict[str, int]] = {name: {} for name in SCENARIOS}
+        self.errors: dict[str, int] = {name: 0 for name in SCENARIOS}
+
+    def record(self, name: str, latency: float, status: str) -> None:
+        self.latencies[name].append(latency)
+        self.statuses[name][status] = self.statuses[name].get(status, 0) + 1
+        if not status.startswith(("2", "3")):
+            self.errors[name] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        """
+        Summarizes the recorded runs.
+
+        :param elapsed: Length of the measured period in seconds.
+        :type elapsed: float
+        :return: Totals and per-scenario throughput, latency percentiles in milliseconds and status counts.
+        :rtype: dict
+        """
+        scenarios = {}
+        for name, latencies in self.latencies.items():
+            if not latencies:
+                continue
+            ordered = sorted(latencies)
+            scenarios[name] = {
+                "requests": len(ordered),
+                "errors": self.errors[name],
+                "throughput_rps": round(len(ordered) / elapsed, 3),
+                "latency_ms": {
+                    "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+                    "p50": round(percentile(ordered, 0.50) * 1000, 3),
+                    "p90": round(percentile(ordered, 0.90) * 1000, 3),
+                    "p95": round(percentile(ordered, 0.95) * 1000, 3),
+                    "p99": round(percentile(ordered, 0.99) * 1000, 3),
+                    "max": round(ordered[-1] * 1000, 3),
+                },
+                "status": self.statuses[name],
+            }
+        requests = sum(item["requests"] for item in scenarios.values())
+        return {
+            "totals": {
+                "requests": requests,
+                "errors": sum(item["errors"] for item in scenarios.values()),
+                "throughput_rps": round(requests / elapsed, 3),
+            },
+            "scenarios": scenarios,
+        }
+
+
+async def virtual_user(client: httpx.AsyncClient, user: VirtualUser, mix: dict, recorder: Recorder,
+                       measure_from: float, deadline: float) -> None:
+    names, weights = list(mix), list(mix.values())
+    await SCENARIOS["login"](client, user)
+    while (now := time.perf_counter()) < deadline:
+        name = user.rng.choices(names, weights)[0]
+        try:
+            status = str((await SCENARIOS[name](client, user)).status_code)
+        except httpx.HTTPError as err:
+            status = type(err).__name__
+        if now >= measure_from:
+            recorder.record(name, time.perf_counter() - now, status)
+
+
+async def run(base_url: str, manifest: dict, concurrency: int, duration: float, warmup: float, mix: dict,
+              seed: int) -> dict:
+    """
+    Runs the load test.
+
+    :param base_url: URL of the tested server.
+    :type base_url: str
+    :param manifest: The dataset manifest.
+    :type manifest: dict
+    :param concurrency: Number of virtual users.
+    :type concurrency: int
+    :param duration: Length of the measured period in seconds.
+    :type duration: float
+    :param warmup: Length of the unmeasured period before it, in seconds.
+    :type warmup: float
+    :param mix: Relative weights of the scenarios.
+    :type mix: dict
+    :param seed: Seed of the random inputs.
+    :type seed: int
+    :return: The summary of the measured period.
+    :rtype: dict
+    """
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        start = time.perf_counter()
+        measure_from, deadline = start + warmup, start + warmup + duration
+        users = [VirtualUser(index % manifest["counts"]["users"], manifest, random.Random(seed + index))
+                 for index in range(concurrency)]
+        await asyncio.gather(*(virtual_user(client, user, mix, recorder, measure_from, deadline) for user in users))
+        elapsed = time.perf_counter() - measure_from
+    return recorder.summary(elapsed)
+
+
+def spawn_server(port: int, workers: int) -> subprocess.Popen:
+    """
+    Starts uvicorn serving the application and waits until it answers.
+
+    :param port: The local port.
+    :type port: int
+    :param workers: Number of uvicorn worker processes.
+    :type workers: int
+    :return: The server process.
+    :rtype: subprocess.Popen
+    :raises RuntimeError: If the server does not answer within 30 seconds.
+    """
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "fastapi_app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=os.path.dirname(APP_DIR),  # where the fastapi_app package is importable, as in the Dockerfile
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        if server.poll() is not None:
+            break
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("The server did not start")
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=APP_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}, expected one of {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a load test against the API and write the results as JSON.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="start a local uvicorn for the run")
+    parser.add_argument("--port", type=int, default=8765, help="port of the spawned server")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes of the spawned server")
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="scenario weights, e.g. tag_search=5,profile_view=3,comment=1")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="result file, printed to stdout if omitted")
+    args = parser.parse_args()
+
+    with open(args.manifest) as file:
+        manifest = json.load(file)
+    server = spawn_server(args.port, args.workers) if args.spawn else None
+    base_url = f"http://127.0.0.1:{args.port}" if server else args.base_url
+    started_at = datetime.now(timezone.utc).isoformat()
+    try:
+        summary = asyncio.run(run(base_url, manifest, args.concurrency, args.duration, args.warmup, args.mix,
+                                  args.seed))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    result = {
+        "meta": {
+            "started_at": started_at,
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "base_url": base_url,
+            "workers": args.workers if server else None,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "mix": args.mix,
+            "seed": args.seed,
+            "dataset": {"seed": manifest["seed"], "counts": manifest["counts"]},
+        },
+        **summary,
+    }
+    output = json.dumps(result, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
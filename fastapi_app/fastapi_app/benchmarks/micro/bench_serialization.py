@@ -0,0 +1,44 @@
+"""
+Serialization of search responses: validation of every row by the response model and encoding with
+the standard library, against the trusted projection encoded with orjson. Divide the size by the
+median to get the throughput in rows per second.
+"""
+import json
+from typing import List
+
+import pytest
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy.orm import selectinload
+
+from fastapi_app.src.database.models import Photo
+from fastapi_app.src.schemas import TagSearch
+from fastapi_app.src.services.serialization import dumps, project
+
+
+@pytest.fixture
+def rows(db, request):
+    size = request.param
+    photos = db.query(Photo).options(selectinload(Photo.tags)).order_by(Photo.id).all()
+    return (photos * (size // len(photos) + 1))[:size]
+
+
+@pytest.mark.parametrize("rows", [1000, 10000], indirect=True)
+def test_serialize_validated(bench, rows):
+    field = create_response_field(name="response", type_=List[TagSearch])
+
+    async def serialize():
+        content = await serialize_response(field=field, response_content=[TagSearch.from_orm(row) for row in rows])
+        return JSONResponse(content).body
+
+    body = bench(serialize)
+
+    assert len(json.loads(body)) == len(rows)
+
+
+@pytest.mark.parametrize("rows", [1000, 10000], indirect=True)
+def test_serialize_projected(bench, rows):
+    body = bench(lambda: dumps(project(rows, TagSearch)))
+
+    assert len(json.loads(body)) == len(rows)
@@ -23,6 +23,69 @@ class Settings(BaseSettings):
         cloudinary_name (str): The Cloudinary cloud name.
         cloudinary_api_key (str): The Cloudinary API key.
         cloudinary_api_secret (str): The Cloudinary API secret.
+        debug (bool): Enables debugging aids, e.g. the X-Query-Count response header.
+        slow_query_ms (float): Statements running at least this many milliseconds are logged as slow queries.
+        leaderboard_size (int): Maximum number of photos kept in every leaderboard.
+        leaderboard_half_life_hours (float): Half-life of the time decay of the trending score.
+        leaderboard_compaction_seconds (int): Interval between compactions of the trending leaderboard.
+        leaderboard_min_score (float): Trending scores that decayed below this value are dropped on compaction.
+        trending_vote_weight (float): Trending score added by a vote.
+        trending_comment_weight (float): Trending score added by a comment.
+        rating_prior_mean (float): Prior mean of the Bayesian average used to rank top rated photos.
+        rating_prior_weight (int): Number of prior votes of the Bayesian average used to rank top rated photos.
+        realtime_max_subscribers (int): Maximum number of realtime subscriptions held by one worker.
+        realtime_max_queue_messages (int): Maximum number of undelivered events kept per subscription.
+        realtime_max_queue_bytes (int): Maximum size in bytes of the undelivered events kept per subscription.
+        realtime_heartbeat_seconds (float): Interval of keep-alive messages sent to idle subscribers.
+        profiler_interval_ms (float): Sampling interval of the on-demand worker profiler.
+        profiler_max_seconds (int): Longest duration of an on-demand worker profile.
+        profiler_request_interval_ms (float): Sampling interval of the profiles of single requests.
+        profile_ttl_seconds (int): How long request profiles are kept in Redis.
+        photo_cache_ttl_seconds (float): Lifetime of cached photos in Redis.
+        cache_negative_ttl_seconds (float): Lifetime of cached lookups of missing rows.
+        cache_l1_ttl_seconds (float): Lifetime of the in-process copies of cached entries.
+        cache_l1_size (int): Maximum number of entries of every in-process cache.
+        cache_early_refresh_beta (float): Eagerness of the probabilistic early refresh, 0 disables it.
+        search_cache_ttl_seconds (int): Lifetime of cached search result pages.
+        search_cache_race_ttl_seconds (int): Lifetime of cached search result pages computed while a write was invalidated.
+        export_batch_size (int): Rows fetched from the server-side cursor per batch of a streamed export.
+        multi_get_max_ids (int): Maximum number of IDs of a batched lookup of photos or users.
+        rate_limit_enabled (bool): Enables the rate limits of the routes.
+        rate_limits (str): The rate limits by name, as comma-separated ``name=requests/seconds`` items.
+        rate_limit_local_size (int): Maximum number of in-process token buckets of every worker.
+        admission_enabled (bool): Enables the admission control of the requests.
+        admission_initial_limit (int): Concurrency limit of a worker when it starts.
+        admission_min_limit (int): Lowest adaptive concurrency limit.
+        admission_max_limit (int): Highest adaptive concurrency limit.
+        admission_latency_tolerance (float): Latency increase, relative to the long-term latency, tolerated before the limit shrinks.
+        admission_queue_size (int): Maximum number of requests waiting for admission in a worker.
+        admission_queue_timeout_ms (float): Longest wait for admission before a request is shed.
+        admission_retry_after_seconds (int): Retry-After of the shed requests.
+        mail_ssl_tls (bool): Connects to the mail server over implicit TLS rather than upgrading with STARTTLS.
+        outbox_batch_size (int): Maximum number of emails the outbox worker claims and sends at once.
+        outbox_poll_seconds (float): Interval between polls of the outbox while it has no due emails.
+        outbox_smtp_connections (int): Maximum number of SMTP connections of the outbox worker.
+        outbox_max_attempts (int): Number of delivery attempts after which an email is given up.
+        outbox_backoff_seconds (float): Delay before retrying an email after its first failed attempt.
+        outbox_backoff_max_seconds (float): Longest delay between two delivery attempts of an email.
+        outbox_lease_seconds (float): How long claimed emails are reserved for a worker before other workers may retry them.
+        outbox_metrics_port (int): Port of the Prometheus metrics of the outbox worker.
+        email_render_cache_size (int): Maximum number of cached renders of the email templates.
+        avatar_max_bytes (int): Largest accepted avatar upload.
+        avatar_workers (int): Number of threads processing uploaded avatars.
+        avatar_webp_quality (int): WebP quality of the processed avatars, from 0 to 100.
+        feed_timeline_length (int): Maximum number of photo IDs kept in the home feed timeline of every user.
+        tag_index_path (str): Snapshot file of the tag autocomplete index, shared by the workers of a host.
+        tag_index_refresh_seconds (float): Interval between checks of the tag index snapshot and of its journal.
+        tag_index_rebuild_seconds (float): Age of the tag index snapshot at which it is rebuilt from the database.
+        tag_index_cache_size (int): Maximum number of memoized prefixes of the tag index.
+        tag_query_max_terms (int): Maximum number of tags in a boolean tag search.
+        related_tags_path (str): Snapshot file of the tag co-occurrence counts, written by the related tags batch job.
+        related_tags_refresh_seconds (float): Interval between pulls of the photos added since the related tags snapshot.
+        related_tags_batch_size (int): Maximum number of photos pulled at once into the related tags counts.
+        related_tags_min_count (int): Minimum number of photos shared by two tags for them to be related.
+        related_tags_cache_size (int): Maximum number of memoized related tag suggestions.
+        feed_fanout_threshold (int): Followers from which the photos of a user are pulled by the feed readers instead of pushed to their timelines.
 
     Config:
         env_file (str): The name of the file to load environment variables from.
@@ -42,6 +105,69 @@ class Settings(BaseSettings):
     cloudinary_name: str = os.getenv('CLOUDINARY_CLOUD_NAME')
     cloudinary_api_key: str = os.getenv('CLOUDINARY_API_KEY')
     cloudinary_api_secret: str = os.getenv('CLOUDINARY_API_SECRET')
+    debug: bool = os.getenv('DEBUG', False)
+    slow_query_ms: float = os.getenv('SLOW_QUERY_MS', 200)
+    leaderboard_size: int = os.getenv('LEADERBOARD_SIZE', 1000)
+    leaderboard_half_life_hours: float = os.getenv('LEADERBOARD_HALF_LIFE_HOURS', 24)
+    leaderboard_compaction_seconds: int = os.getenv('LEADERBOARD_COMPACTION_SECONDS', 300)
+    leaderboard_min_score: float = os.getenv('LEADERBOARD_MIN_SCORE', 0.01)
+    trending_vote_weight: float = os.getenv('TRENDING_VOTE_WEIGHT', 1.0)
+    trending_comment_weight: float = os.getenv('TRENDING_COMMENT_WEIGHT', 2.0)
+    rating_prior_mean: float = os.getenv('RATING_PRIOR_MEAN', 3.0)
+    rating_prior_weight: int = os.getenv('RATING_PRIOR_WEIGHT', 5)
+    realtime_max_subscribers: int = os.getenv('REALTIME_MAX_SUBSCRIBERS', 20000)
+    realtime_max_queue_messages: int = os.getenv('REALTIME_MAX_QUEUE_MESSAGES', 64)
+    realtime_max_queue_bytes: int = os.getenv('REALTIME_MAX_QUEUE_BYTES', 65536)
+    realtime_heartbeat_seconds: float = os.getenv('REALTIME_HEARTBEAT_SECONDS', 15)
+    profiler_interval_ms: float = os.getenv('PROFILER_INTERVAL_MS', 5)
+    profiler_max_seconds: int = os.getenv('PROFILER_MAX_SECONDS', 60)
+    profiler_request_interval_ms: float = os.getenv('PROFILER_REQUEST_INTERVAL_MS', 1)
+    profile_ttl_seconds: int = os.getenv('PROFILE_TTL_SECONDS', 3600)
+    photo_cache_ttl_seconds: float = os.getenv('PHOTO_CACHE_TTL_SECONDS', 300)
+    cache_negative_ttl_seconds: float = os.getenv('CACHE_NEGATIVE_TTL_SECONDS', 30)
+    cache_l1_ttl_seconds: float = os.getenv('CACHE_L1_TTL_SECONDS', 1)
+    cache_l1_size: int = os.getenv('CACHE_L1_SIZE', 10000)
+    cache_early_refresh_beta: float = os.getenv('CACHE_EARLY_REFRESH_BETA', 1)
+    search_cache_ttl_seconds: int = os.getenv('SEARCH_CACHE_TTL_SECONDS', 120)
+    search_cache_race_ttl_seconds: int = os.getenv('SEARCH_CACHE_RACE_TTL_SECONDS', 5)
+    export_batch_size: int = os.getenv('EXPORT_BATCH_SIZE', 1000)
+    multi_get_max_ids: int = os.getenv('MULTI_GET_MAX_IDS', 100)
+    rate_limit_enabled: bool = os.getenv('RATE_LIMIT_ENABLED', True)
+    rate_limits: str = os.getenv('RATE_LIMITS', "login=5/60,signup=3/3600,upload=20/3600,comment=30/60,search=120/60")
+    rate_limit_local_size: int = os.getenv('RATE_LIMIT_LOCAL_SIZE', 10000)
+    admission_enabled: bool = os.getenv('ADMISSION_ENABLED', True)
+    admission_initial_limit: int = os.getenv('ADMISSION_INITIAL_LIMIT', 20)
+    admission_min_limit: int = os.getenv('ADMISSION_MIN_LIMIT', 4)
+    admission_max_limit: int = os.getenv('ADMISSION_MAX_LIMIT', 200)
+    admission_latency_tolerance: float = os.getenv('ADMISSION_LATENCY_TOLERANCE', 2.0)
+    admission_queue_size: int = os.getenv('ADMISSION_QUEUE_SIZE', 100)
+    admission_queue_timeout_ms: float = os.getenv('ADMISSION_QUEUE_TIMEOUT_MS', 500)
+    admission_retry_after_seconds: int = os.getenv('ADMISSION_RETRY_AFTER_SECONDS', 1)
+    mail_ssl_tls: bool = os.getenv('MAIL_SSL_TLS', True)
+    outbox_batch_size: int = os.getenv('OUTBOX_BATCH_SIZE', 50)
+    outbox_poll_seconds: float = os.getenv('OUTBOX_POLL_SECONDS', 1)
+    outbox_smtp_connections: int = os.getenv('OUTBOX_SMTP_CONNECTIONS', 4)
+    outbox_max_attempts: int = os.getenv('OUTBOX_MAX_ATTEMPTS', 8)
+    outbox_backoff_seconds: float = os.getenv('OUTBOX_BACKOFF_SECONDS', 30)
+    outbox_backoff_max_seconds: float = os.getenv('OUTBOX_BACKOFF_MAX_SECONDS', 3600)
+    outbox_lease_seconds: float = os.getenv('OUTBOX_LEASE_SECONDS', 300)
+    outbox_metrics_port: int = os.getenv('OUTBOX_METRICS_PORT', 9101)
+    email_render_cache_size: int = os.getenv('EMAIL_RENDER_CACHE_SIZE', 256)
+    avatar_max_bytes: int = os.getenv('AVATAR_MAX_BYTES', 10 * 1024 * 1024)
+    avatar_workers: int = os.getenv('AVATAR_WORKERS', 2)
+    avatar_webp_quality: int = os.getenv('AVATAR_WEBP_QUALITY', 80)
+    feed_timeline_length: int = os.getenv('FEED_TIMELINE_LENGTH', 800)
+    tag_index_path: str = os.getenv('TAG_INDEX_PATH', 'tag_index/tags.json')
+    tag_index_refresh_seconds: float = os.getenv('TAG_INDEX_REFRESH_SECONDS', 1)
+    tag_index_rebuild_seconds: float = os.getenv('TAG_INDEX_REBUILD_SECONDS', 300)
+    tag_index_cache_size: int = os.getenv('TAG_INDEX_CACHE_SIZE', 10000)
+    tag_query_max_terms: int = os.getenv('TAG_QUERY_MAX_TERMS', 10)
+    related_tags_path: str = os.getenv('RELATED_TAGS_PATH', 'tag_index/related_tags.npz')
+    related_tags_refresh_seconds: float = os.getenv('RELATED_TAGS_REFRESH_SECONDS', 30)
+    related_tags_batch_size: int = os.getenv('RELATED_TAGS_BATCH_SIZE', 5000)
+    related_tags_min_count: int = os.getenv('RELATED_TAGS_MIN_COUNT', 2)
+    related_tags_cache_size: int = os.getenv('RELATED_TAGS_CACHE_SIZE', 10000)
+    feed_fanout_threshold: int = os.getenv('FEED_FANOUT_THRESHOLD', 10000)
 
     class Config:
         env_file = ".env"
@@ -1,11 +1,34 @@
-from sqlalchemy import create_engine
+import time
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from fastapi_app.src.conf.config import settings
+from fastapi_app.src.services.metrics import record_db_query
+from fastapi_app.src.services.query_stats import query_stats
 
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
+
+@event.listens_for(engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """
+    Remembers when a statement was sent to the database.
+    """
+    context._query_start = time.perf_counter()
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """
+    Records the duration of a statement in the metrics of the current request and in the
+    statistics of its fingerprint.
+    """
+    duration = time.perf_counter() - context._query_start
+    record_db_query(duration)
+    query_stats.record(statement, duration)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
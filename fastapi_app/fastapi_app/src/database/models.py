@@ -1,14 +1,20 @@
-from sqlalchemy import Column, Integer, String, Boolean, func, Table, UniqueConstraint, Float
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Boolean, func, Table, UniqueConstraint, Float, Index, JSON
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.sql.schema import ForeignKey
 from sqlalchemy.sql.sqltypes import DateTime
 
 Base = declarative_base()
 
+# The (tag_id, photo_id) index holds the sorted posting list of every tag, for the tag searches;
+# the (photo_id, tag_id) index serves the tags of given photos, for the facet counts.
 photo_tag_table = Table(
     'photo_tag', Base.metadata,
     Column('photo_id', Integer, ForeignKey('photos.id')),
-    Column('tag_id', Integer, ForeignKey('tags.id'))
+    Column('tag_id', Integer, ForeignKey('tags.id')),
+    Index('ix_photo_tag_tag_id_photo_id', 'tag_id', 'photo_id'),
+    Index('ix_photo_tag_photo_id_tag_id', 'photo_id', 'tag_id'),
 )
 
 class User(Base):
@@ -32,6 +38,16 @@ class User(Base):
     :type refresh_token: str: 
     :param confirmed: information if the user is confirmed by mail
     :type confirmed: boolean:
+    :param photo_count: number of photos uploaded by the user, maintained by the photo write paths
+    :type photo_count: int:
+    :param comment_count: number of comments written by the user, maintained by the comment write paths
+    :type comment_count: int:
+    :param votes_received: number of votes given to the user's photos, maintained by the opinion write paths
+    :type votes_received: int:
+    :param follower_count: number of users following the user, maintained by the follow write paths
+    :type follower_count: int:
+    :param following_count: number of users the user follows, maintained by the follow write paths
+    :type following_count: int:
     """
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -43,6 +59,11 @@ class User(Base):
     avatar = Column(String(255), nullable=True)
     refresh_token = Column(String(255), nullable=True)
     confirmed = Column(Boolean, default=False)
+    photo_count = Column(Integer, nullable=False, default=0, server_default="0")
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
+    votes_received = Column(Integer, nullable=False, default=0, server_default="0")
+    follower_count = Column(Integer, nullable=False, default=0, server_default="0")
+    following_count = Column(Integer, nullable=False, default=0, server_default="0")
     comments = relationship("Comment", back_populates="user")
     photos = relationship("Photo", back_populates="user")
 
@@ -63,10 +84,20 @@ class Photo(Base):
     :type created_at: datetime
     :param updated_at: the date and time of the photo updating - format: YYYY-MM-DD HH:MM:SS where Y-means year, M - means month, D- means day H - means hour, M - means minutes and S - means seconds
     :type updated_at: datetime
-    :param rating: rating
+    :param rating: average of all votes, kept up to date together with rating_sum and rating_count
     :type rating: float
+    :param rating_sum: sum of all votes given to the photo
+    :type rating_sum: int
+    :param rating_count: number of votes given to the photo
+    :type rating_count: int
+    :param comment_count: number of comments of the photo, maintained by the comment write paths
+    :type comment_count: int
+    :param comments: comments of the photo. The relationship is write-only, list them page by page instead.
+    :type comments: relations
     """
     __tablename__ = "photos"
+    # The home feed pulls the latest photos of followed accounts with many followers.
+    __table_args__ = (Index("ix_photos_user_id_id", "user_id", "id"),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     url = Column(String)
@@ -74,9 +105,13 @@ class Photo(Base):
     tags = relationship("Tag", secondary=photo_tag_table)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, default=None, onupdate=func.now())
-    rating = Column(Float, default=0.0)
+    rating = Column(Float, default=0.0, index=True)
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
     user = relationship("User", back_populates="photos")
-    comments = relationship("Comment", back_populates="photo", cascade="all, delete")
+    comments = relationship("Comment", back_populates="photo", cascade="all, delete", passive_deletes=True,
+                            lazy="write_only")
 
 class Tag(Base):
     """
@@ -111,9 +146,10 @@ class Comment(Base):
     :type updated_at: datetime
     """
     __tablename__ = 'comments'
+    __table_args__ = (Index("ix_comments_photo_id_created_at_id", "photo_id", "created_at", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    photo_id = Column(Integer, ForeignKey('photos.id'))
+    photo_id = Column(Integer, ForeignKey('photos.id', ondelete="CASCADE"))
     user_id = Column(Integer, ForeignKey('users.id'))
     content = Column(String)
     created_at = Column(DateTime, server_default=func.now())
@@ -134,9 +170,79 @@ class Opinion(Base):
     :type user_id: int
     :param photo_id: photo unique id in DB
     :type photo_id: int
+    :param created_at: the date and time of the first vote
+    :type created_at: datetime
+    :param updated_at: the date and time the vote was last changed
+    :type updated_at: datetime
     """
     __tablename__ = "opinions"
+    __table_args__ = (UniqueConstraint("user_id", "photo_id", name="uq_opinions_user_photo"),)
     id = Column(Integer, primary_key=True, index=True)
     vote = Column(Integer, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
-    photo_id = Column(Integer, ForeignKey("photos.id", ondelete="CASCADE"))
\ No newline at end of file
+    photo_id = Column(Integer, ForeignKey("photos.id", ondelete="CASCADE"), index=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class Follow(Base):
+    """
+    Class which describes table in database of the users following other users
+
+    :param follower_id: id number of the following user
+    :type follower_id: int
+    :param followee_id: id number of the followed user
+    :type followee_id: int
+    :param created_at: the date and time the user started following
+    :type created_at: datetime
+    """
+    __tablename__ = "follows"
+    __table_args__ = (Index("ix_follows_followee_id", "followee_id"),)
+    follower_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    followee_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class EmailOutbox(Base):
+    """
+    Class which describes table in database of the emails waiting for delivery
+
+    The rows are written in the transaction of the change that triggers the email and delivered by
+    the outbox worker, so an email is never lost nor sent for a rolled back change.
+
+    :param id: email's unique id in DB
+    :type id: int
+    :param recipient: email address of the recipient
+    :type recipient: str
+    :param subject: subject of the email
+    :type subject: str
+    :param template: name of the template of the body
+    :type template: str
+    :param context: variables of the template
+    :type context: dict
+    :param status: pending until the email is delivered (sent) or given up (failed)
+    :type status: str
+    :param attempts: number of delivery attempts
+    :type attempts: int
+    :param next_attempt_at: when the email is due, in UTC; also postponed while a worker delivers it
+    :type next_attempt_at: datetime
+    :param last_error: error of the last failed attempt
+    :type last_error: str
+    :param created_at: the date and time the email was queued
+    :type created_at: datetime
+    :param sent_at: the date and time the email was delivered
+    :type sent_at: datetime
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),)
+    id = Column(Integer, primary_key=True)
+    recipient = Column(String(250), nullable=False)
+    subject = Column(String(255), nullable=False)
+    template = Column(String(100), nullable=False)
+    context = Column(JSON, nullable=False)
+    status = Column(String(10), nullable=False, default="pending", server_default="pending")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    sent_at = Column(DateTime, nullable=True)
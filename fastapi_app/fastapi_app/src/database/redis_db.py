@@ -0,0 +1,109 @@
+import asyncio
+import hashlib
+import time
+import weakref
+
+import redis
+import redis.asyncio
+from redis.exceptions import NoScriptError
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.services.metrics import record_redis_call
+
+
+class InstrumentedRedis(redis.asyncio.Redis):
+    """
+    Asynchronous Redis client recording every round trip in the metrics of the current request.
+    """
+
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            record_redis_call(time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> "InstrumentedPipeline":
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class InstrumentedPipeline(redis.asyncio.client.Pipeline):
+    """
+    Pipeline recording its execution as a single Redis round trip.
+    """
+
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            record_redis_call(time.perf_counter() - start)
+
+
+class InstrumentedSyncRedis(redis.Redis):
+    """
+    Blocking Redis client recording every round trip in the metrics of the current request.
+    """
+
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            record_redis_call(time.perf_counter() - start)
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, InstrumentedRedis]" = weakref.WeakKeyDictionary()
+
+
+def get_redis() -> InstrumentedRedis:
+    """
+    Returns the asynchronous Redis client of the running event loop.
+
+    The client keeps its own connection pool, so a single instance is shared by all requests
+    of a worker instead of connecting per request. Connections are bound to the event loop
+    that opened them, which is why there is one client per loop.
+
+    :return: The Redis client.
+    :rtype: InstrumentedRedis
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = InstrumentedRedis(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            password=settings.redis_password,
+            db=0,
+            encoding="utf-8",
+            decode_responses=True,
+        )
+    return client
+
+
+async def close_redis() -> None:
+    """
+    Closes the Redis client of the running event loop.
+    """
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+async def run_script(script: str, keys: list, args: list):
+    """
+    Runs a Lua script by its SHA1 digest, loading it into Redis only the first time.
+
+    :param script: The Lua source.
+    :type script: str
+    :param keys: The keys the script accesses.
+    :type keys: list
+    :param args: The arguments of the script.
+    :type args: list
+    :return: The result of the script.
+    """
+    client = get_redis()
+    sha = hashlib.sha1(script.encode()).hexdigest()
+    try:
+        return await client.evalsha(sha, len(keys), *keys, *args)
+    except NoScriptError:
+        return await client.eval(script, len(keys), *keys, *args)
@@ -0,0 +1,76 @@
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+
+from fastapi_app.src.database.models import Comment, Follow, Opinion, Photo, User
+
+
+def update_user_counters(db: Session, user_id: int, **deltas: int) -> None:
+    """
+    Adds the given deltas to the denormalized counters of a user.
+
+    The counters are changed with a single ``UPDATE ... SET counter = counter + delta``, so
+    concurrent writers never lose an increment. Nothing is committed here: the caller commits
+    together with the write that caused the change, which keeps the counters transactional.
+
+    :param db: The database session.
+    :type db: Session
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :param deltas: Deltas by counter name: ``photo_count``, ``comment_count``, ``votes_received``,
+        ``follower_count`` or ``following_count``.
+    :type deltas: int
+    """
+    values = {getattr(User, name): getattr(User, name) + delta for name, delta in deltas.items() if delta}
+    if user_id is None or not values:
+        return
+    db.execute(update(User).where(User.id == user_id).values(values).execution_options(synchronize_session=False))
+
+
+def reconcile_user_counters(db: Session, user_id: int | None = None) -> int:
+    """
+    Recalculates the denormalized counters from the source tables and repairs the users whose
+    counters drifted.
+
+    :param db: The database session.
+    :type db: Session
+    :param user_id: Reconcile only this user, defaults to all users.
+    :type user_id: int | None
+    :return: Number of repaired users.
+    :rtype: int
+    """
+    photo_count = select(func.count(Photo.id)).where(Photo.user_id == User.id).scalar_subquery()
+    comment_count = select(func.count(Comment.id)).where(Comment.user_id == User.id).scalar_subquery()
+    votes_received = (
+        select(func.count(Opinion.id))
+        .join(Photo, Photo.id == Opinion.photo_id)
+        .where(Photo.user_id == User.id)
+        .scalar_subquery()
+    )
+    follower_count = select(func.count(Follow.follower_id)).where(Follow.followee_id == User.id).scalar_subquery()
+    following_count = select(func.count(Follow.followee_id)).where(Follow.follower_id == User.id).scalar_subquery()
+    stmt = (
+        update(User)
+        .where(or_(User.photo_count != photo_count,
+                   User.comment_count != comment_count,
+                   User.votes_received != votes_received,
+                   User.follower_count != follower_count,
+                   User.following_count != following_count))
+        .values(photo_count=photo_count, comment_count=comment_count, votes_received=votes_received,
+                follower_count=follower_count, following_count=following_count)
+        .execution_options(synchronize_session=False)
+    )
+    if user_id is not None:
+        stmt = stmt.where(User.id == user_id)
+    repaired = db.execute(stmt).rowcount
+    db.commit()
+    return repaired
+
+
+if __name__ == "__main__":
+    from fastapi_app.src.database.db import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print(f"Repaired counters of {reconcile_user_counters(session)} users")
+    finally:
+        session.close()
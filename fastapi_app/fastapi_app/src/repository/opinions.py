@@ -0,0 +1,110 @@
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from fastapi_app.src.database.models import Opinion, Photo
+from fastapi_app.src.repository.counters import update_user_counters
+from fastapi_app.src.services.cache import photo_cache
+from fastapi_app.src.services.search_cache import photo_dependency, search_cache, tag_dependency
+
+
+def _apply_average(photo: Photo) -> None:
+    """
+    Recalculates the average rating of a photo from its materialized sum and count.
+
+    :param photo: The photo whose aggregates have just been changed.
+    :type photo: Photo
+    """
+    photo.rating = photo.rating_sum / photo.rating_count if photo.rating_count else 0.0
+
+
+async def get_opinion(db: Session, photo_id: int, user_id: int) -> Opinion | None:
+    """
+    Retrieve the vote of a user for a photo.
+
+    :param db: The database session.
+    :type db: Session
+    :param photo_id: The ID of the rated photo.
+    :type photo_id: int
+    :param user_id: The ID of the voting user.
+    :type user_id: int
+    :return: The opinion if the user has voted, otherwise None.
+    :rtype: Opinion | None
+    """
+    return db.query(Opinion).filter(Opinion.photo_id == photo_id, Opinion.user_id == user_id).first()
+
+
+async def rate_photo(db: Session, photo_id: int, user_id: int, vote: int) -> tuple[Photo | None, bool]:
+    """
+    Record a user's vote for a photo.
+
+    Voting is idempotent: a second vote of the same user replaces the first one. The photo row
+    is locked for the duration of the transaction, so ``rating_sum``, ``rating_count`` and the
+    average ``rating`` are updated incrementally and stay consistent under concurrent votes.
+
+    :param db: The database session.
+    :type db: Session
+    :param photo_id: The ID of the photo to rate.
+    :type photo_id: int
+    :param user_id: The ID of the voting user.
+    :type user_id: int
+    :param vote: The number of stars.
+    :type vote: int
+    :return: The rated photo with updated aggregates, or None if the photo does not exist, and
+        whether the vote is new rather than replacing a previous one.
+    :rtype: tuple[Photo | None, bool]
+    :raises HTTPException: If the user tries to rate their own photo.
+    """
+    photo = db.query(Photo).filter(Photo.id == photo_id).with_for_update().first()
+    if photo is None:
+        return None, False
+    if photo.user_id == user_id:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You can't rate your own photo")
+
+    opinion = await get_opinion(db, photo_id, user_id)
+    if opinion:
+        photo.rating_sum += vote - opinion.vote
+        opinion.vote = vote
+    else:
+        db.add(Opinion(vote=vote, user_id=user_id, photo_id=photo_id))
+        photo.rating_sum += vote
+        photo.rating_count += 1
+        update_user_counters(db, photo.user_id, votes_received=1)
+    _apply_average(photo)
+    db.commit()
+    await photo_cache.invalidate(photo_id)
+    db.refresh(photo)
+    # the new rating may move the photo in or out of rating filtered tag searches
+    await search_cache.invalidate(photo_dependency(photo_id), *(tag_dependency(tag.id) for tag in photo.tags))
+    return photo, opinion is None
+
+
+async def remove_rating(db: Session, photo_id: int, user_id: int) -> Photo | None:
+    """
+    Withdraw a user's vote for a photo.
+
+    :param db: The database session.
+    :type db: Session
+    :param photo_id: The ID of the rated photo.
+    :type photo_id: int
+    :param user_id: The ID of the voting user.
+    :type user_id: int
+    :return: The photo with updated aggregates, or None if the photo or the vote does not exist.
+    :rtype: Photo | None
+    """
+    photo = db.query(Photo).filter(Photo.id == photo_id).with_for_update().first()
+    opinion = await get_opinion(db, photo_id, user_id) if photo else None
+    if opinion is None:
+        db.rollback()
+        return None
+    photo.rating_sum -= opinion.vote
+    photo.rating_count -= 1
+    _apply_average(photo)
+    update_user_counters(db, photo.user_id, votes_received=-1)
+    db.delete(opinion)
+    db.commit()
+    await photo_cache.invalidate(photo_id)
+    db.refresh(photo)
+    # the new rating may move the photo in or out of rating filtered tag searches
+    await search_cache.invalidate(photo_dependency(photo_id), *(tag_dependency(tag.id) for tag in photo.tags))
+    return photo
@@ -0,0 +1,120 @@
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from fastapi_app.src.database.models import EmailOutbox
+
+PENDING, SENT, FAILED = "pending", "sent", "failed"
+
+
+async def enqueue_emails(emails: list[EmailOutbox], db: Session) -> None:
+    """
+    Adds emails to the outbox, for the emails not tied to another change of the database.
+
+    :param emails: The unsaved outbox rows.
+    :type emails: list[EmailOutbox]
+    :param db: The database session.
+    :type db: Session
+    """
+    db.add_all(emails)
+    db.commit()
+
+
+def claim_due(db: Session, limit: int, lease_seconds: float) -> list[EmailOutbox]:
+    """
+    Claims a batch of due emails for delivery.
+
+    The rows are locked with ``FOR UPDATE SKIP LOCKED``, so concurrent workers claim disjoint
+    batches, and their next attempt is postponed by the lease before the claim is committed: if
+    the worker dies while sending, the emails become due again once the lease expires.
+
+    :param db: The database session.
+    :type db: Session
+    :param limit: Maximum number of emails claimed.
+    :type limit: int
+    :param lease_seconds: How long the emails are reserved for this worker.
+    :type lease_seconds: float
+    :return: The claimed emails, oldest due first.
+    :rtype: list[EmailOutbox]
+    """
+    now = datetime.utcnow()
+    emails = db.scalars(
+        select(EmailOutbox)
+        .where(EmailOutbox.status == PENDING, EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    for email in emails:
+        email.next_attempt_at = now + timedelta(seconds=lease_seconds)
+    db.commit()
+    return emails
+
+
+def retry_delay(attempts: int, base_seconds: float, max_seconds: float) -> float:
+    """
+    Calculates the delay before the next attempt, doubling with every failed attempt.
+
+    Half of the delay is random, so the emails that failed together during an outage of the
+    SMTP server are not retried all at once.
+
+    :param attempts: Number of failed attempts so far, at least 1.
+    :type attempts: int
+    :param base_seconds: The delay after the first failure.
+    :type base_seconds: float
+    :param max_seconds: The longest delay.
+    :type max_seconds: float
+    :return: The delay in seconds.
+    :rtype: float
+    """
+    delay = min(max_seconds, base_seconds * 2 ** min(attempts - 1, 32))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def record_results(db: Session, sent: list[int], failures: dict[int, tuple[str, bool]], max_attempts: int,
+                   base_seconds: float, max_seconds: float) -> int:
+    """
+    Records the outcome of a delivered batch.
+
+    Sent emails are marked in one statement. A failed email is retried with a growing delay,
+    unless the error is permanent or it ran out of attempts, then it is marked as failed.
+
+    :param db: The database session.
+    :type db: Session
+    :param sent: IDs of the delivered emails.
+    :type sent: list[int]
+    :param failures: The error and whether it is permanent, by ID of the undelivered emails.
+    :type failures: dict[int, tuple[str, bool]]
+    :param max_attempts: Number of attempts after which an email is given up.
+    :type max_attempts: int
+    :param base_seconds: The delay after the first failure.
+    :type base_seconds: float
+    :param max_seconds: The longest delay between two attempts.
+    :type max_seconds: float
+    :return: Number of emails given up.
+    :rtype: int
+    """
+    now = datetime.utcnow()
+    if sent:
+        db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(sent))
+            .values(status=SENT, sent_at=now, attempts=EmailOutbox.attempts + 1, last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+    given_up = 0
+    if failures:
+        for email in db.scalars(select(EmailOutbox).where(EmailOutbox.id.in_(failures))):
+            error, permanent = failures[email.id]
+            email.attempts += 1
+            email.last_error = error[:1000]
+            if permanent or email.attempts >= max_attempts:
+                email.status = FAILED
+                given_up += 1
+            else:
+                email.next_attempt_at = now + timedelta(
+                    seconds=retry_delay(email.attempts, base_seconds, max_seconds))
+    db.commit()
+    return given_up
@@ -1,7 +1,8 @@
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Iterator, List
 
-from fastapi_app.src.database.models import Tag
+from fastapi_app.src.database.models import Photo, Tag, photo_tag_table
 from fastapi_app.src.database.db import get_db
 
 async def create_tags(names: list[str], db: Session):
@@ -29,4 +30,79 @@ async def create_tags(names: list[str], db: Session):
             db.commit()
             final.append(new_tag)
 
-    return final
\ No newline at end of file
+    return final
+
+
+def tag_usage(db: Session) -> list[tuple[str, int]]:
+    """
+    Counts the photos of every tag, including the unused tags.
+
+    :param db: The database session.
+    :type db: Session
+    :return: Pairs of tag name and number of photos.
+    :rtype: list[tuple[str, int]]
+    """
+    statement = (
+        select(Tag.name, func.count(photo_tag_table.c.photo_id))
+        .outerjoin(photo_tag_table, photo_tag_table.c.tag_id == Tag.id)
+        .where(Tag.name.isnot(None), Tag.name != "")
+        .group_by(Tag.id, Tag.name)
+    )
+    return [(name, count) for name, count in db.execute(statement)]
+
+
+def tag_names(db: Session) -> dict[int, str]:
+    """
+    Returns the names of all the tags.
+
+    :param db: The database session.
+    :type db: Session
+    :return: The tag names by ID.
+    :rtype: dict[int, str]
+    """
+    return dict(db.execute(select(Tag.id, Tag.name).where(Tag.name.isnot(None))).all())
+
+
+def iter_taggings(db: Session, batch_size: int) -> Iterator[list[tuple[int, int]]]:
+    """
+    Streams all the rows of ``photo_tag`` through a server-side cursor, for the batch jobs.
+
+    :param db: The database session, it must stay open until the batches are consumed.
+    :type db: Session
+    :param batch_size: Number of rows fetched per batch.
+    :type batch_size: int
+    :return: Batches of photo ID and tag ID pairs.
+    :rtype: Iterator[list[tuple[int, int]]]
+    """
+    statement = (
+        select(photo_tag_table.c.photo_id, photo_tag_table.c.tag_id)
+        .where(photo_tag_table.c.photo_id.isnot(None), photo_tag_table.c.tag_id.isnot(None))
+        .execution_options(yield_per=batch_size)
+    )
+    for partition in db.execute(statement).partitions():
+        yield [(photo_id, tag_id) for photo_id, tag_id in partition]
+
+
+def taggings_after(db: Session, photo_id: int, limit: int) -> tuple[int, list[tuple[int, int, str]]]:
+    """
+    Returns the tags of the next photos after a photo ID, for incremental updates.
+
+    :param db: The database session.
+    :type db: Session
+    :param photo_id: The last photo ID already processed.
+    :type photo_id: int
+    :param limit: Maximum number of photos.
+    :type limit: int
+    :return: The last photo ID processed, and photo ID, tag ID and tag name triples ordered by photo ID.
+    :rtype: tuple[int, list[tuple[int, int, str]]]
+    """
+    photo_ids = db.scalars(select(Photo.id).where(Photo.id > photo_id).order_by(Photo.id).limit(limit)).all()
+    if not photo_ids:
+        return photo_id, []
+    statement = (
+        select(photo_tag_table.c.photo_id, Tag.id, Tag.name)
+        .join(Tag, Tag.id == photo_tag_table.c.tag_id)
+        .where(photo_tag_table.c.photo_id.in_(photo_ids))
+        .order_by(photo_tag_table.c.photo_id)
+    )
+    return photo_ids[-1], [(photo, tag_id, name) for photo, tag_id, name in db.execute(statement)]
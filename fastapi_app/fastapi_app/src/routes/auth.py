@@ -1,23 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Security, BackgroundTasks, Request
+from fastapi import APIRouter, HTTPException, Depends, status, Security, Request
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
 
 from fastapi_app.src.database.db import get_db
 from fastapi_app.src.schemas import UserModel, UserResponse, TokenModel, RequestEmail
+from fastapi_app.src.repository import outbox as repository_outbox
 from fastapi_app.src.repository import users as repository_users
 from fastapi_app.src.services.auth import auth_service
-from fastapi_app.src.services.email import send_email
+from fastapi_app.src.services.email import confirmation_email
+from fastapi_app.src.services.rate_limit import RateLimiter
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 security = HTTPBearer()
 
 
 @router.post(
-    "/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED
+    "/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(RateLimiter("signup"))]
 )
 async def signup(
     body: UserModel,
-    background_tasks: BackgroundTasks,
     request: Request,
     db: Session = Depends(get_db),
 ):
@@ -26,8 +28,6 @@ async def signup(
 
     :param body: The user registration details.
     :type body: UserModel
-    :param background_tasks: Background tasks for asynchronous operations.
-    :type background_tasks: BackgroundTasks
     :param request: The request object.
     :type request: Request
     :param db: The database session.
@@ -42,17 +42,15 @@ async def signup(
             status_code=status.HTTP_409_CONFLICT, detail="Account already exists"
         )
     body.password = auth_service.get_password_hash(body.password)
-    new_user = await repository_users.create_user(body, db)
-    background_tasks.add_task(
-        send_email, new_user.email, new_user.username, request.base_url
-    )
+    email = confirmation_email(body.email, body.username, request.base_url)
+    new_user = await repository_users.create_user(body, db, emails=[email])
     return {
         "user": new_user,
         "detail": "User successfully created. Check your email for confirmation.",
     }
 
 
-@router.post("/login", response_model=TokenModel)
+@router.post("/login", response_model=TokenModel, dependencies=[Depends(RateLimiter("login"))])
 async def login(
     body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
 ):
@@ -154,7 +152,6 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
 @router.post("/request_email")
 async def request_email(
     body: RequestEmail,
-    background_tasks: BackgroundTasks,
     request: Request,
     db: Session = Depends(get_db),
 ):
@@ -163,8 +160,6 @@ async def request_email(
 
     :param body: The email request details.
     :type body: RequestEmail
-    :param background_tasks: Background tasks for asynchronous operations.
-    :type background_tasks: BackgroundTasks
     :param request: The request object.
     :type request: Request
     :param db: The database session.
@@ -177,7 +172,7 @@ async def request_email(
     if user.confirmed:
         return {"message": "Your email is already confirmed"}
     if user:
-        background_tasks.add_task(
-            send_email, user.email, user.username, request.base_url
+        await repository_outbox.enqueue_emails(
+            [confirmation_email(user.email, user.username, request.base_url)], db
         )
     return {"message": "Check your email for confirmation."}
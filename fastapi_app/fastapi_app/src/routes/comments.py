@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 
 from sqlalchemy.orm import Session
 
@@ -7,11 +7,17 @@ from fastapi_app.src import schemas
 from fastapi_app.src.repository import comments as crud
 from fastapi_app.src.database.db import get_db
 from fastapi_app.src.services.auth import auth_service
+from fastapi_app.src.services.conditional import CachePolicy, Conditional, entity_tag
+from fastapi_app.src.services.leaderboard import leaderboard_service
+from fastapi_app.src.services.rate_limit import UserRateLimiter
+from fastapi_app.src.services import realtime
 
 router = APIRouter(prefix="/comments", tags=["comments"])
+comment_policy = CachePolicy("public, no-cache")
 # router = APIRouter()
 
-@router.post("/photos/{photo_id}/comments/", response_model=schemas.Comment, status_code=201)
+@router.post("/photos/{photo_id}/comments/", response_model=schemas.Comment, status_code=201,
+             dependencies=[Depends(UserRateLimiter("comment"))])
 async def create_comment_for_photo(
     photo_id: int,
     comment: schemas.CommentCreate,
@@ -31,11 +37,45 @@ async def create_comment_for_photo(
     :type current_user: models.User
     :return: The created comment.
     :rtype: schemas.Comment
+    :raises HTTPException: If the photo is not found.
     """
-    return await crud.create_comment(db=db, comment=comment, user_id=current_user.id, photo_id=photo_id)
+    db_comment = await crud.create_comment(db=db, comment=comment, user_id=current_user.id, photo_id=photo_id)
+    if db_comment is None:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    await leaderboard_service.record_comment(photo_id)
+    await realtime.publish(photo_id, "comment_created", schemas.Comment.from_orm(db_comment).json())
+    return db_comment
+
+@router.get("/photos/{photo_id}/comments", response_model=schemas.CommentPage)
+async def read_photo_comments(
+    photo_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Retrieve the comments of a photo page by page, oldest first.
+
+    :param photo_id: The ID of the photo.
+    :type photo_id: int
+    :param limit: The maximum number of comments on the page.
+    :type limit: int
+    :param cursor: The ``next_cursor`` of the previous page, omitted for the first page.
+    :type cursor: str | None
+    :param db: The database session.
+    :type db: Session
+    :return: The comments of the page and the cursor of the next page.
+    :rtype: schemas.CommentPage
+    :raises HTTPException: If the cursor is invalid or the photo is not found.
+    """
+    items, next_cursor = await crud.get_photo_comments(db, photo_id=photo_id, limit=limit, cursor=cursor)
+    if not items and cursor is None and db.query(models.Photo.id).filter(models.Photo.id == photo_id).first() is None:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    return {"items": items, "next_cursor": next_cursor}
 
 @router.get("/comments/{comment_id}", response_model=schemas.Comment)
-async def read_comment(comment_id: int, db: Session = Depends(get_db)):
+async def read_comment(comment_id: int, db: Session = Depends(get_db),
+                       conditional: Conditional = Depends(comment_policy)):
     """
     Retrieve a specific comment by its ID.
 
@@ -43,13 +83,17 @@ async def read_comment(comment_id: int, db: Session = Depends(get_db)):
     :type comment_id: int
     :param db: The database session.
     :type db: Session
+    :param conditional: Validator of the ``If-None-Match`` header, the tag is built from ``updated_at``.
+    :type conditional: Conditional
     :return: The retrieved comment.
     :rtype: schemas.Comment
     :raises HTTPException: If the comment is not found.
+    :raises NotModified: If the client already has the current version of the comment.
     """
     db_comment = await crud.get_comment(db, comment_id=comment_id)
     if db_comment is None:
         raise HTTPException(status_code=404, detail="Comment not found")
+    conditional.check(entity_tag("comment", db_comment.id, db_comment.updated_at))
     return db_comment
 
 @router.put("/comments/{comment_id}", response_model=schemas.Comment)
@@ -77,7 +121,9 @@ async def update_comment(
     db_comment = await crud.get_comment(db, comment_id=comment_id)
     if db_comment is None or db_comment.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Comment not found or not authorized to update")
-    return await crud.update_comment(db=db, comment=comment, comment_id=comment_id)
+    db_comment = await crud.update_comment(db=db, comment=comment, comment_id=comment_id)
+    await realtime.publish(db_comment.photo_id, "comment_updated", schemas.Comment.from_orm(db_comment).json())
+    return db_comment
 
 @router.delete("/comments/{comment_id}", response_model=schemas.Comment)
 async def delete_comment(
@@ -101,4 +147,6 @@ async def delete_comment(
     db_comment = await crud.get_comment(db, comment_id=comment_id)
     if db_comment is None or current_user.role not in ["admin", "moderator"]:
         raise HTTPException(status_code=404, detail="Comment not found or not authorized to delete")
-    return await crud.delete_comment(db=db, comment_id=comment_id)
\ No newline at end of file
+    db_comment = await crud.delete_comment(db=db, comment_id=comment_id)
+    await realtime.publish(db_comment.photo_id, "comment_deleted", {"id": db_comment.id})
+    return db_comment
\ No newline at end of file
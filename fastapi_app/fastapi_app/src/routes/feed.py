@@ -0,0 +1,38 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from fastapi_app.src.database.db import get_db
+from fastapi_app.src.database.models import User
+from fastapi_app.src.schemas import TagSearch
+from fastapi_app.src.services.auth import auth_service
+from fastapi_app.src.services.feed import feed_service
+from fastapi_app.src.services.serialization import RawJSONResponse, dumps, project
+
+router = APIRouter(prefix="/feed", tags=["feed"])
+
+
+@router.get("/", response_model=List[TagSearch])
+async def read_feed(
+    before: int | None = Query(None, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieves the home feed: the latest photos of the current user and of the users they follow.
+
+    :param before: Only photos older than this photo ID, i.e. the ID of the last photo of the previous page.
+    :type before: int | None
+    :param limit: Maximum number of photos.
+    :type limit: int
+    :param current_user: The current authenticated user.
+    :type current_user: User
+    :param db: The database session.
+    :type db: Session
+    :return: The photos, newest first.
+    :rtype: RawJSONResponse
+    """
+    photos = await feed_service.read(db, current_user.id, before, limit)
+    return RawJSONResponse(dumps(project(photos, TagSearch)))
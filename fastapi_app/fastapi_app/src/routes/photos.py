@@ -1,16 +1,23 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Query
 from uuid import uuid4
 from fastapi_app.src.database.models import Photo, User
 from fastapi_app.src.services.photo_service import PhotoService
 from fastapi_app.src.services.auth import auth_service
+from fastapi_app.src.services.conditional import CachePolicy, Conditional, entity_tag
+from fastapi_app.src.services.feed import feed_service
+from fastapi_app.src.services.leaderboard import leaderboard_service
+from fastapi_app.src.services.rate_limit import UserRateLimiter
+from fastapi_app.src.services.serialization import RawJSONResponse, dumps, multi_get_results
+from fastapi_app.src.conf.config import settings
 from fastapi_app.src.database.db import get_db
 from fastapi_app.src.repository.tags import create_tags
 import aiofiles
 import os
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import List, Optional
 
 router = APIRouter(prefix="/photos", tags=["photos"])
+photo_policy = CachePolicy("public, no-cache")
 
 
 UPLOAD_DIR = "uploads/"
@@ -36,7 +43,7 @@ async def save_photo(file: UploadFile) -> str:
     
     return file_path
 
-@router.post("/photos/", status_code=201)
+@router.post("/photos/", status_code=201, dependencies=[Depends(UserRateLimiter("upload"))])
 async def create_photo(description: str, tags: Optional[str] = None, file: UploadFile = File(...), current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
     """
     Create a new photo.
@@ -59,7 +66,8 @@ async def create_photo(description: str, tags: Optional[str] = None, file: Uploa
     tag_list = [tag for tag in tags.split(' ')]
     tags = await create_tags(tag_list, db)
     photo = Photo(description=description, url=file_path, tags=tags, user_id=current_user.id)
-    saved_photo = PhotoService.save(db, photo)
+    saved_photo = await PhotoService.save(db, photo)
+    await feed_service.publish(db, saved_photo)
     return saved_photo
 
 @router.put("/photos/{photo_id}")
@@ -78,7 +86,7 @@ async def update_photo(photo_id: int, description: str, db: Session = Depends(ge
     :raises HTTPException: If the photo is not found, raises a 404 error with the detail message.
     """
     try:
-        updated_photo = PhotoService.update(db, photo_id, description)
+        updated_photo = await PhotoService.update(db, photo_id, description)
         return updated_photo
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -97,26 +105,57 @@ async def delete_photo(photo_id: int, db: Session = Depends(get_db)):
     :raises HTTPException: If the photo is not found, raises a 404 error with the detail message.
     """
     try:
-        PhotoService.delete(db,photo_id)
-        return {"detail": "Photo deleted"}
+        await PhotoService.delete(db,photo_id)
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    await leaderboard_service.remove_photo(photo_id)
+    return {"detail": "Photo deleted"}
 
 @router.get("/photos/{photo_id}")
-async def read_photo(photo_id: int, db: Session = Depends(get_db)):
+async def read_photo(photo_id: int, db: Session = Depends(get_db), conditional: Conditional = Depends(photo_policy)):
     """
     Retrieve a photo by its ID.
 
+    The entity tag is built from the update time and the counters of the photo, which change
+    with its ratings and comments.
+
     :param photo_id: The ID of the photo to retrieve.
     :type photo_id: int
     :param db: The database session.
     :type db: Session
+    :param conditional: Validator of the ``If-None-Match`` header.
+    :type conditional: Conditional
     :return: The photo data.
     :rtype: dict
     :raises HTTPException: If the photo is not found, raises a 404 error with the detail message.
+    :raises NotModified: If the client already has the current version of the photo.
     """
     try:
-        photo = PhotoService.get(db, photo_id)
-        return photo
+        photo = await PhotoService.get_cached(db, photo_id)
     except FileNotFoundError as e:
-        raise HTTPException(status_code=404, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=404, detail=str(e))
+    conditional.check(entity_tag("photo", photo_id, photo["updated_at"], photo["rating_sum"],
+                                 photo["rating_count"], photo["comment_count"]))
+    return photo
+
+@router.get("/photos/")
+async def read_photos(ids: List[int] = Query(...), db: Session = Depends(get_db)):
+    """
+    Retrieve many photos at once, e.g. the tiles of a grid.
+
+    The photos are read through the photo cache, the misses with a single query, and come with
+    their tags. Every ID gets an item, in the order of the request: the photo, or a 404 status
+    for a missing photo.
+
+    :param ids: The IDs of the photos, at most ``settings.multi_get_max_ids``.
+    :type ids: List[int]
+    :param db: The database session.
+    :type db: Session
+    :return: The items, see :func:`~fastapi_app.src.services.serialization.multi_get_results`.
+    :rtype: RawJSONResponse
+    :raises HTTPException: If too many IDs are requested, raises a 422 error.
+    """
+    if len(ids) > settings.multi_get_max_ids:
+        raise HTTPException(status_code=422, detail=f"At most {settings.multi_get_max_ids} IDs per request")
+    photos = await PhotoService.get_many_cached(db, ids)
+    return RawJSONResponse(dumps(multi_get_results(ids, photos)))
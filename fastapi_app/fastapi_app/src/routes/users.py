@@ -1,21 +1,28 @@
-from fastapi import APIRouter, Depends, status, UploadFile, File, HTTPException
+import os
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, Request, status, UploadFile, File, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
-import cloudinary
-import cloudinary.uploader
 
 from fastapi_app.src.database.db import get_db
 from fastapi_app.src.database.models import User
+from fastapi_app.src.repository import follows as repository_follows
 from fastapi_app.src.repository import users as repository_users
+from fastapi_app.src.repository.counters import reconcile_user_counters
 from fastapi_app.src.services.auth import auth_service
+from fastapi_app.src.services.conditional import CachePolicy, Conditional, entity_tag
+from fastapi_app.src.services.feed import feed_service
+from fastapi_app.src.services.serialization import RawJSONResponse, dumps, multi_get_results
+from fastapi_app.src.services.storage import publish_avatar, save_avatar
 from fastapi_app.src.conf.config import settings
 from fastapi_app.src.schemas import UserDb, ProfileStatusUpdate, ProfileResponse
 
 router = APIRouter(prefix="/users", tags=["users"])
+profile_policy = CachePolicy("private, no-cache")
 
 
 @router.get("/me/", response_model=UserDb)
-async def read_users_me(current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+async def read_users_me(current_user: User = Depends(auth_service.get_current_user)):
     """
     Retrieves the current authenticated user's information.
 
@@ -24,12 +31,28 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
     :return: The current user's information.
     :rtype: UserDb
     """
-    repository_users.get_current_user_profile(current_user, db)
     return current_user
 
 
+@router.get("/me/profile", response_model=ProfileResponse)
+async def read_users_me_profile(current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+    """
+    Retrieves the current authenticated user's profile with the activity counters.
+
+    :param current_user: The current user object.
+    :type current_user: User
+    :param db: The database session.
+    :type db: Session
+    :return: The current user's profile.
+    :rtype: ProfileResponse
+    """
+    return await repository_users.get_current_user_profile(current_user, db)
+
+
 @router.patch("/avatar", response_model=UserDb)
 async def update_avatar_user(
+    request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(),
     current_user: User = Depends(auth_service.get_current_user),
     db: Session = Depends(get_db),
@@ -37,6 +60,14 @@ async def update_avatar_user(
     """
     Updates the avatar of the current authenticated user.
 
+    The image is cropped to 250x250 and encoded as WebP off the event loop, and the user answered
+    as soon as it is stored locally, pointed to its URL under ``/uploads/avatars``. If Cloudinary
+    is configured, the avatar is then uploaded in the background and the user pointed to it.
+
+    :param request: The request, to build the URL of the stored avatar.
+    :type request: Request
+    :param background_tasks: Background tasks for asynchronous operations.
+    :type background_tasks: BackgroundTasks
     :param file: The uploaded file containing the new avatar.
     :type file: UploadFile
     :param current_user: The current user object.
@@ -45,22 +76,14 @@ async def update_avatar_user(
     :type db: Session
     :return: The updated user object.
     :rtype: UserDb
-    :raises HTTPException: If an error occurs while updating the avatar.
-    """
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True,
-    )
-
-    cloudinary.uploader.upload(
-        file.file, public_id=f"NotesApp/{current_user.username}", overwrite=True
-    )
-    src_url = cloudinary.CloudinaryImage(f"NotesApp/{current_user.username}").build_url(
-        width=250, height=250, crop="fill"
-    )
-    user = await repository_users.update_avatar(current_user.email, src_url, db)
+    :raises HTTPException: If the upload is too large or not a supported image.
+    """
+    file_path = await save_avatar(file, current_user.id)
+    avatar_url = str(request.url_for("avatars", path=os.path.basename(file_path)))
+    user = await repository_users.update_avatar(current_user.email, avatar_url, db)
+    if settings.cloudinary_name:
+        background_tasks.add_task(publish_avatar, current_user.id, file_path, avatar_url,
+                                  f"NotesApp/{current_user.username}")
     return user
 
 # New routes for admins and moderators
@@ -85,6 +108,53 @@ async def read_all_users(
     return users
 
 
+@router.get("/profiles", response_model=List[dict])
+async def read_profiles(ids: List[int] = Query(...), db: Session = Depends(get_db)):
+    """
+    Retrieves the profiles of many users at once, e.g. to render the authors of comments.
+
+    The users are read with a single query. Every ID gets an item, in the order of the request:
+    the profile without the email address, or a 404 status for a missing user.
+
+    :param ids: The IDs of the users, at most ``settings.multi_get_max_ids``.
+    :type ids: List[int]
+    :param db: The database session.
+    :type db: Session
+    :return: The items, see :func:`~fastapi_app.src.services.serialization.multi_get_results`.
+    :rtype: RawJSONResponse
+    :raises HTTPException: If too many IDs are requested.
+    """
+    if len(ids) > settings.multi_get_max_ids:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail=f"At most {settings.multi_get_max_ids} IDs per request")
+    profiles = await repository_users.get_public_profiles(ids, db)
+    values = [profiles.get(user_id) or LookupError(f"User with ID {user_id} not found") for user_id in ids]
+    return RawJSONResponse(dumps(multi_get_results(ids, values)))
+
+
+@router.post("/counters/reconcile", response_model=dict)
+async def reconcile_counters(
+    user_id: int | None = None,
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Repairs the denormalized activity counters of the users (admin access required).
+
+    :param user_id: Reconcile only this user, defaults to all users.
+    :type user_id: int | None
+    :param current_user: The current user object.
+    :type current_user: User
+    :param db: The database session.
+    :type db: Session
+    :return: The number of repaired users.
+    :rtype: dict
+    :raises HTTPException: If the current user does not have admin privileges.
+    """
+    await auth_service.check_role(current_user, "admin")
+    return {"repaired": reconcile_user_counters(db, user_id)}
+
+
 @router.delete("/{user_id}", response_model=dict)
 async def delete_user(
     user_id: int,
@@ -148,18 +218,25 @@ async def update_user_role(
     return user
 
 @router.get("/{username}", response_model=ProfileResponse)
-async def read_user(username: str,db: Session = Depends(get_db)):
+async def read_user(username: str,db: Session = Depends(get_db), conditional: Conditional = Depends(profile_policy)):
     """
     Retrieves the current authenticated user's information.
 
+    The users table has no update time, so the entity tag is built from the columns shown by the
+    profile. The profile holds the email address, so only the client may cache it.
+
     :param current_user: The current user object.
     :type current_user: User
+    :param conditional: Validator of the ``If-None-Match`` header.
+    :type conditional: Conditional
     :return: The current user's information.
     :rtype: UserDb
+    :raises NotModified: If the client already has the current profile.
     """
     profile = await repository_users.get_profile(username, db)
     if profile is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    conditional.check(entity_tag("user", *profile.values()))
     return profile
 
 @router.patch("/{username}", response_model=UserDb)
@@ -207,3 +284,44 @@ async def ban_user(username: str, db: Session = Depends(get_db),
     response = await repository_users.ban_user(username, current_user, db)
     return response
 
+
+@router.post("/{username}/follow", response_model=dict, status_code=status.HTTP_201_CREATED)
+async def follow_user(username: str, db: Session = Depends(get_db),
+                      current_user: User = Depends(auth_service.get_current_user)):
+    """
+    Follows a user, whose photos then appear in the home feed of the current user.
+
+    :param username: The username of the user to follow.
+    :type username: str
+    :param db: The database session dependency.
+    :type db: Session
+    :param current_user: The current authenticated user.
+    :type current_user: User
+    :return: A confirmation message and the follower count of the followed user.
+    :rtype: dict
+    :raises HTTPException: If the user is not found, is the current user or is already followed.
+    """
+    followee = await repository_follows.follow_user(current_user, username, db)
+    await feed_service.follow(db, current_user.id, followee)
+    return {"detail": f"You follow {username}", "follower_count": followee.follower_count}
+
+
+@router.delete("/{username}/follow", response_model=dict)
+async def unfollow_user(username: str, db: Session = Depends(get_db),
+                        current_user: User = Depends(auth_service.get_current_user)):
+    """
+    Stops following a user.
+
+    :param username: The username of the followed user.
+    :type username: str
+    :param db: The database session dependency.
+    :type db: Session
+    :param current_user: The current authenticated user.
+    :type current_user: User
+    :return: A confirmation message and the follower count of the formerly followed user.
+    :rtype: dict
+    :raises HTTPException: If the user is not found or not followed.
+    """
+    followee = await repository_follows.unfollow_user(current_user, username, db)
+    await feed_service.unfollow(db, current_user.id, followee)
+    return {"detail": f"You no longer follow {username}", "follower_count": followee.follower_count}
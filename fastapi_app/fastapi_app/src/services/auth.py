@@ -2,7 +2,6 @@ import pickle
 from typing import Optional
 from datetime import datetime, timedelta
 
-from redis import Redis
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
@@ -13,13 +12,14 @@ from fastapi_app.src.database.db import get_db
 from fastapi_app.src.repository import users as repository_users
 from fastapi_app.src.conf.config import settings
 from fastapi_app.src.database.models import User
+from fastapi_app.src.database.redis_db import InstrumentedSyncRedis
 
 class Auth:
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     SECRET_KEY = settings.secret_key
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    r = Redis(
+    r = InstrumentedSyncRedis(
         host=settings.redis_host,
         port=settings.redis_port,
         password=settings.redis_password,
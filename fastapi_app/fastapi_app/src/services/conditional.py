@@ -0,0 +1,115 @@
+import hashlib
+from typing import Iterable
+
+from fastapi import HTTPException, Request, Response, status
+
+
+class NotModified(HTTPException):
+    """
+    Answers a conditional GET whose ``If-None-Match`` matches the current entity tag with 304.
+
+    FastAPI sends exceptions with this status without a body, keeping the validator and caching headers.
+
+    :param headers: The ``ETag``, ``Cache-Control`` and ``Vary`` headers of the resource.
+    :type headers: dict
+    """
+
+    def __init__(self, headers: dict):
+        super().__init__(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+def entity_tag(*parts) -> str:
+    """
+    Builds a weak entity tag from the version of a resource, e.g. its ID and ``updated_at``.
+
+    The parts must change whenever the representation changes; they are hashed instead of the
+    body, so the tag is known before the body is serialized.
+
+    :param parts: The values identifying the version of the resource.
+    :return: The entity tag, e.g. ``W/"5d41402abc4b2a76b9719d91"``.
+    :rtype: str
+    """
+    digest = hashlib.blake2b("\x1f".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Compares an ``If-None-Match`` header with an entity tag, using the weak comparison GET requires.
+
+    :param if_none_match: The header value, a list of entity tags or ``*``.
+    :type if_none_match: str | None
+    :param etag: The current entity tag.
+    :type etag: str
+    :return: True if the client already has the current representation.
+    :rtype: bool
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+class Conditional:
+    """
+    Validator of one request, returned by :class:`CachePolicy`.
+
+    :param if_none_match: The ``If-None-Match`` header of the request.
+    :type if_none_match: str | None
+    :param response: The response whose headers FastAPI merges into the final response.
+    :type response: Response
+    :param headers: The caching headers of the route.
+    :type headers: dict
+    """
+
+    def __init__(self, if_none_match: str | None, response: Response, headers: dict):
+        self.if_none_match = if_none_match
+        self.response = response
+        self.headers = headers
+
+    def check(self, etag: str | None) -> None:
+        """
+        Tags the response, and ends the request with 304 if the client has the current representation.
+
+        Call it as soon as the version is known, before the body is loaded or serialized.
+
+        :param etag: The current entity tag, or None if it is unknown.
+        :type etag: str | None
+        :raises NotModified: If the ``If-None-Match`` header matches the tag.
+        """
+        if etag is None:
+            return
+        self.response.headers["ETag"] = etag
+        if etag_matches(self.if_none_match, etag):
+            raise NotModified(headers={**self.headers, "ETag": etag})
+
+
+class CachePolicy:
+    """
+    Dependency applying the ``Cache-Control`` and ``Vary`` policy of a route and validating conditional GETs.
+
+    Usage::
+
+        photo_policy = CachePolicy("public, no-cache")
+
+        @router.get("/{photo_id}")
+        async def read_photo(photo_id: int, conditional: Conditional = Depends(photo_policy)):
+            conditional.check(entity_tag("photo", photo_id, version))
+
+    :param cache_control: The ``Cache-Control`` header of the responses.
+    :type cache_control: str
+    :param vary: The request headers the representation depends on.
+    :type vary: Iterable[str]
+    """
+
+    def __init__(self, cache_control: str, vary: Iterable[str] = ("Accept-Encoding",)):
+        self.headers = {"Cache-Control": cache_control}
+        vary = ", ".join(vary)
+        if vary:
+            self.headers["Vary"] = vary
+
+    def __call__(self, request: Request, response: Response) -> Conditional:
+        response.headers.update(self.headers)
+        return Conditional(request.headers.get("if-none-match"), response, self.headers)
@@ -1,51 +1,178 @@
+import re
+import threading
+from collections import OrderedDict
+from email.message import EmailMessage
+from email.utils import formataddr
 from pathlib import Path
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup, escape
 from pydantic import EmailStr
 
-from fastapi_app.src.services.auth import auth_service
 from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.models import EmailOutbox
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.mail_username,
-    MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM=EmailStr(settings.mail_from),
-    MAIL_PORT=settings.mail_port,
-    MAIL_SERVER=settings.mail_server,
-    MAIL_FROM_NAME="fastapi app team",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
-)
+MAIL_FROM_NAME = "fastapi app team"
 
+# Variables that differ for every recipient, by template. They must only be printed as they
+# are, so the rest of the template is rendered once and cached with placeholders in their place.
+TEMPLATE_SLOTS = {
+    "email_template.html": ("username", "token"),
+}
 
-async def send_email(email: EmailStr, username: str, host: str):
+_SLOT_MARKER = re.compile("\x00([0-9]+)\x00")
+
+
+class EmailTemplates:
+    """
+    The email templates, compiled once and rendered through a bounded cache.
+
+    A render is cached by template and by the values of its variables other than the slots of
+    the template; the slots are escaped and filled into the cached render, so the confirmation
+    emails of all users share one render. Templates whose slots do not come out of the render as
+    they were passed, e.g. because they are used in a condition, are rendered every time.
+
+    :param folder: The folder of the templates.
+    :type folder: Path
+    :param slots: The per-recipient variables by template name.
+    :type slots: dict[str, tuple[str, ...]]
+    :param cache_size: Maximum number of cached renders, the least recently used are dropped.
+    :type cache_size: int
+    """
+
+    def __init__(self, folder: Path, slots: dict[str, tuple[str, ...]], cache_size: int):
+        self.environment = Environment(loader=FileSystemLoader(folder), autoescape=select_autoescape(),
+                                       auto_reload=False)
+        self.templates = {name: self.environment.get_template(name) for name in self.environment.list_templates()}
+        self.slots = slots
+        self.cache_size = cache_size
+        self._renders: OrderedDict[tuple, tuple[tuple[str, ...], tuple[str, ...]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _skeleton(self, name: str, slots: tuple[str, ...], context: dict) -> tuple[tuple[str, ...], tuple[str, ...]] | None:
+        """
+        Renders a template with placeholders in place of its slots.
+
+        :return: The text between the slots and the slot names in order, or None if the slots
+            do not come out of the render as they were passed.
+        """
+        markers = {slot: Markup(f"\x00{index}\x00") for index, slot in enumerate(slots)}
+        parts = _SLOT_MARKER.split(self.templates[name].render(**context, **markers))
+        filled = tuple(slots[int(index)] for index in parts[1::2])
+        if set(filled) != set(slots) or "\x00" in "".join(parts[::2]):
+            return None
+        return tuple(parts[::2]), filled
+
+    def render(self, name: str, context: dict) -> str:
+        """
+        Renders a template.
+
+        :param name: The template name, e.g. ``email_template.html``.
+        :type name: str
+        :param context: The variables of the template.
+        :type context: dict
+        :return: The rendered template.
+        :rtype: str
+        :raises KeyError: If there is no such template.
+        """
+        template = self.templates[name]
+        slots = tuple(slot for slot in self.slots.get(name, ()) if slot in context)
+        shared = {key: value for key, value in context.items() if key not in slots}
+        try:
+            key = (name, slots, tuple(sorted(shared.items())))
+            hash(key)
+        except TypeError:
+            return template.render(**context)
+        with self._lock:
+            skeleton = self._renders.get(key)
+            if skeleton is not None:
+                self._renders.move_to_end(key)
+        if skeleton is None:
+            skeleton = self._skeleton(name, slots, shared)
+            if skeleton is None:
+                return template.render(**context)
+            with self._lock:
+                self._renders[key] = skeleton
+                while len(self._renders) > self.cache_size:
+                    self._renders.popitem(last=False)
+        texts, filled = skeleton
+        quote = escape if self.environment.autoescape(name) else str
+        values = [str(quote(context[slot])) for slot in filled] + [""]
+        return "".join(text + value for text, value in zip(texts, values))
+
+    def render_many(self, items: list[tuple[str, dict]]) -> list[str]:
+        """
+        Renders many templates, e.g. a batch of the outbox.
+
+        :param items: The template names and their variables.
+        :type items: list[tuple[str, dict]]
+        :return: The rendered templates, in the order of the items.
+        :rtype: list[str]
+        """
+        return [self.render(name, context) for name, context in items]
+
+
+email_templates = EmailTemplates(Path(__file__).parent / 'templates', TEMPLATE_SLOTS,
+                                 settings.email_render_cache_size)
+
+
+def confirmation_email(email: EmailStr, username: str, host: str) -> EmailOutbox:
     """
-    Sends an email to the given email address with a confirmation link.
+    Builds the email with the confirmation link of a user, to be added to the outbox.
+
+    The token is created when the email is queued, so its lifetime starts with the request of the user.
 
     :param email: The email address of the recipient.
     :type email: EmailStr
     :param username: The username to include in the email.
     :type username: str
-    :param host: The hostname of the server hosting the application.
+    :param host: The base URL of the server hosting the application.
     :type host: str
-    :return: None
-    :raises ConnectionErrors: If there was an error connecting to the mail server.
-    """
-    try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email",
-            recipients=[email],
-            template_body={"host": host, "username": username, "token": token_verification},
-            subtype=MessageType.html
-        )
-
-        fm = FastMail(conf)
-        print('SEND EMAIL')
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err:
-        print(err)
+    :return: The unsaved outbox row.
+    :rtype: EmailOutbox
+    """
+    # Imported here: the auth service and the user repository import each other, which only works
+    # when the repository comes first, and the outbox worker imports this module on its own.
+    from fastapi_app.src.services.auth import auth_service
+
+    token_verification = auth_service.create_email_token({"sub": email})
+    return EmailOutbox(
+        recipient=email,
+        subject="Confirm your email",
+        template="email_template.html",
+        context={"host": str(host), "username": username, "token": token_verification},
+    )
+
+
+def _message(email: EmailOutbox, body: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr((MAIL_FROM_NAME, settings.mail_from))
+    message["To"] = email.recipient
+    message["Subject"] = email.subject
+    message.set_content(body, subtype="html")
+    return message
+
+
+def render_message(email: EmailOutbox) -> EmailMessage:
+    """
+    Renders an email of the outbox into a message ready to be sent.
+
+    :param email: The outbox row.
+    :type email: EmailOutbox
+    :return: The HTML message.
+    :rtype: EmailMessage
+    """
+    return _message(email, email_templates.render(email.template, email.context))
+
+
+def render_messages(emails: list[EmailOutbox]) -> list[EmailMessage]:
+    """
+    Renders a batch of emails of the outbox, see :func:`render_message`.
+
+    :param emails: The outbox rows.
+    :type emails: list[EmailOutbox]
+    :return: The HTML messages, in the order of the rows.
+    :rtype: list[EmailMessage]
+    """
+    bodies = email_templates.render_many([(email.template, email.context) for email in emails])
+    return [_message(email, body) for email, body in zip(emails, bodies)]
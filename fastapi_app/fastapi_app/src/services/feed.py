@@ -0,0 +1,262 @@
+import logging
+
+from redis.exceptions import RedisError
+from sqlalchemy.orm import Session
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.models import Photo, User
+from fastapi_app.src.database.redis_db import get_redis, run_script
+from fastapi_app.src.repository import follows as repository_follows
+
+logger = logging.getLogger(__name__)
+
+TIMELINE_KEY_PREFIX = "feed:timeline:"
+FOLLOWING_KEY_PREFIX = "feed:following:"
+POPULAR_KEY = "feed:popular"
+
+# Timelines, followings and the popular set end with a "0" member, so an empty one still exists
+# and a missing one means it has to be rebuilt from the database.
+SENTINEL = 0
+
+_FANOUT_CHUNK = 1000
+
+# Returns the IDs of a page of the timeline and the followed popular authors, or nil if the
+# timeline, the following set or the popular set is missing.
+_READ_SCRIPT = """
+if redis.call('EXISTS', KEYS[1], KEYS[2], KEYS[3]) < 3 then
+    return false
+end
+local before = tonumber(ARGV[1])
+if before == 0 then
+    before = math.huge
+end
+local limit = tonumber(ARGV[2])
+local ids = {}
+for _, id in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+    local value = tonumber(id)
+    if value > 0 and value < before then
+        ids[#ids + 1] = id
+        if #ids == limit then
+            break
+        end
+    end
+end
+return {ids, redis.call('SINTER', KEYS[2], KEYS[3])}
+"""
+
+# Adds a member to a set only if the set exists, so a lost set is not mistaken for a complete one.
+_ADD_EXISTING_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('SADD', KEYS[1], ARGV[1])
+end
+return 0
+"""
+
+# Adds a followed user to an existing following set and merges the IDs of their latest photos
+# (ARGV[3..]) into an existing timeline, which stays sorted newest first and capped.
+_FOLLOW_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('SADD', KEYS[2], ARGV[2])
+end
+if #ARGV < 3 or redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+local merged = {}
+local seen = {}
+for _, id in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+    local value = tonumber(id)
+    if value > 0 and not seen[value] then
+        seen[value] = true
+        merged[#merged + 1] = value
+    end
+end
+for i = 3, #ARGV do
+    local value = tonumber(ARGV[i])
+    if not seen[value] then
+        seen[value] = true
+        merged[#merged + 1] = value
+    end
+end
+table.sort(merged, function(a, b) return a > b end)
+local cap = tonumber(ARGV[1])
+local timeline = {}
+for i = 1, math.min(#merged, cap) do
+    timeline[i] = merged[i]
+end
+timeline[#timeline + 1] = 0
+redis.call('DEL', KEYS[1])
+redis.call('RPUSH', KEYS[1], unpack(timeline))
+return #timeline - 1
+"""
+
+
+class Feed:
+    """
+    Chronological home feed of the photos of the followed users, with hybrid fan-out.
+
+    A new photo is pushed on write to the timeline of every follower, a Redis list of photo IDs
+    capped at ``settings.feed_timeline_length``. Users with at least
+    ``settings.feed_fanout_threshold`` followers are popular: their photos are not pushed but
+    pulled by the readers, so one upload never writes to millions of lists. Reading a page costs
+    one script returning the timeline and the followed popular users, and one query loading both
+    kinds of photos. Timelines missing from Redis are rebuilt from the database on their first read.
+    """
+
+    def __init__(self):
+        self.length = settings.feed_timeline_length
+        self.threshold = settings.feed_fanout_threshold
+
+    @staticmethod
+    def timeline_key(user_id: int) -> str:
+        """
+        Returns the key of the timeline of a user, e.g. ``feed:timeline:42``.
+        """
+        return f"{TIMELINE_KEY_PREFIX}{user_id}"
+
+    @staticmethod
+    def following_key(user_id: int) -> str:
+        """
+        Returns the key of the set of users followed by a user, e.g. ``feed:following:42``.
+        """
+        return f"{FOLLOWING_KEY_PREFIX}{user_id}"
+
+    async def publish(self, db: Session, photo: Photo) -> None:
+        """
+        Pushes a new photo to the timelines of its author and, unless the author is popular, of their followers.
+
+        Only existing timelines are updated, the missing ones get the photo when they are rebuilt.
+
+        :param db: The database session.
+        :type db: Session
+        :param photo: The new photo.
+        :type photo: Photo
+        """
+        try:
+            redis = get_redis()
+            recipients = [photo.user_id]
+            if not await redis.sismember(POPULAR_KEY, photo.user_id):
+                recipients += repository_follows.follower_ids(db, photo.user_id)
+            for start in range(0, len(recipients), _FANOUT_CHUNK):
+                async with redis.pipeline(transaction=False) as pipe:
+                    for user_id in recipients[start:start + _FANOUT_CHUNK]:
+                        pipe.lpushx(self.timeline_key(user_id), photo.id)
+                        pipe.ltrim(self.timeline_key(user_id), 0, self.length - 1)
+                    await pipe.execute()
+        except RedisError as err:
+            logger.warning("Feed fan-out of photo %s failed: %s", photo.id, err)
+
+    async def follow(self, db: Session, follower_id: int, followee: User) -> None:
+        """
+        Adds the latest photos of a newly followed user to the timeline of the follower.
+
+        A user who reaches the popularity threshold becomes popular; the photos already pushed
+        to the timelines stay there and are deduplicated by the feed query.
+
+        :param db: The database session.
+        :type db: Session
+        :param follower_id: The ID of the following user.
+        :type follower_id: int
+        :param followee: The followed user, with the updated follower count.
+        :type followee: User
+        """
+        try:
+            popular = followee.follower_count >= self.threshold
+            if popular:
+                await run_script(_ADD_EXISTING_SCRIPT, keys=[POPULAR_KEY], args=[followee.id])
+            photo_ids = [] if popular else repository_follows.recent_photo_ids(db, [followee.id], self.length)
+            await run_script(_FOLLOW_SCRIPT, keys=[self.timeline_key(follower_id), self.following_key(follower_id)],
+                             args=[self.length, followee.id, *photo_ids])
+        except RedisError as err:
+            logger.warning("Feed update after user %s followed user %s failed: %s", follower_id, followee.id, err)
+
+    async def unfollow(self, db: Session, follower_id: int, followee: User) -> None:
+        """
+        Removes the photos of a user no longer followed from the timeline of the follower.
+
+        A popular user who falls below the threshold is pushed again: their latest photos are
+        merged into the timelines of their remaining followers.
+
+        :param db: The database session.
+        :type db: Session
+        :param follower_id: The ID of the following user.
+        :type follower_id: int
+        :param followee: The formerly followed user, with the updated follower count.
+        :type followee: User
+        """
+        try:
+            redis = get_redis()
+            photo_ids = repository_follows.recent_photo_ids(db, [followee.id], self.length)
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.srem(self.following_key(follower_id), followee.id)
+                for photo_id in photo_ids:
+                    pipe.lrem(self.timeline_key(follower_id), 0, photo_id)
+                await pipe.execute()
+            if followee.follower_count >= self.threshold or not await redis.srem(POPULAR_KEY, followee.id):
+                return
+            sha = await redis.script_load(_FOLLOW_SCRIPT)
+            followers = repository_follows.follower_ids(db, followee.id) if photo_ids else []
+            for start in range(0, len(followers), _FANOUT_CHUNK):
+                async with redis.pipeline(transaction=False) as pipe:
+                    for user_id in followers[start:start + _FANOUT_CHUNK]:
+                        pipe.evalsha(sha, 2, self.timeline_key(user_id), self.following_key(user_id),
+                                     self.length, followee.id, *photo_ids)
+                    await pipe.execute()
+        except RedisError as err:
+            logger.warning("Feed update after user %s unfollowed user %s failed: %s", follower_id, followee.id, err)
+
+    async def rebuild(self, db: Session, user_id: int) -> None:
+        """
+        Rebuilds the timeline and the following set of a user from the database, e.g. after a cold start of Redis.
+
+        The popular users are added to the popular set too, in case it was lost as well.
+
+        :param db: The database session.
+        :type db: Session
+        :param user_id: The ID of the user.
+        :type user_id: int
+        """
+        followees = repository_follows.followee_ids(db, user_id)
+        popular = set(repository_follows.popular_user_ids(db, self.threshold))
+        pushed = [user_id] + [followee for followee in followees if followee not in popular]
+        photo_ids = repository_follows.recent_photo_ids(db, pushed, self.length)
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.delete(self.timeline_key(user_id), self.following_key(user_id))
+            pipe.rpush(self.timeline_key(user_id), *photo_ids, SENTINEL)
+            pipe.sadd(self.following_key(user_id), *followees, SENTINEL)
+            pipe.sadd(POPULAR_KEY, *popular, SENTINEL)
+            await pipe.execute()
+
+    async def read(self, db: Session, user_id: int, before: int | None, limit: int) -> list[Photo]:
+        """
+        Returns a page of the home feed of a user.
+
+        If Redis is unavailable, the photos of all followed users are pulled from the database.
+
+        :param db: The database session.
+        :type db: Session
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param before: Only photos with a lower ID, i.e. the ID of the last photo of the previous page.
+        :type before: int | None
+        :param limit: Maximum number of photos.
+        :type limit: int
+        :return: The photos, newest first.
+        :rtype: list[Photo]
+        """
+        keys = [self.timeline_key(user_id), self.following_key(user_id), POPULAR_KEY]
+        args = [before or 0, limit]
+        try:
+            page = await run_script(_READ_SCRIPT, keys=keys, args=args)
+            if page is None:
+                await self.rebuild(db, user_id)
+                page = await run_script(_READ_SCRIPT, keys=keys, args=args)
+        except RedisError as err:
+            logger.warning("Reading the feed of user %s failed: %s", user_id, err)
+            authors = [user_id, *repository_follows.followee_ids(db, user_id)]
+            return repository_follows.feed_photos(db, [], authors, before, limit)
+        photo_ids, popular = page or ([], [])
+        authors = [int(author) for author in popular if int(author) != SENTINEL]
+        return repository_follows.feed_photos(db, [int(photo_id) for photo_id in photo_ids], authors, before, limit)
+
+
+feed_service = Feed()
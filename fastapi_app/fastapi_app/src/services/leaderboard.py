@@ -0,0 +1,294 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.db import SessionLocal
+from fastapi_app.src.database.models import Comment, Opinion, Photo
+from fastapi_app.src.database.redis_db import close_redis, get_redis, run_script
+
+logger = logging.getLogger(__name__)
+
+TRENDING_KEY = "leaderboard:trending"
+TRENDING_EPOCH_KEY = "leaderboard:trending:epoch"
+TOP_RATED_KEY_PREFIX = "leaderboard:top_rated:"
+
+# Trending scores use forward decay: an event at time t adds weight * 2^((t - epoch) / half_life),
+# so older events never have to be touched. The epoch is read inside the script, which keeps the
+# increments consistent with a concurrent compaction moving the epoch forward.
+_RECORD_SCRIPT = """
+local now = tonumber(ARGV[1])
+local epoch = tonumber(redis.call('GET', KEYS[2]) or '')
+if not epoch then
+    epoch = now
+    redis.call('SET', KEYS[2], ARGV[1])
+end
+local boost = tonumber(ARGV[3]) * math.pow(2, (now - epoch) / tonumber(ARGV[2]))
+if boost > 0 then
+    redis.call('ZINCRBY', KEYS[1], boost, ARGV[4])
+end
+if KEYS[3] then
+    if ARGV[5] == '' then
+        redis.call('ZREM', KEYS[3], ARGV[4])
+    else
+        redis.call('ZADD', KEYS[3], ARGV[5], ARGV[4])
+        redis.call('EXPIRE', KEYS[3], ARGV[6])
+    end
+end
+return 1
+"""
+
+# Rescales all trending scores to a new epoch (ZUNIONSTORE with a weight multiplies every score)
+# and trims members that decayed below the threshold or fell out of the leaderboard size.
+_COMPACT_SCRIPT = """
+local now = tonumber(ARGV[1])
+local epoch = tonumber(redis.call('GET', KEYS[2]) or '')
+if epoch then
+    local factor = math.pow(2, (epoch - now) / tonumber(ARGV[2]))
+    redis.call('ZUNIONSTORE', KEYS[1], 1, KEYS[1], 'WEIGHTS', factor)
+end
+redis.call('SET', KEYS[2], ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', '(' .. ARGV[3])
+redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -tonumber(ARGV[4]) - 1)
+return redis.call('ZCARD', KEYS[1])
+"""
+
+
+class Leaderboard:
+    """
+    Top rated and trending photo lists kept in Redis sorted sets.
+
+    Votes and comments update the sorted sets incrementally, so reading a leaderboard is a
+    single ``ZREVRANGE`` (O(log n + k)) instead of an aggregate over the database.
+    """
+
+    def __init__(self):
+        self.half_life = settings.leaderboard_half_life_hours * 3600
+
+    @staticmethod
+    def top_rated_key(moment: datetime | None = None) -> str:
+        """
+        Returns the key of the weekly top rated leaderboard.
+
+        :param moment: Any moment of the week, defaults to now.
+        :type moment: datetime | None
+        :return: The Redis key, e.g. ``leaderboard:top_rated:2024-W32``.
+        :rtype: str
+        """
+        year, week, _ = (moment or datetime.utcnow()).isocalendar()
+        return f"{TOP_RATED_KEY_PREFIX}{year}-W{week:02d}"
+
+    @staticmethod
+    def rating_score(rating_sum: int, rating_count: int) -> float:
+        """
+        Calculates the Bayesian average used to rank photos, so that a single five star vote
+        does not beat a photo with hundreds of good votes.
+
+        :param rating_sum: Sum of the votes of the photo.
+        :type rating_sum: int
+        :param rating_count: Number of votes of the photo.
+        :type rating_count: int
+        :return: The ranking score.
+        :rtype: float
+        """
+        prior_weight = settings.rating_prior_weight
+        return (rating_sum + settings.rating_prior_mean * prior_weight) / (rating_count + prior_weight)
+
+    async def record_vote(self, photo: Photo, new_vote: bool) -> None:
+        """
+        Updates the leaderboards after a vote was added, changed or withdrawn.
+
+        Only a new vote boosts the trending score, so repeating or withdrawing a vote can't push
+        a photo up; the top rated score follows every change.
+
+        :param photo: The rated photo with its updated rating aggregates.
+        :type photo: Photo
+        :param new_vote: Whether the vote was added, rather than changed or withdrawn.
+        :type new_vote: bool
+        """
+        score = self.rating_score(photo.rating_sum, photo.rating_count) if photo.rating_count else ""
+        weight = settings.trending_vote_weight if new_vote else 0
+        try:
+            await run_script(
+                _RECORD_SCRIPT,
+                keys=[TRENDING_KEY, TRENDING_EPOCH_KEY, self.top_rated_key()],
+                args=[time.time(), self.half_life, weight, photo.id, score,
+                      int(timedelta(weeks=2).total_seconds())],
+            )
+        except RedisError as err:
+            logger.warning("Leaderboard update for photo %s failed: %s", photo.id, err)
+
+    async def record_comment(self, photo_id: int) -> None:
+        """
+        Boosts the trending score of a photo after it was commented.
+
+        :param photo_id: The ID of the commented photo.
+        :type photo_id: int
+        """
+        try:
+            await run_script(
+                _RECORD_SCRIPT,
+                keys=[TRENDING_KEY, TRENDING_EPOCH_KEY],
+                args=[time.time(), self.half_life, settings.trending_comment_weight, photo_id],
+            )
+        except RedisError as err:
+            logger.warning("Leaderboard update for photo %s failed: %s", photo_id, err)
+
+    async def remove_photo(self, photo_id: int) -> None:
+        """
+        Removes a deleted photo from the leaderboards.
+
+        :param photo_id: The ID of the deleted photo.
+        :type photo_id: int
+        """
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                pipe.zrem(TRENDING_KEY, photo_id)
+                pipe.zrem(self.top_rated_key(), photo_id)
+                await pipe.execute()
+        except RedisError as err:
+            logger.warning("Leaderboard cleanup for photo %s failed: %s", photo_id, err)
+
+    async def top_rated(self, limit: int) -> list[tuple[int, float]]:
+        """
+        Returns the best rated photos voted on this week.
+
+        :param limit: Maximum number of photos.
+        :type limit: int
+        :return: Pairs of photo ID and score, best first.
+        :rtype: list[tuple[int, float]]
+        """
+        entries = await get_redis().zrevrange(self.top_rated_key(), 0, limit - 1, withscores=True)
+        return [(int(photo_id), score) for photo_id, score in entries]
+
+    async def trending(self, limit: int) -> list[tuple[int, float]]:
+        """
+        Returns the photos with the highest time-decayed activity.
+
+        :param limit: Maximum number of photos.
+        :type limit: int
+        :return: Pairs of photo ID and score, hottest first.
+        :rtype: list[tuple[int, float]]
+        """
+        entries = await get_redis().zrevrange(TRENDING_KEY, 0, limit - 1, withscores=True)
+        return [(int(photo_id), score) for photo_id, score in entries]
+
+    async def compact(self) -> int:
+        """
+        Moves the trending epoch to now and trims the trending leaderboard.
+
+        :return: Number of photos left in the trending leaderboard.
+        :rtype: int
+        """
+        return await run_script(
+            _COMPACT_SCRIPT,
+            keys=[TRENDING_KEY, TRENDING_EPOCH_KEY],
+            args=[time.time(), self.half_life, settings.leaderboard_min_score, settings.leaderboard_size],
+        )
+
+    async def run_compaction(self) -> None:
+        """
+        Compacts the trending leaderboard periodically. Meant to run as a background task of a worker.
+        """
+        while True:
+            await asyncio.sleep(settings.leaderboard_compaction_seconds)
+            try:
+                await self.compact()
+            except RedisError as err:
+                logger.warning("Leaderboard compaction failed: %s", err)
+
+    def _collect(self, db: Session, now: float) -> tuple[dict, dict]:
+        """
+        Calculates both leaderboards from the database.
+
+        :param db: The database session.
+        :type db: Session
+        :param now: The current time as a UNIX timestamp, used as the trending epoch.
+        :type now: float
+        :return: Trending and top rated scores by photo ID.
+        :rtype: tuple[dict, dict]
+        """
+        horizon = datetime.utcfromtimestamp(now) - timedelta(seconds=self.half_life * 10)
+        trending = defaultdict(float)
+        events = [
+            (db.query(Opinion.photo_id, Opinion.updated_at).filter(Opinion.updated_at >= horizon),
+             settings.trending_vote_weight),
+            (db.query(Comment.photo_id, Comment.created_at).filter(Comment.created_at >= horizon),
+             settings.trending_comment_weight),
+        ]
+        for query, weight in events:
+            for photo_id, moment in query.yield_per(1000):
+                age = now - (moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)).timestamp()
+                trending[photo_id] += weight * 2 ** (-age / self.half_life)
+
+        year, week, _ = datetime.utcfromtimestamp(now).isocalendar()
+        week_start = datetime.fromisocalendar(year, week, 1)
+        voted_this_week = db.query(Opinion.photo_id).filter(Opinion.updated_at >= week_start).distinct()
+        photos = db.query(Photo.id, Photo.rating_sum, Photo.rating_count).filter(
+            Photo.id.in_(voted_this_week), Photo.rating_count > 0
+        )
+        top_rated = {photo_id: self.rating_score(rating_sum, rating_count)
+                     for photo_id, rating_sum, rating_count in photos.yield_per(1000)}
+        return trending, top_rated
+
+    async def rebuild(self, db: Session) -> None:
+        """
+        Rebuilds both leaderboards from the database, e.g. after a cold start of Redis.
+
+        The sorted sets are replaced in a single MULTI transaction, so readers never see
+        a half-built leaderboard.
+
+        :param db: The database session.
+        :type db: Session
+        """
+        now = time.time()
+        trending, top_rated = await asyncio.to_thread(self._collect, db, now)
+        top_rated_key = self.top_rated_key(datetime.utcfromtimestamp(now))
+        best = dict(sorted(trending.items(), key=lambda item: item[1], reverse=True)[:settings.leaderboard_size])
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.delete(TRENDING_KEY, top_rated_key)
+            if best:
+                pipe.zadd(TRENDING_KEY, best)
+            if top_rated:
+                pipe.zadd(top_rated_key, top_rated)
+                pipe.expire(top_rated_key, timedelta(weeks=2))
+            pipe.set(TRENDING_EPOCH_KEY, now)
+            await pipe.execute()
+        logger.info("Leaderboards rebuilt: %s trending, %s top rated", len(best), len(top_rated))
+
+    async def rebuild_if_empty(self) -> None:
+        """
+        Rebuilds the leaderboards on a cold start, when neither of them exists in Redis.
+        """
+        try:
+            if await get_redis().exists(TRENDING_KEY, self.top_rated_key()):
+                return
+            db = SessionLocal()
+            try:
+                await self.rebuild(db)
+            finally:
+                db.close()
+        except (RedisError, SQLAlchemyError) as err:
+            logger.warning("Leaderboard rebuild failed: %s", err)
+
+
+leaderboard_service = Leaderboard()
+
+
+if __name__ == "__main__":
+    async def main():
+        db = SessionLocal()
+        try:
+            await leaderboard_service.rebuild(db)
+        finally:
+            db.close()
+            await close_redis()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
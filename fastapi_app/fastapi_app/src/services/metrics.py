@@ -0,0 +1,355 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Metric:
+    """
+    Base class of the metrics, exported in the Prometheus text format.
+
+    Every thread writes to its own shard, so updates never take a lock and never contend with
+    other threads; the shards are only summed when the metrics are scraped. The values are
+    per worker process, Prometheus aggregates the workers.
+
+    :param name: The metric name.
+    :type name: str
+    :param documentation: The help text.
+    :type documentation: str
+    :param labelnames: Names of the labels, the label values are passed as a tuple in the same order.
+    :type labelnames: tuple
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def _merged(self) -> dict:
+        merged = {}
+        with self._lock:
+            shards = [shard.copy() for shard in self._shards]
+        for shard in shards:
+            for labels, value in shard.items():
+                merged[labels] = self._add(merged.get(labels), value)
+        return merged
+
+    @staticmethod
+    def _add(total, value):
+        return value if total is None else total + value
+
+    def _labels(self, labels: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> list[str]:
+        """
+        Returns the sample lines of the metric, summed over all threads.
+
+        :return: The sample lines.
+        :rtype: list[str]
+        """
+        return [f"{self.name}{self._labels(labels)} {value}" for labels, value in sorted(self._merged().items())]
+
+    def render(self) -> str:
+        """
+        Renders the metric with its HELP and TYPE lines.
+
+        :return: The metric in the Prometheus text format.
+        :rtype: str
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """
+    A monotonically increasing value.
+    """
+    kind = "counter"
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        """
+        Adds to the value.
+
+        :param labels: The label values.
+        :type labels: tuple
+        :param amount: The increment.
+        :type amount: float
+        """
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down, e.g. the number of requests in flight.
+    """
+    kind = "gauge"
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        """
+        Adds to the value.
+
+        :param labels: The label values.
+        :type labels: tuple
+        :param amount: The increment.
+        :type amount: float
+        """
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def dec(self, labels: tuple = (), amount: float = 1) -> None:
+        """
+        Subtracts from the value.
+
+        :param labels: The label values.
+        :type labels: tuple
+        :param amount: The decrement.
+        :type amount: float
+        """
+        self.inc(labels, -amount)
+
+    def set(self, value: float, labels: tuple = ()) -> None:
+        """
+        Replaces the value. Only use it for gauges written by a single thread, e.g. the event loop,
+        since the shards of the other threads are still added to it.
+
+        :param value: The new value.
+        :type value: float
+        :param labels: The label values.
+        :type labels: tuple
+        """
+        self._shard()[labels] = value
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values in fixed buckets.
+
+    :param buckets: Upper bounds of the buckets, in ascending order.
+    :type buckets: tuple
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, labels: tuple = ()) -> None:
+        """
+        Records an observed value.
+
+        :param value: The observed value.
+        :type value: float
+        :param labels: The label values.
+        :type labels: tuple
+        """
+        shard = self._shard()
+        counts = shard.get(labels)
+        if counts is None:
+            # one slot per bucket, one for +Inf and the sum of the observed values
+            counts = shard[labels] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    @staticmethod
+    def _add(total, value):
+        return list(value) if total is None else [a + b for a, b in zip(total, value)]
+
+    def samples(self) -> list[str]:
+        lines = []
+        for labels, counts in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{self._labels(labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {counts[-1]}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {cumulative}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry: list[Metric] = []
+
+REQUESTS = Counter("http_requests_total", "Number of HTTP requests.", ("method", "route", "status"))
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "Number of HTTP requests being processed.")
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "Size of HTTP response bodies.", ("method", "route"),
+                          buckets=SIZE_BUCKETS)
+REQUEST_DB_QUERIES = Histogram("http_request_db_queries", "Number of database queries per HTTP request.",
+                               ("method", "route"), buckets=COUNT_BUCKETS)
+REQUEST_DB_DURATION = Histogram("http_request_db_duration_seconds", "Database time per HTTP request.",
+                                ("method", "route"))
+REQUEST_REDIS_CALLS = Histogram("http_request_redis_calls", "Number of Redis round trips per HTTP request.",
+                                ("method", "route"), buckets=COUNT_BUCKETS)
+REQUEST_REDIS_DURATION = Histogram("http_request_redis_duration_seconds", "Redis time per HTTP request.",
+                                   ("method", "route"))
+DB_QUERY_DURATION = Histogram("db_query_duration_seconds", "Duration of single database queries.")
+REDIS_CALL_DURATION = Histogram("redis_call_duration_seconds", "Duration of single Redis round trips.")
+ADMISSION_LIMIT = Gauge("admission_concurrency_limit", "Adaptive concurrency limit of the worker.")
+ADMISSION_QUEUED = Gauge("admission_queued_requests", "Number of requests waiting for admission.")
+ADMISSION_SHED = Counter("admission_shed_requests_total", "Number of requests shed by the admission control.",
+                         ("priority",))
+RATE_LIMITED = Counter("rate_limited_requests_total", "Number of requests refused by a rate limit.",
+                       ("limit", "layer"))
+EMAILS_SENT = Counter("outbox_emails_sent_total", "Number of emails delivered by the outbox worker.")
+EMAILS_FAILED = Counter("outbox_emails_failed_total", "Number of failed email deliveries.", ("outcome",))
+OUTBOX_BATCH_SIZE = Histogram("outbox_batch_size", "Number of emails claimed per batch.", buckets=COUNT_BUCKETS)
+OUTBOX_BATCH_DURATION = Histogram("outbox_batch_duration_seconds", "Time to claim, send and record a batch.")
+EMAIL_SEND_DURATION = Histogram("outbox_email_send_duration_seconds", "Duration of single SMTP deliveries.")
+
+
+class RequestStats:
+    """
+    Database and Redis usage of the request being processed.
+
+    :param scope: The ASGI scope of the request.
+    :type scope: Scope
+    """
+    __slots__ = ("scope", "db_queries", "db_time", "redis_calls", "redis_time")
+
+    def __init__(self, scope: Scope):
+        self.scope = scope
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.redis_calls = 0
+        self.redis_time = 0.0
+
+    @property
+    def route(self) -> str:
+        """
+        The path template of the matched route, e.g. ``/api/photos/photos/{photo_id}``.
+        """
+        route = self.scope.get("route")
+        return route.path if route is not None else "unmatched"
+
+
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+
+def record_db_query(duration: float) -> None:
+    """
+    Records a finished database query.
+
+    :param duration: The duration in seconds.
+    :type duration: float
+    """
+    DB_QUERY_DURATION.observe(duration)
+    stats = current_request.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_time += duration
+
+
+def record_redis_call(duration: float) -> None:
+    """
+    Records a finished Redis round trip.
+
+    :param duration: The duration in seconds.
+    :type duration: float
+    """
+    REDIS_CALL_DURATION.observe(duration)
+    stats = current_request.get()
+    if stats is not None:
+        stats.redis_calls += 1
+        stats.redis_time += duration
+
+
+def render() -> str:
+    """
+    Renders all metrics in the Prometheus text exposition format.
+
+    :return: The metrics.
+    :rtype: str
+    """
+    return "\n".join(metric.render() for metric in registry) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware measuring every HTTP request.
+
+    It is a plain ASGI middleware rather than a ``BaseHTTPMiddleware``, so it adds no extra task
+    or body buffering per request. Requests are labelled with the route template, never with the
+    raw path, to keep the number of series bounded.
+
+    :param app: The wrapped application.
+    :type app: ASGIApp
+    :param query_count_header: Adds the ``X-Query-Count`` and ``X-Query-Time-Ms`` headers with the
+        database usage of the request, meant for debugging.
+    :type query_count_header: bool
+    """
+
+    def __init__(self, app: ASGIApp, query_count_header: bool = False):
+        self.app = app
+        self.query_count_header = query_count_header
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status_code = 500
+        size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.query_count_header:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-query-count", str(stats.db_queries).encode()),
+                        (b"x-query-time-ms", f"{stats.db_time * 1000:.3f}".encode()),
+                    ]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            labels = (scope["method"], stats.route)
+            REQUESTS.inc(labels + (status_code,))
+            REQUEST_DURATION.observe(duration, labels)
+            RESPONSE_SIZE.observe(size, labels)
+            REQUEST_DB_QUERIES.observe(stats.db_queries, labels)
+            REQUEST_DB_DURATION.observe(stats.db_time, labels)
+            REQUEST_REDIS_CALLS.observe(stats.redis_calls, labels)
+            REQUEST_REDIS_DURATION.observe(stats.redis_time, labels)
+            current_request.reset(token)
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import signal
+import time
+from contextlib import suppress
+from email.message import EmailMessage
+
+from aiosmtplib import (
+    SMTP, SMTPAuthenticationError, SMTPException, SMTPRecipientsRefused, SMTPResponseException,
+    SMTPServerDisconnected
+)
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.db import SessionLocal
+from fastapi_app.src.repository import outbox as repository_outbox
+from fastapi_app.src.services.email import render_messages
+from fastapi_app.src.services.metrics import (
+    EMAIL_SEND_DURATION, EMAILS_FAILED, EMAILS_SENT, OUTBOX_BATCH_DURATION, OUTBOX_BATCH_SIZE, render
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPPool:
+    """
+    Pool of authenticated SMTP connections.
+
+    Connections are opened on demand, up to ``size`` at once, and kept open between batches, so
+    a burst of emails costs a handful of TLS handshakes and logins instead of one per email. A
+    connection the server closed while idle is replaced and the email sent again once.
+
+    :param hostname: The SMTP server.
+    :type hostname: str
+    :param port: The port of the SMTP server.
+    :type port: int
+    :param username: The login, None to send without authentication.
+    :type username: str | None
+    :param password: The password.
+    :type password: str | None
+    :param use_tls: Connects over implicit TLS, otherwise STARTTLS is used if the server offers it.
+    :type use_tls: bool
+    :param size: Maximum number of connections.
+    :type size: int
+    """
+
+    def __init__(self, hostname: str, port: int, username: str | None, password: str | None,
+                 use_tls: bool, size: int):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self._slots = asyncio.Semaphore(size)
+        self._idle: list[SMTP] = []
+
+    async def _connect(self) -> SMTP:
+        client = SMTP(hostname=self.hostname, port=self.port, username=self.username, password=self.password,
+                      use_tls=self.use_tls)
+        await client.connect()
+        return client
+
+    async def send(self, message: EmailMessage) -> None:
+        """
+        Sends a message over a pooled connection.
+
+        :param message: The message.
+        :type message: EmailMessage
+        :raises SMTPException: If the server refused the message or the connection failed.
+        """
+        async with self._slots:
+            client = self._idle.pop() if self._idle else await self._connect()
+            try:
+                try:
+                    await client.send_message(message)
+                except SMTPServerDisconnected:
+                    client.close()
+                    client = await self._connect()
+                    await client.send_message(message)
+            except (SMTPResponseException, SMTPRecipientsRefused):
+                # The server refused this message, the connection itself is still usable.
+                self._idle.append(client)
+                raise
+            except BaseException:
+                client.close()
+                raise
+            self._idle.append(client)
+
+    async def close(self) -> None:
+        """
+        Closes the idle connections.
+        """
+        while self._idle:
+            client = self._idle.pop()
+            with suppress(SMTPException, OSError):
+                await client.quit()
+            client.close()
+
+
+def is_permanent(err: Exception) -> bool:
+    """
+    Tells whether a failed delivery would fail again, i.e. the server answered with a 5xx code.
+
+    Authentication errors are not permanent: they come from the configuration of the worker,
+    not from the email.
+
+    :param err: The error of the delivery.
+    :type err: Exception
+    :return: True if the email should not be retried.
+    :rtype: bool
+    """
+    if isinstance(err, SMTPRecipientsRefused):
+        return all(recipient.code >= 500 for recipient in err.recipients)
+    if isinstance(err, SMTPAuthenticationError):
+        return False
+    return isinstance(err, SMTPResponseException) and err.code >= 500
+
+
+class OutboxWorker:
+    """
+    Delivers the emails of the outbox, as a process separate from the API workers.
+
+    Every batch is claimed in one transaction, sent concurrently over the SMTP pool and its
+    outcome recorded in a second transaction. The database work runs in a thread, so it does not
+    stall the deliveries in flight. While batches come back full the worker keeps going, otherwise
+    it polls the outbox every ``poll_seconds``.
+
+    :param pool: The SMTP connections, by default a pool configured from the settings.
+    :type pool: SMTPPool | None
+    :param session_factory: Creates the database sessions.
+    :type session_factory: sessionmaker
+    :param batch_size: Maximum number of emails per batch.
+    :type batch_size: int
+    :param poll_seconds: Interval between polls of an empty outbox.
+    :type poll_seconds: float
+    """
+
+    def __init__(self, pool: SMTPPool | None = None, session_factory: sessionmaker = SessionLocal,
+                 batch_size: int = settings.outbox_batch_size, poll_seconds: float = settings.outbox_poll_seconds):
+        self.pool = pool or SMTPPool(settings.mail_server, int(settings.mail_port), settings.mail_username,
+                                     settings.mail_password, settings.mail_ssl_tls, settings.outbox_smtp_connections)
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+
+    def _claim(self) -> list[tuple[int, EmailMessage]]:
+        with self.session_factory(expire_on_commit=False) as db:
+            emails = repository_outbox.claim_due(db, self.batch_size, settings.outbox_lease_seconds)
+            return list(zip([email.id for email in emails], render_messages(emails)))
+
+    def _record(self, sent: list[int], failures: dict[int, tuple[str, bool]]) -> int:
+        with self.session_factory() as db:
+            return repository_outbox.record_results(
+                db, sent, failures, settings.outbox_max_attempts, settings.outbox_backoff_seconds,
+                settings.outbox_backoff_max_seconds)
+
+    async def _send(self, message: EmailMessage) -> Exception | None:
+        start = time.perf_counter()
+        try:
+            await self.pool.send(message)
+        except (SMTPException, OSError) as err:
+            return err
+        finally:
+            EMAIL_SEND_DURATION.observe(time.perf_counter() - start)
+        return None
+
+    async def run_once(self) -> int:
+        """
+        Claims, sends and records one batch of due emails.
+
+        :return: Number of emails claimed.
+        :rtype: int
+        """
+        start = time.perf_counter()
+        batch = await asyncio.to_thread(self._claim)
+        OUTBOX_BATCH_SIZE.observe(len(batch))
+        if not batch:
+            return 0
+        errors = await asyncio.gather(*(self._send(message) for _, message in batch))
+        sent = [email_id for (email_id, _), err in zip(batch, errors) if err is None]
+        failures = {email_id: (str(err), is_permanent(err)) for (email_id, _), err in zip(batch, errors)
+                    if err is not None}
+        given_up = await asyncio.to_thread(self._record, sent, failures)
+        for err in filter(None, errors):
+            logger.warning("Sending an email failed: %s", err)
+        EMAILS_SENT.inc((), len(sent))
+        EMAILS_FAILED.inc(("retried",), len(failures) - given_up)
+        EMAILS_FAILED.inc(("given_up",), given_up)
+        OUTBOX_BATCH_DURATION.observe(time.perf_counter() - start)
+        return len(batch)
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """
+        Delivers emails until ``stop`` is set, then closes the SMTP connections.
+
+        :param stop: Set to finish the batch in progress and stop.
+        :type stop: asyncio.Event
+        """
+        try:
+            while not stop.is_set():
+                try:
+                    claimed = await self.run_once()
+                except SQLAlchemyError as err:
+                    logger.warning("Delivering the outbox failed: %s", err)
+                    claimed = 0
+                if claimed < self.batch_size:
+                    with suppress(asyncio.TimeoutError):
+                        await asyncio.wait_for(stop.wait(), self.poll_seconds)
+        finally:
+            await self.pool.close()
+
+
+async def serve_metrics(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    Answers any HTTP request with the metrics of the worker, for the Prometheus scraper.
+    """
+    try:
+        while (await reader.readline()).strip():
+            pass
+        body = render().encode()
+        writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                     + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def main() -> None:
+    """
+    Runs the outbox worker until SIGTERM or SIGINT, serving its metrics on ``settings.outbox_metrics_port``.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    server = await asyncio.start_server(serve_metrics, port=settings.outbox_metrics_port)
+    try:
+        await OutboxWorker().run(stop)
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -1,12 +1,35 @@
-from sqlalchemy.orm import Session
+from collections import Counter
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
 from uuid import UUID
-from fastapi_app.src.database.models import Photo
+from fastapi_app.src.database.models import Photo, Comment, Tag
 from fastapi_app.src.database.db import SessionLocal
+from fastapi_app.src.repository.counters import update_user_counters
+from fastapi_app.src.services.cache import photo_cache
+from fastapi_app.src.services.search_cache import photo_dependency, search_cache, tag_dependency
+from fastapi_app.src.services.tag_index import tag_index
+
+
+def photo_data(photo: Photo) -> dict:
+    """
+    Build the cached form of a photo: its columns and its tags.
+
+    The tags of a photo are set when it is created, so they do not need invalidating.
+
+    :param photo: The photo.
+    :type photo: Photo
+    :return: The columns of the photo and the columns of its tags under ``tags``.
+    :rtype: dict
+    """
+    data = {column.key: getattr(photo, column.key) for column in Photo.__table__.columns}
+    data["tags"] = [{column.key: getattr(tag, column.key) for column in Tag.__table__.columns} for tag in photo.tags]
+    return data
 
     
 class PhotoService:
     @staticmethod
-    def save(db: Session, photo: Photo) -> Photo:
+    async def save(db: Session, photo: Photo) -> Photo:
         """
         Save a new photo to the database.
 
@@ -18,12 +41,18 @@ class PhotoService:
         :rtype: Photo
         """
         db.add(photo)
+        update_user_counters(db, photo.user_id, photo_count=1)
         db.commit()
         db.refresh(photo)
+        # a lookup of the ID before it existed may have cached a miss
+        await photo_cache.invalidate(photo.id)
+        await search_cache.invalidate(*(tag_dependency(tag.id) for tag in photo.tags))
+        await search_cache.invalidate_description(photo.description)
+        tag_index.record(Counter(tag.name for tag in photo.tags))
         return photo
 
     @staticmethod
-    def update(db: Session, photo_id: int, description: str) -> Photo:
+    async def update(db: Session, photo_id: int, description: str) -> Photo:
         """
         Update the description of a photo by its ID.
 
@@ -41,13 +70,16 @@ class PhotoService:
         if photo:
             photo.description = description
             db.commit()
+            await photo_cache.invalidate(photo_id)
+            await search_cache.invalidate(photo_dependency(photo_id))
+            await search_cache.invalidate_description(description)
             db.refresh(photo)
         else:
             raise FileNotFoundError(f"Photo with ID {photo_id} not found")
         return photo
 
     @staticmethod
-    def delete(db: Session, photo_id: int) -> None:
+    async def delete(db: Session, photo_id: int) -> None:
         """
         Delete a photo by its ID.
 
@@ -61,8 +93,20 @@ class PhotoService:
         """
         photo = db.query(Photo).filter(Photo.id == photo_id).first()
         if photo:
+            update_user_counters(db, photo.user_id, photo_count=-1, votes_received=-photo.rating_count)
+            comment_authors = (
+                db.query(Comment.user_id, func.count(Comment.id))
+                .filter(Comment.photo_id == photo_id)
+                .group_by(Comment.user_id)
+            )
+            for author_id, comments in comment_authors:
+                update_user_counters(db, author_id, comment_count=-comments)
+            tags = Counter(tag.name for tag in photo.tags)
             db.delete(photo)
             db.commit()
+            tag_index.record({name: -count for name, count in tags.items()})
+            await photo_cache.invalidate(photo_id)
+            await search_cache.invalidate(photo_dependency(photo_id))
         else:
             raise FileNotFoundError(f"Photo with ID {photo_id} not found")
 
@@ -82,4 +126,54 @@ class PhotoService:
         photo = db.query(Photo).filter(Photo.id == photo_id).first()
         if not photo:
             raise FileNotFoundError(f"Photo with ID {photo_id} not found")
-        return photo
\ No newline at end of file
+        return photo
+
+    @staticmethod
+    @photo_cache.cached(key=lambda db, photo_id: photo_id, not_found=FileNotFoundError)
+    def get_cached(db: Session, photo_id: int) -> dict:
+        """
+        Retrieve a photo by its ID through the photo cache.
+
+        Writes to the photo must await ``photo_cache.invalidate(photo_id)`` after committing.
+
+        :param db: The database session, only used on a cache miss.
+        :type db: Session
+        :param photo_id: The ID of the photo to retrieve.
+        :type photo_id: int
+        :return: The columns and the tags of the photo as JSON-compatible data.
+        :rtype: dict
+        :raises FileNotFoundError: If the photo is not found.
+        """
+        return photo_data(PhotoService.get(db, photo_id))
+
+    @staticmethod
+    def get_many(db: Session, photo_ids: list[int]) -> dict[int, dict | FileNotFoundError]:
+        """
+        Retrieve many photos with one query, their tags loaded with a second one.
+
+        :param db: The database session.
+        :type db: Session
+        :param photo_ids: The IDs of the photos to retrieve.
+        :type photo_ids: list[int]
+        :return: The cached form of every photo, see :func:`photo_data`, or a FileNotFoundError for the missing ones, by ID.
+        :rtype: dict[int, dict | FileNotFoundError]
+        """
+        photos = db.query(Photo).options(selectinload(Photo.tags)).filter(Photo.id.in_(photo_ids)).all()
+        found = {photo.id: photo_data(photo) for photo in photos}
+        return {photo_id: found.get(photo_id) or FileNotFoundError(f"Photo with ID {photo_id} not found")
+                for photo_id in photo_ids}
+
+    @staticmethod
+    async def get_many_cached(db: Session, photo_ids: list[int]) -> list[dict | FileNotFoundError]:
+        """
+        Retrieve many photos through the photo cache, the misses with :meth:`get_many`.
+
+        :param db: The database session, only used on cache misses.
+        :type db: Session
+        :param photo_ids: The IDs of the photos to retrieve.
+        :type photo_ids: list[int]
+        :return: The photos as in :meth:`get_cached`, or a FileNotFoundError for the missing ones, in the order of the IDs.
+        :rtype: list[dict | FileNotFoundError]
+        """
+        return await photo_cache.get_many(photo_ids, lambda misses: PhotoService.get_many(db, misses),
+                                          FileNotFoundError)
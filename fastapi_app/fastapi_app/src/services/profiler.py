@@ -0,0 +1,224 @@
+import hashlib
+import hmac
+import logging
+import sys
+import threading
+import time
+import uuid
+
+from redis.exceptions import RedisError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.redis_db import get_redis
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_KEY_PREFIX = "profile:"
+
+# Leaf frames of threads waiting for work: the event loop polling its sockets and idle pool threads.
+_IDLE_FRAMES = {("selectors.py", "select"), ("threading.py", "wait"), ("queue.py", "get")}
+
+# Only one profiler samples a worker at a time, overlapping profiles would distort each other.
+_busy = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """
+    Raised when a profiler is already running on this worker.
+    """
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling the Python stacks of all threads of the worker.
+
+    A background thread reads ``sys._current_frames()`` every ``interval`` seconds, so the
+    profiled code runs unmodified and the overhead is bounded by the sampling rate, unlike
+    ``cProfile`` which hooks every call. The result is in the collapsed stack format read by
+    ``flamegraph.pl`` and speedscope: one ``frame;frame;frame count`` line per distinct stack.
+
+    :param interval: Time between two samples in seconds.
+    :type interval: float
+    :param include_idle: Also count the samples of threads waiting for work.
+    :type include_idle: bool
+    :param max_depth: Maximum number of frames kept per stack, the outermost ones are cut.
+    :type max_depth: int
+    """
+
+    def __init__(self, interval: float = 0.005, include_idle: bool = False, max_depth: int = 128):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.max_depth = max_depth
+        self.stacks: dict[str, int] = {}
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """
+        Starts sampling.
+
+        :raises ProfilerBusy: If another profiler is running on this worker.
+        """
+        if not _busy.acquire(blocking=False):
+            raise ProfilerBusy()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops sampling and waits for the sampling thread to finish.
+        """
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+        _busy.release()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self._sample(names.get(ident, str(ident)), frame)
+            self.samples += 1
+
+    def _sample(self, thread_name: str, frame) -> None:
+        code = frame.f_code
+        if not self.include_idle and (code.co_filename.rsplit("/", 1)[-1], code.co_name) in _IDLE_FRAMES:
+            return
+        frames = []
+        while frame is not None and len(frames) < self.max_depth:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})".replace(";", ":"))
+            frame = frame.f_back
+        frames.append(thread_name.replace(";", ":").replace(" ", "_"))
+        stack = ";".join(reversed(frames))
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def collapsed(self) -> str:
+        """
+        Returns the profile in the collapsed stack format, rooted at the thread names.
+
+        :return: One ``frame;frame;frame count`` line per distinct stack.
+        :rtype: str
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+def _signature(method: str, path: str, expires: int) -> str:
+    message = f"{method.upper()} {path} {expires}".encode()
+    return hmac.new(settings.secret_key.encode(), message, hashlib.sha256).hexdigest()
+
+
+def sign_request(method: str, path: str, ttl: int = 300) -> str:
+    """
+    Creates the value of the ``X-Profile`` header that enables profiling of one endpoint.
+
+    :param method: The HTTP method of the profiled requests.
+    :type method: str
+    :param path: The path of the profiled requests, without the query string.
+    :type path: str
+    :param ttl: Validity of the signature in seconds.
+    :type ttl: int
+    :return: The header value, ``<expires>:<signature>``.
+    :rtype: str
+    """
+    expires = int(time.time()) + ttl
+    return f"{expires}:{_signature(method, path, expires)}"
+
+
+def verify_request(method: str, path: str, value: str) -> bool:
+    """
+    Checks the ``X-Profile`` header of a request.
+
+    :param method: The HTTP method of the request.
+    :type method: str
+    :param path: The path of the request.
+    :type path: str
+    :param value: The header value.
+    :type value: str
+    :return: True if the signature matches the request and has not expired.
+    :rtype: bool
+    """
+    expires, _, signature = value.partition(":")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _signature(method, path, int(expires)))
+
+
+async def save_profile(profile_id: str, profile: str) -> None:
+    """
+    Stores a request profile in Redis, so it can be fetched through any worker.
+
+    :param profile_id: The ID of the profile.
+    :type profile_id: str
+    :param profile: The profile in the collapsed stack format.
+    :type profile: str
+    """
+    try:
+        await get_redis().set(f"{PROFILE_KEY_PREFIX}{profile_id}", profile, ex=settings.profile_ttl_seconds)
+    except RedisError as err:
+        logger.warning("Saving profile %s failed: %s", profile_id, err)
+
+
+async def load_profile(profile_id: str) -> str | None:
+    """
+    Fetches a stored request profile.
+
+    :param profile_id: The ID of the profile.
+    :type profile_id: str
+    :return: The profile in the collapsed stack format, or None if it does not exist or expired.
+    :rtype: str | None
+    """
+    return await get_redis().get(f"{PROFILE_KEY_PREFIX}{profile_id}")
+
+
+class ProfilerMiddleware:
+    """
+    ASGI middleware profiling the requests that carry a valid ``X-Profile`` header.
+
+    The profile is stored under the ID returned in the ``X-Profile-Id`` response header. It samples
+    the whole worker for the duration of the request, so it is clearest when the worker is not busy
+    with other requests. A request arriving while another profiler runs is served unprofiled.
+
+    :param app: The wrapped application.
+    :type app: ASGIApp
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        header = None
+        if scope["type"] == "http":
+            header = dict(scope["headers"]).get(PROFILE_HEADER.lower().encode())
+        if header is None or not verify_request(scope["method"], scope["path"], header.decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler(settings.profiler_request_interval_ms / 1000)
+        try:
+            profiler.start()
+        except ProfilerBusy:
+            await self.app(scope, receive, send)
+            return
+        profile_id = uuid.uuid4().hex
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER.lower().encode(), profile_id.encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            await save_profile(profile_id, profiler.collapsed())
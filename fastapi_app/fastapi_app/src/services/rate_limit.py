@@ -0,0 +1,283 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from fastapi import Depends, HTTPException, Request, status
+from redis.exceptions import RedisError
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.models import User
+from fastapi_app.src.database.redis_db import run_script
+from fastapi_app.src.services.auth import auth_service
+from fastapi_app.src.services.metrics import RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+# A bucket is a hash of the tokens left and the time of the last refill in milliseconds. It is
+# refilled for the elapsed time, charged if it holds enough tokens, and expires once it would be full.
+_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+tokens = math.min(capacity, tokens + elapsed * rate)
+local allowed = 0
+local retry = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry = math.ceil((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+local reset = math.ceil((capacity - tokens) / rate)
+redis.call('PEXPIRE', KEYS[1], reset + 1000)
+return {allowed, math.floor(tokens), retry, reset}
+"""
+
+
+class Rule(NamedTuple):
+    """
+    A limit of ``times`` requests per ``seconds``, refilled continuously.
+
+    :param times: The capacity of the bucket, i.e. the allowed burst.
+    :type times: int
+    :param seconds: The time to refill the bucket from empty.
+    :type seconds: float
+    """
+    times: int
+    seconds: float
+
+    @property
+    def rate(self) -> float:
+        """
+        The refill rate in tokens per millisecond.
+        """
+        return self.times / (self.seconds * 1000)
+
+
+class Decision(NamedTuple):
+    """
+    The outcome of taking a token.
+
+    :param allowed: Whether the request may proceed.
+    :type allowed: bool
+    :param remaining: Whole tokens left in the bucket.
+    :type remaining: int
+    :param retry_after_ms: Time until the next token, 0 if the request is allowed.
+    :type retry_after_ms: int
+    :param reset_ms: Time until the bucket is full again.
+    :type reset_ms: int
+    """
+    allowed: bool
+    remaining: int
+    retry_after_ms: int
+    reset_ms: int
+
+
+def parse_rules(value: str) -> dict[str, Rule]:
+    """
+    Parses the limits configured in ``settings.rate_limits``.
+
+    :param value: Comma-separated limits, e.g. ``login=5/60,upload=20/3600``.
+    :type value: str
+    :return: The rules by name.
+    :rtype: dict[str, Rule]
+    :raises ValueError: If a limit is malformed.
+    """
+    rules = {}
+    for item in filter(None, (item.strip() for item in value.split(","))):
+        name, _, limit = item.partition("=")
+        times, _, seconds = limit.partition("/")
+        rules[name.strip()] = Rule(int(times), float(seconds))
+    return rules
+
+
+class LocalBuckets:
+    """
+    In-process token buckets checked before Redis.
+
+    A local bucket has the same capacity and rate as the shared one but only sees the requests
+    of this worker, so when it is empty the shared bucket is empty too and the request is refused
+    without a Redis round trip. Clients within their limit always reach Redis, which keeps the
+    limit exact across workers.
+
+    :param max_size: Maximum number of buckets kept, the least recently used are dropped.
+    :type max_size: int
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rule: Rule, now: float) -> Decision:
+        """
+        Takes a token from a local bucket.
+
+        :param key: The bucket key.
+        :type key: str
+        :param rule: The limit.
+        :type rule: Rule
+        :param now: The current time in milliseconds.
+        :type now: float
+        :return: The outcome.
+        :rtype: Decision
+        """
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(rule.times), now]
+                while len(self._buckets) > self.max_size:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(rule.times, bucket[0] + max(0.0, now - bucket[1]) * rule.rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                return Decision(False, 0, math.ceil((1 - bucket[0]) / rule.rate),
+                                math.ceil((rule.times - bucket[0]) / rule.rate))
+            bucket[0] -= 1
+            return Decision(True, int(bucket[0]), 0, math.ceil((rule.times - bucket[0]) / rule.rate))
+
+
+local_buckets = LocalBuckets(settings.rate_limit_local_size)
+
+
+async def take_token(name: str, identity: str, rule: Rule) -> Decision:
+    """
+    Takes a token from the bucket of a client, locally first and then atomically in Redis.
+
+    If Redis is unavailable the request is allowed, the local bucket still stops the heaviest clients.
+
+    :param name: The name of the limit, e.g. ``login``.
+    :type name: str
+    :param identity: The client, e.g. ``ip:10.0.0.1`` or ``user:42``.
+    :type identity: str
+    :param rule: The limit.
+    :type rule: Rule
+    :return: The outcome.
+    :rtype: Decision
+    """
+    key = f"ratelimit:{name}:{identity}"
+    now = time.time() * 1000
+    local = local_buckets.take(key, rule, now)
+    if not local.allowed:
+        RATE_LIMITED.inc((name, "local"))
+        return local
+    try:
+        allowed, remaining, retry_after, reset = await run_script(
+            _TOKEN_BUCKET_SCRIPT, keys=[key], args=[rule.times, rule.rate, now])
+    except RedisError as err:
+        logger.warning("Checking the %s rate limit failed: %s", name, err)
+        return local
+    if not allowed:
+        RATE_LIMITED.inc((name, "redis"))
+    return Decision(bool(allowed), remaining, retry_after, reset)
+
+
+class RateLimiter:
+    """
+    Dependency limiting the requests of every client IP address to a route.
+
+    The limits are configured by name in ``settings.rate_limits``; limiting is skipped when
+    ``settings.rate_limit_enabled`` is false or the name is not configured. Every response of a
+    limited route carries the ``RateLimit-Limit``, ``RateLimit-Remaining``, ``RateLimit-Reset`` and
+    ``RateLimit-Policy`` headers, added by :class:`RateLimitHeadersMiddleware`; refused requests get
+    429 with ``Retry-After``.
+
+    :param name: The name of the limit.
+    :type name: str
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    async def __call__(self, request: Request) -> None:
+        host = request.client.host if request.client else "unknown"
+        await self.limit(f"ip:{host}", request)
+
+    async def limit(self, identity: str, request: Request) -> None:
+        """
+        Charges a request of a client and keeps the rate-limit headers on ``request.state``.
+
+        The headers are not set on the response of the route, which error responses and responses
+        built by the route itself would not carry.
+
+        :param identity: The client.
+        :type identity: str
+        :param request: The request.
+        :type request: Request
+        :raises HTTPException: 429 if the client exhausted its limit.
+        """
+        rule = rate_limit_rules.get(self.name)
+        if not settings.rate_limit_enabled or rule is None:
+            return
+        decision = await take_token(self.name, identity, rule)
+        headers = {
+            "RateLimit-Limit": str(rule.times),
+            "RateLimit-Remaining": str(decision.remaining),
+            "RateLimit-Reset": str(math.ceil(decision.reset_ms / 1000)),
+            "RateLimit-Policy": f"{rule.times};w={rule.seconds:g}",
+        }
+        request.state.rate_limit_headers = headers
+        if not decision.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(decision.retry_after_ms / 1000)))
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many requests",
+                                headers=headers)
+
+
+class UserRateLimiter(RateLimiter):
+    """
+    Dependency limiting the requests of every authenticated user to a route, see :class:`RateLimiter`.
+
+    It depends on ``auth_service.get_current_user`` like the routes it protects, so the user is
+    only resolved once per request.
+    """
+
+    async def __call__(self, request: Request, current_user: User = Depends(auth_service.get_current_user)) -> None:
+        await self.limit(f"user:{current_user.id}", request)
+
+
+class RateLimitHeadersMiddleware:
+    """
+    ASGI middleware adding the rate-limit headers a limiter kept on ``request.state`` to the response.
+
+    It sees every response of a limited route, including the error responses of the exception
+    handlers and the responses a route returns itself, e.g. the 401 of a failed login. Headers
+    the response already has are left alone.
+
+    :param app: The wrapped application.
+    :type app: ASGIApp
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # created here, so the copies of the scope made by the router share it
+        state = scope.setdefault("state", {})
+
+        async def send_wrapper(message: Message) -> None:
+            limit_headers = state.get("rate_limit_headers")
+            if message["type"] == "http.response.start" and limit_headers:
+                headers = MutableHeaders(scope=message)
+                for name, value in limit_headers.items():
+                    if name not in headers:
+                        headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+rate_limit_rules = parse_rules(settings.rate_limits)
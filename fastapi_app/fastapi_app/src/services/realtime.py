@@ -0,0 +1,214 @@
+import asyncio
+import json
+import logging
+from collections import deque
+
+from redis.exceptions import RedisError
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.redis_db import get_redis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "photo:"
+CHANNEL_SUFFIX = ":events"
+
+
+def channel(photo_id: int) -> str:
+    """
+    Returns the Redis pub/sub channel of the events of a photo.
+
+    :param photo_id: The ID of the photo.
+    :type photo_id: int
+    :return: The channel name.
+    :rtype: str
+    """
+    return f"{CHANNEL_PREFIX}{photo_id}{CHANNEL_SUFFIX}"
+
+
+async def publish(photo_id: int, event_type: str, data: dict | str) -> None:
+    """
+    Publishes an event of a photo to all workers.
+
+    Publishing is best effort: a Redis failure is logged and never fails the write that caused the event.
+
+    :param photo_id: The ID of the photo.
+    :type photo_id: int
+    :param event_type: The type of the event, e.g. ``comment_created``.
+    :type event_type: str
+    :param data: The event payload, as a dict or an already serialized JSON object.
+    :type data: dict | str
+    """
+    payload = data if isinstance(data, str) else json.dumps(data, default=str)
+    message = f'{{"type": {json.dumps(event_type)}, "photo_id": {photo_id}, "data": {payload}}}'
+    try:
+        await get_redis().publish(channel(photo_id), message)
+    except RedisError as err:
+        logger.warning("Publishing %s of photo %s failed: %s", event_type, photo_id, err)
+
+
+class Subscriber:
+    """
+    A bounded mailbox of one realtime connection.
+
+    Messages are shared, already serialized strings, so an idle subscriber costs only its
+    empty deque and event. When a slow consumer exceeds the message or byte limit, the oldest
+    messages are dropped and the subscriber is told it lagged, so it can re-fetch the photo
+    instead of the worker buffering without bound.
+    """
+    __slots__ = ("messages", "size", "dropped", "ready")
+
+    def __init__(self):
+        self.messages = deque()
+        self.size = 0
+        self.dropped = 0
+        self.ready = asyncio.Event()
+
+    def push(self, message: str) -> None:
+        """
+        Queues a message, dropping the oldest ones when the limits are exceeded.
+
+        :param message: The serialized event.
+        :type message: str
+        """
+        self.messages.append(message)
+        self.size += len(message)
+        while self.messages and (len(self.messages) > settings.realtime_max_queue_messages
+                                 or self.size > settings.realtime_max_queue_bytes):
+            self.size -= len(self.messages.popleft())
+            self.dropped += 1
+        self.ready.set()
+
+    async def next_batch(self, timeout: float) -> list[str]:
+        """
+        Waits for queued messages and takes all of them.
+
+        :param timeout: Maximum waiting time in seconds.
+        :type timeout: float
+        :return: The queued messages, preceded by a ``lagged`` event if some were dropped.
+            An empty list means the timeout expired.
+        :rtype: list[str]
+        """
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        batch = list(self.messages)
+        if self.dropped:
+            batch.insert(0, json.dumps({"type": "lagged", "dropped": self.dropped}))
+        self.messages.clear()
+        self.size = 0
+        self.dropped = 0
+        self.ready.clear()
+        return batch
+
+
+class PhotoEventHub:
+    """
+    Fans photo events out from Redis to the realtime connections of this worker.
+
+    The worker holds one pub/sub connection, subscribed only to the photos that have local
+    subscribers, and a single reader task that hands every message to the subscribers' mailboxes.
+    """
+
+    def __init__(self):
+        self.subscribers: dict[int, set[Subscriber]] = {}
+        self.count = 0
+        self._pubsub = None
+        self._reader = None
+        self._lock = asyncio.Lock()
+
+    def is_full(self) -> bool:
+        """
+        Tells whether the worker reached its limit of realtime connections.
+
+        :return: True if no more subscribers should be accepted.
+        :rtype: bool
+        """
+        return self.count >= settings.realtime_max_subscribers
+
+    async def subscribe(self, photo_id: int) -> Subscriber:
+        """
+        Registers a new subscriber of the events of a photo.
+
+        :param photo_id: The ID of the photo.
+        :type photo_id: int
+        :return: The subscriber's mailbox.
+        :rtype: Subscriber
+        """
+        subscriber = Subscriber()
+        async with self._lock:
+            subscribers = self.subscribers.setdefault(photo_id, set())
+            if not subscribers:
+                if self._pubsub is None:
+                    self._pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                await self._pubsub.subscribe(channel(photo_id))
+                if self._reader is None or self._reader.done():
+                    self._reader = asyncio.create_task(self._read())
+            subscribers.add(subscriber)
+            self.count += 1
+        return subscriber
+
+    async def unsubscribe(self, photo_id: int, subscriber: Subscriber) -> None:
+        """
+        Removes a subscriber, unsubscribing from the photo's channel when it was the last one.
+
+        :param photo_id: The ID of the photo.
+        :type photo_id: int
+        :param subscriber: The subscriber's mailbox.
+        :type subscriber: Subscriber
+        """
+        async with self._lock:
+            subscribers = self.subscribers.get(photo_id)
+            if subscribers is None or subscriber not in subscribers:
+                return
+            subscribers.discard(subscriber)
+            self.count -= 1
+            if not subscribers:
+                del self.subscribers[photo_id]
+                try:
+                    await self._pubsub.unsubscribe(channel(photo_id))
+                except RedisError as err:
+                    logger.warning("Unsubscribing from photo %s failed: %s", photo_id, err)
+
+    def dispatch(self, channel_name: str, message: str) -> None:
+        """
+        Hands a message received from Redis to the subscribers of its photo.
+
+        :param channel_name: The channel the message was published to.
+        :type channel_name: str
+        :param message: The serialized event.
+        :type message: str
+        """
+        photo_id = int(channel_name[len(CHANNEL_PREFIX):-len(CHANNEL_SUFFIX)])
+        for subscriber in self.subscribers.get(photo_id, ()):
+            subscriber.push(message)
+
+    async def _read(self) -> None:
+        """
+        Reads the pub/sub connection until the hub is closed, reconnecting after Redis errors.
+        """
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+                if message is not None and message["type"] == "message":
+                    self.dispatch(message["channel"], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except RedisError as err:
+                logger.warning("Realtime pub/sub connection failed: %s", err)
+                await asyncio.sleep(1.0)
+
+    async def close(self) -> None:
+        """
+        Stops the reader task and closes the pub/sub connection.
+        """
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+            self._pubsub = None
+
+
+photo_event_hub = PhotoEventHub()
@@ -0,0 +1,293 @@
+import asyncio
+import logging
+import math
+import os
+from collections import OrderedDict
+from itertools import combinations
+
+import numpy as np
+from sqlalchemy.exc import SQLAlchemyError
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.db import SessionLocal
+from fastapi_app.src.repository.tags import iter_taggings, tag_names, taggings_after
+
+logger = logging.getLogger(__name__)
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+def build_snapshot(path: str, batch_size: int) -> None:
+    """
+    Computes the co-occurrence matrix of all the tags from ``photo_tag`` and saves it as a snapshot.
+
+    With A the photos x tags incidence matrix, the co-occurrence counts are the sparse product
+    A^T A: its diagonal holds the number of photos of every tag, the other entries the number of
+    photos shared by two tags. SciPy is only needed by this batch job, the API workers load the
+    snapshot with NumPy.
+
+    :param path: The snapshot file, written atomically.
+    :type path: str
+    :param batch_size: Number of ``photo_tag`` rows fetched per batch.
+    :type batch_size: int
+    """
+    from scipy import sparse
+
+    photos, tags = [], []
+    with SessionLocal() as db:
+        for batch in iter_taggings(db, batch_size):
+            photos.append(np.fromiter((photo_id for photo_id, _ in batch), dtype=np.int64, count=len(batch)))
+            tags.append(np.fromiter((tag_id for _, tag_id in batch), dtype=np.int64, count=len(batch)))
+        names = tag_names(db)
+    photo_ids, rows = np.unique(np.concatenate(photos or [_EMPTY]), return_inverse=True)
+    tag_ids, columns = np.unique(np.concatenate(tags or [_EMPTY]), return_inverse=True)
+    incidence = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, columns)),
+                                  shape=(len(photo_ids), len(tag_ids)))
+    incidence.data[:] = 1  # the duplicated rows of photo_tag were summed
+    cooccurrence = (incidence.T @ incidence).tocsr()
+    counts = cooccurrence.diagonal().astype(np.int64)
+    cooccurrence.setdiag(0)
+    cooccurrence.eliminate_zeros()
+    cooccurrence.sort_indices()
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as snapshot:
+        np.savez(snapshot, ids=tag_ids, names=np.array([names.get(tag_id, "") for tag_id in tag_ids], dtype=str),
+                 counts=counts, indptr=cooccurrence.indptr, indices=cooccurrence.indices,
+                 data=cooccurrence.data.astype(np.int32),
+                 meta=np.array([len(photo_ids), photo_ids[-1] if len(photo_ids) else 0], dtype=np.int64))
+    os.replace(temporary, path)
+
+
+class RelatedTags:
+    """
+    Related-tag suggestions from the co-occurrence counts of the tags, kept in memory.
+
+    The counts come from a snapshot built by :func:`build_snapshot`: a compressed sparse row
+    matrix of the tags, in NumPy arrays. The photos added since the snapshot are pulled from the
+    database in batches, after the highest photo ID seen, and their counts kept in a small sparse
+    delta. Deleted photos only leave the counts with the next snapshot, as do photos committed
+    after a photo with a higher ID was pulled.
+
+    Tags are scored by their normalized pointwise mutual information (NPMI) with the given tags,
+    log(p(a, b) / (p(a) p(b))) / -log(p(a, b)), from -1 to 1, summed over the given tags. Pairs
+    seen on fewer than ``min_count`` photos are ignored, their PMI is mostly noise.
+
+    :param path: The snapshot file.
+    :type path: str
+    :param refresh_seconds: Interval between the checks of the snapshot and the pulls of new photos.
+    :type refresh_seconds: float
+    :param batch_size: Maximum number of photos pulled at once.
+    :type batch_size: int
+    :param min_count: Minimum number of shared photos of a related tag.
+    :type min_count: int
+    :param cache_size: Maximum number of memoized suggestions.
+    :type cache_size: int
+    """
+
+    def __init__(self, path: str, refresh_seconds: float, batch_size: int, min_count: int, cache_size: int):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.batch_size = batch_size
+        self.min_count = min_count
+        self.cache_size = cache_size
+        self._mtime = None
+        self._ids = _EMPTY
+        self._counts = _EMPTY
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = _EMPTY
+        self._data = _EMPTY
+        self.photos = 0
+        self.last_photo_id = 0
+        self._names: dict[int, str] = {}
+        self._by_name: dict[str, list[int]] = {}
+        self._delta_counts: dict[int, int] = {}
+        self._delta_pairs: dict[int, dict[int, int]] = {}
+        self._memo: OrderedDict[tuple, list[dict]] = OrderedDict()
+
+    def _name(self, tag_id: int, name: str) -> None:
+        if tag_id not in self._names and name:
+            self._names[tag_id] = name
+            self._by_name.setdefault(name.lower(), []).append(tag_id)
+
+    def _load(self, arrays: dict, mtime: float) -> None:
+        """
+        Replaces the counts with a snapshot and drops the delta.
+        """
+        self._ids, self._counts = arrays["ids"], arrays["counts"]
+        self._indptr, self._indices, self._data = arrays["indptr"], arrays["indices"], arrays["data"]
+        self.photos, self.last_photo_id = (int(value) for value in arrays["meta"])
+        self._names, self._by_name = {}, {}
+        for tag_id, name in zip(self._ids.tolist(), arrays["names"].tolist()):
+            self._name(tag_id, name)
+        self._delta_counts, self._delta_pairs = {}, {}
+        self._memo.clear()
+        self._mtime = mtime
+
+    def _read_snapshot(self) -> dict:
+        with np.load(self.path) as snapshot:
+            return {key: snapshot[key] for key in snapshot.files}
+
+    def apply(self, last_photo_id: int, taggings: list[tuple[int, int, str]]) -> None:
+        """
+        Adds the co-occurrences of new photos to the delta.
+
+        :param last_photo_id: The highest photo ID of the batch, tagged or not.
+        :type last_photo_id: int
+        :param taggings: Photo ID, tag ID and tag name triples, ordered by photo ID.
+        :type taggings: list[tuple[int, int, str]]
+        """
+        photo_tags: dict[int, set[int]] = {}
+        for photo_id, tag_id, name in taggings:
+            photo_tags.setdefault(photo_id, set()).add(tag_id)
+            self._name(tag_id, name)
+        for tag_ids in photo_tags.values():
+            self.photos += 1
+            for tag_id in tag_ids:
+                self._delta_counts[tag_id] = self._delta_counts.get(tag_id, 0) + 1
+            for first, second in combinations(tag_ids, 2):
+                for tag_id, other in ((first, second), (second, first)):
+                    row = self._delta_pairs.setdefault(tag_id, {})
+                    row[other] = row.get(other, 0) + 1
+        self.last_photo_id = max(self.last_photo_id, last_photo_id)
+        if photo_tags:
+            self._memo.clear()
+
+    def _position(self, tag_id: int) -> int | None:
+        position = int(np.searchsorted(self._ids, tag_id))
+        return position if position < len(self._ids) and self._ids[position] == tag_id else None
+
+    def _counts_of(self, tag_ids: np.ndarray) -> np.ndarray:
+        """
+        Returns the number of photos of tags, from the snapshot and the delta.
+        """
+        positions = np.searchsorted(self._ids, tag_ids)
+        known = positions < len(self._ids)
+        known[known] = self._ids[positions[known]] == tag_ids[known]
+        counts = np.zeros(len(tag_ids), dtype=np.int64)
+        counts[known] = self._counts[positions[known]]
+        if self._delta_counts:
+            counts += np.fromiter((self._delta_counts.get(tag_id, 0) for tag_id in tag_ids.tolist()),
+                                  dtype=np.int64, count=len(tag_ids))
+        return counts
+
+    def _row(self, tag_id: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the tags co-occurring with a tag, their shared photos and their photo counts.
+        """
+        position = self._position(tag_id)
+        if position is None:
+            others, shared = _EMPTY, _EMPTY
+        else:
+            start, end = self._indptr[position], self._indptr[position + 1]
+            positions = self._indices[start:end]
+            others, shared = self._ids[positions], self._data[start:end].astype(np.int64)
+        delta = self._delta_pairs.get(tag_id)
+        if delta:
+            delta_ids = np.fromiter(delta.keys(), dtype=np.int64, count=len(delta))
+            delta_shared = np.fromiter(delta.values(), dtype=np.int64, count=len(delta))
+            found = np.searchsorted(others, delta_ids)
+            known = found < len(others)
+            known[known] = others[found[known]] == delta_ids[known]
+            shared = shared.copy()
+            shared[found[known]] += delta_shared[known]
+            others = np.concatenate([others, delta_ids[~known]])
+            shared = np.concatenate([shared, delta_shared[~known]])
+        return others, shared, self._counts_of(others)
+
+    def suggest(self, names: list[str], limit: int) -> list[dict]:
+        """
+        Returns the tags most related to some tags, e.g. those an uploader already typed.
+
+        :param names: The given tags, case does not matter; unknown tags are ignored.
+        :type names: list[str]
+        :param limit: Maximum number of tags.
+        :type limit: int
+        :return: The related tags as ``{"name": ..., "score": ..., "count": ...}``, best first,
+            where the count is the number of photos shared with the given tags.
+        :rtype: list[dict]
+        """
+        given = sorted({tag_id for name in names for tag_id in self._by_name.get(name.lower(), ())})
+        memo_key = (tuple(given), limit)
+        found = self._memo.get(memo_key)
+        if found is not None:
+            self._memo.move_to_end(memo_key)
+            return found
+        found = self._score(given, limit) if given and self.photos else []
+        self._memo[memo_key] = found
+        while len(self._memo) > self.cache_size:
+            self._memo.popitem(last=False)
+        return found
+
+    def _score(self, given: list[int], limit: int) -> list[dict]:
+        total = self.photos
+        candidates, scores, shared_counts = [], [], []
+        for tag_id, count in zip(given, self._counts_of(np.array(given, dtype=np.int64)).tolist()):
+            others, shared, other_counts = self._row(tag_id)
+            keep = (shared >= self.min_count) & (other_counts > 0)
+            if not count or not keep.any():
+                continue
+            others, shared, other_counts = others[keep], shared[keep], other_counts[keep]
+            joint = shared / total
+            pmi = np.log(joint / ((count / total) * (other_counts / total)))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                npmi = np.where(joint < 1, pmi / -np.log(joint), 1.0)
+            candidates.append(others)
+            scores.append(npmi)
+            shared_counts.append(shared)
+        if not candidates:
+            return []
+        tag_ids, inverse = np.unique(np.concatenate(candidates), return_inverse=True)
+        score = np.bincount(inverse, weights=np.concatenate(scores), minlength=len(tag_ids))
+        shared = np.bincount(inverse, weights=np.concatenate(shared_counts), minlength=len(tag_ids))
+        score[np.isin(tag_ids, given)] = -math.inf
+        best = np.argsort(-score, kind="stable")[:limit]
+        return [
+            {"name": self._names.get(int(tag_ids[index]), ""), "score": round(float(score[index]), 4),
+             "count": int(shared[index])}
+            for index in best.tolist() if score[index] > 0
+        ]
+
+    async def refresh(self) -> None:
+        """
+        Loads the snapshot when it changed, then pulls the photos added since. The file and
+        database work runs in a thread.
+        """
+        try:
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except FileNotFoundError:
+                mtime = None
+            if mtime is not None and mtime != self._mtime:
+                self._load(await asyncio.to_thread(self._read_snapshot), mtime)
+            while True:
+                last_photo_id, taggings = await asyncio.to_thread(self._pull)
+                if last_photo_id == self.last_photo_id:
+                    break
+                self.apply(last_photo_id, taggings)
+        except (OSError, ValueError, KeyError, SQLAlchemyError) as err:
+            logger.warning("Refreshing the related tags failed: %s", err)
+
+    def _pull(self) -> tuple[int, list[tuple[int, int, str]]]:
+        with SessionLocal() as db:
+            return taggings_after(db, self.last_photo_id, self.batch_size)
+
+    async def run(self) -> None:
+        """
+        Refreshes the counts periodically. Meant to run as a background task of a worker.
+        """
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_seconds)
+
+
+related_tags = RelatedTags(settings.related_tags_path, settings.related_tags_refresh_seconds,
+                           settings.related_tags_batch_size, settings.related_tags_min_count,
+                           settings.related_tags_cache_size)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build_snapshot(settings.related_tags_path, settings.export_batch_size)
+    logger.info("Related tags snapshot written to %s", settings.related_tags_path)
@@ -1,12 +1,42 @@
 import aiofiles
+import asyncio
+import glob
+import hashlib
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 from uuid import uuid4, UUID
-from fastapi import UploadFile
 
+import cloudinary
+import cloudinary.exceptions
+import cloudinary.uploader
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.db import SessionLocal
 from fastapi_app.src.database.models import Photo
+from fastapi_app.src.repository import users as repository_users
+
+logger = logging.getLogger(__name__)
 
 UPLOAD_DIR = "uploads/"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+AVATAR_DIR = os.path.join(UPLOAD_DIR, "avatars")
+AVATAR_SIZE = (250, 250)
+os.makedirs(AVATAR_DIR, exist_ok=True)
+
+# Pillow releases the GIL while decoding, resizing and encoding, so a few threads process avatars
+# in parallel without blocking the event loop; the pool bounds the memory held by decoded images.
+avatar_pool = ThreadPoolExecutor(max_workers=settings.avatar_workers, thread_name_prefix="avatar")
+
+if settings.cloudinary_name:
+    cloudinary.config(
+        cloud_name=settings.cloudinary_name,
+        api_key=settings.cloudinary_api_key,
+        api_secret=settings.cloudinary_api_secret,
+        secure=True,
+    )
 
 async def save_photo(file: UploadFile) -> str:
     """
@@ -30,6 +60,103 @@ async def save_photo(file: UploadFile) -> str:
     
     return file_path
 
+def process_avatar(data: bytes) -> bytes:
+    """
+    Crops an uploaded image to the avatar size and encodes it as WebP.
+
+    JPEG images are decoded at the smallest scale still covering the avatar, which skips most of
+    the decoding work for camera photos.
+
+    :param data: The uploaded image.
+    :type data: bytes
+    :return: The WebP avatar.
+    :rtype: bytes
+    :raises ValueError: If the data is not a supported image or too large once decoded.
+    """
+    try:
+        with Image.open(BytesIO(data)) as image:
+            image.draft("RGB", AVATAR_SIZE)
+            image = ImageOps.exif_transpose(image)
+            image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+            avatar = ImageOps.fit(image, AVATAR_SIZE, Image.LANCZOS)
+    except (UnidentifiedImageError, Image.DecompressionBombError) as err:
+        raise ValueError(f"Invalid image: {err}") from err
+    except OSError as err:
+        raise ValueError(f"Damaged image: {err}") from err
+    out = BytesIO()
+    avatar.save(out, "WEBP", quality=settings.avatar_webp_quality, method=4)
+    return out.getvalue()
+
+
+def _write_avatar(user_id: int, avatar: bytes) -> str:
+    """
+    Writes the avatar of a user and removes their previous ones.
+
+    The file is named after its content, so a new avatar gets a new URL and clients never keep a stale copy.
+    """
+    file_path = os.path.join(AVATAR_DIR, f"{user_id}-{hashlib.blake2b(avatar, digest_size=8).hexdigest()}.webp")
+    with open(file_path, "wb") as out_file:
+        out_file.write(avatar)
+    for previous in glob.glob(os.path.join(AVATAR_DIR, f"{user_id}-*.webp")):
+        if previous != file_path:
+            os.remove(previous)
+    return file_path
+
+
+async def save_avatar(file: UploadFile, user_id: int) -> str:
+    """
+    Processes an uploaded avatar and stores it on the server.
+
+    The image is read in chunks up to ``settings.avatar_max_bytes``, then cropped, encoded and
+    written by the avatar thread pool, so the event loop keeps serving other requests meanwhile.
+
+    :param file: The uploaded image.
+    :type file: UploadFile
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :return: The path to the saved avatar.
+    :rtype: str
+    :raises HTTPException: 413 if the upload is too large, 400 if it is not a supported image.
+    """
+    chunks, size = [], 0
+    while chunk := await file.read(65536):
+        size += len(chunk)
+        if size > settings.avatar_max_bytes:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image too large")
+        chunks.append(chunk)
+    loop = asyncio.get_running_loop()
+    try:
+        avatar = await loop.run_in_executor(avatar_pool, process_avatar, b"".join(chunks))
+    except ValueError as err:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err)) from err
+    return await loop.run_in_executor(avatar_pool, _write_avatar, user_id, avatar)
+
+
+async def publish_avatar(user_id: int, file_path: str, local_url: str, public_id: str) -> None:
+    """
+    Uploads a stored avatar to Cloudinary and points the user to it. Meant to run as a background task.
+
+    The blocking upload runs in a thread. The user keeps the local avatar if the upload fails or
+    if they changed their avatar again meanwhile.
+
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :param file_path: The path to the stored avatar.
+    :type file_path: str
+    :param local_url: The URL the stored avatar is served at, the current avatar of the user.
+    :type local_url: str
+    :param public_id: The Cloudinary public ID of the avatar.
+    :type public_id: str
+    """
+    try:
+        result = await asyncio.to_thread(cloudinary.uploader.upload, file_path, public_id=public_id, overwrite=True)
+    except (cloudinary.exceptions.Error, OSError) as err:
+        logger.warning("Uploading the avatar of user %s failed: %s", user_id, err)
+        return
+    with SessionLocal() as db:
+        await repository_users.replace_avatar(user_id, local_url, result["secure_url"], db)
+
+
 async def delete_photo(photo_id: UUID):
     """
     Deleted photo by id. 
@@ -0,0 +1,98 @@
+import re
+
+# Operators are only recognized in capitals, so "and" stays a tag. Parentheses group.
+_TOKEN = re.compile(r"\(|\)|[^\s()]+")
+_OPERATORS = {"AND", "OR", "NOT"}
+
+
+class TagQueryError(ValueError):
+    """
+    Raised for a tag query that does not parse.
+    """
+
+
+class _Parser:
+    def __init__(self, tokens: list[str]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> str | None:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self) -> str:
+        token = self.peek()
+        if token is None:
+            raise TagQueryError("The query ends too early")
+        self.position += 1
+        return token
+
+    def expression(self) -> tuple:
+        terms = [self.term()]
+        while self.peek() == "OR":
+            self.take()
+            terms.append(self.term())
+        return terms[0] if len(terms) == 1 else ("or", terms)
+
+    def term(self) -> tuple:
+        factors = [self.factor()]
+        while self.peek() not in (None, "OR", ")"):
+            if self.peek() == "AND":
+                self.take()
+            factors.append(self.factor())
+        return factors[0] if len(factors) == 1 else ("and", factors)
+
+    def factor(self) -> tuple:
+        token = self.take()
+        if token == "NOT":
+            return ("not", self.factor())
+        if token == "(":
+            node = self.expression()
+            if self.take() != ")":
+                raise TagQueryError("Missing closing parenthesis")
+            return node
+        if token in _OPERATORS or token == ")":
+            raise TagQueryError(f"Unexpected {token}")
+        return ("tag", token.lower())
+
+
+def parse(query: str, max_terms: int) -> tuple:
+    """
+    Parses a boolean tag query, e.g. ``sunset AND beach NOT people``.
+
+    ``NOT`` binds tightest, then ``AND``, then ``OR``; two terms without an operator between
+    them are combined with ``AND``, so ``a NOT b`` means ``a AND NOT b``. Tags are matched
+    ignoring case.
+
+    :param query: The query.
+    :type query: str
+    :param max_terms: Maximum number of tags in the query.
+    :type max_terms: int
+    :return: The syntax tree, made of ``("tag", name)``, ``("not", node)``, ``("and", [nodes])``
+        and ``("or", [nodes])`` tuples.
+    :rtype: tuple
+    :raises TagQueryError: If the query is empty, malformed or has too many tags.
+    """
+    tokens = _TOKEN.findall(query)
+    if len([token for token in tokens if token not in _OPERATORS and token not in "()"]) > max_terms:
+        raise TagQueryError(f"At most {max_terms} tags per query")
+    parser = _Parser(tokens)
+    node = parser.expression()
+    if parser.peek() is not None:
+        raise TagQueryError(f"Unexpected {parser.peek()}")
+    return node
+
+
+def tag_names(node: tuple) -> set[str]:
+    """
+    Returns the tags of a query.
+
+    :param node: The syntax tree of the query.
+    :type node: tuple
+    :return: The lowercase tag names.
+    :rtype: set[str]
+    """
+    if node[0] == "tag":
+        return {node[1]}
+    if node[0] == "not":
+        return tag_names(node[1])
+    return set().union(*(tag_names(child) for child in node[1]))
@@ -1,6 +1,7 @@
 from fastapi.testclient import TestClient
 from fastapi import status
 from fastapi_app.main import app
+from fastapi_app.src.services.admission import AdmissionController
 
 client = TestClient(app=app)
 
@@ -8,4 +9,23 @@ def test_return_corrent_main():
     response = client.get("/")
 
     assert response.status_code == status.HTTP_200_OK
-    assert response.json() == {"message": "Hello World"}
\ No newline at end of file
+    assert response.json() == {"message": "Hello World"}
+
+def test_metrics_endpoint():
+    client.get("/")
+    response = client.get("/metrics")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_requests_total{method="GET",route="/",status="200"}' in response.text
+    assert "http_request_duration_seconds_bucket" in response.text
+
+def test_shed_request_carries_cors_headers(monkeypatch):
+    async def refuse(self, priority):
+        return False
+
+    monkeypatch.setattr(AdmissionController, "acquire", refuse)
+    response = client.get("/api/photos/photos/1", headers={"Origin": "https://example.com"})
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert "access-control-allow-origin" in response.headers
@@ -0,0 +1,42 @@
+import pytest
+
+from fastapi_app.src.database.models import Comment, Opinion, Photo, User
+from fastapi_app.src.repository.counters import reconcile_user_counters, update_user_counters
+
+
+@pytest.fixture(scope="module")
+def authors(session):
+    author = User(username="counterauthor", email="counterauthor@example.com", password="secret")
+    reader = User(username="counterreader", email="counterreader@example.com", password="secret")
+    session.add_all([author, reader])
+    session.commit()
+    return author, reader
+
+
+def test_counters_roll_back_with_the_failed_write(session, authors):
+    author, _ = authors
+    session.add(Photo(user_id=author.id, url="http://example.com/rolled-back.jpg"))
+    update_user_counters(session, author.id, photo_count=1, votes_received=0)
+    session.rollback()
+
+    assert session.get(User, author.id).photo_count == 0
+    assert session.query(Photo).filter(Photo.user_id == author.id).count() == 0
+
+
+def test_reconcile_repairs_only_drifted_users(session, authors):
+    author, reader = authors
+    photo = Photo(user_id=author.id, url="http://example.com/counted.jpg")
+    session.add(photo)
+    session.flush()
+    session.add_all([
+        Opinion(vote=5, user_id=reader.id, photo_id=photo.id),
+        Comment(content="counted", user_id=reader.id, photo_id=photo.id),
+    ])
+    update_user_counters(session, author.id, photo_count=1, votes_received=3)
+    session.commit()
+
+    assert reconcile_user_counters(session, reader.id) == 1
+    assert (reader.photo_count, reader.comment_count) == (0, 1)
+    assert reconcile_user_counters(session) == 1
+    assert (author.photo_count, author.votes_received) == (1, 1)
+    assert reconcile_user_counters(session) == 0
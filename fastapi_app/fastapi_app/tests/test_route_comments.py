@@ -2,7 +2,6 @@ from fastapi.testclient import TestClient
 from fastapi import status
 from fastapi_app.main import app
 
-from unittest.mock import MagicMock, patch
 
 import pytest
 
@@ -73,9 +72,7 @@ def test_return_status_update_comment():
     assert response.status_code == status.HTTP_200_OK
 
 @pytest.fixture()
-def token(client, user, session, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("fastapi_app.src.routes.auth.send_email", mock_send_email)
+def token(client, user, session):
     client.post("/api/auth/signup", json=user)
     current_user: User = session.query(User).filter(User.email == user.get('email')).first()
     current_user.confirmed = True
@@ -135,3 +132,36 @@ def test_delete_comment_for_photo(client, token):
         headers={"Authorization": f"Bearer {token}"}
     )
     assert response.status_code == 200, response.text
+
+def test_read_photo_comments_paginated(client, token):
+    client.post(
+        "/api/comments/photos/1/comments/",
+        json={"content": "Second page"},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    response = client.get("/api/comments/photos/1/comments?limit=1")
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert len(data["items"]) == 1
+    assert data["next_cursor"] is not None
+
+    response = client.get(f"/api/comments/photos/1/comments?limit=1&cursor={data['next_cursor']}")
+    assert response.status_code == 200, response.text
+    next_page = response.json()
+    assert next_page["items"][0]["id"] > data["items"][0]["id"]
+
+def test_read_photo_comments_invalid_cursor(client):
+    response = client.get("/api/comments/photos/1/comments?cursor=invalid")
+    assert response.status_code == 400, response.text
+
+def test_read_comments_of_missing_photo(client):
+    response = client.get("/api/comments/photos/999/comments")
+    assert response.status_code == 404, response.text
+
+def test_create_comment_for_missing_photo(client, token):
+    response = client.post(
+        "/api/comments/photos/999/comments/",
+        json={"content": "I like it"},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 404, response.text
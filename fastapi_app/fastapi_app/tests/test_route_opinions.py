@@ -0,0 +1,77 @@
+import pytest
+
+from fastapi_app.src.database.models import User
+
+
+def login(client, session, monkeypatch, user):
+    client.post("/api/auth/signup", json=user)
+    current_user: User = session.query(User).filter(User.email == user.get('email')).first()
+    current_user.confirmed = True
+    session.commit()
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get('username'), "password": user.get('password')}
+    )
+    return response.json()["access_token"]
+
+
+@pytest.fixture()
+def token(client, user, session, monkeypatch):
+    return login(client, session, monkeypatch, user)
+
+
+@pytest.fixture()
+def voter_token(client, session, monkeypatch):
+    voter = {"username": "voteruser", "email": "voteruser@example.com", "password": "Voter!2"}
+    return login(client, session, monkeypatch, voter)
+
+
+def test_create_test_photo(client, token):
+    """Creation photo for testing"""
+    response = client.post("/api/photos/photos/?description=garden&tags=pretty",
+                           headers={"Authorization": f"Bearer {token}"}, files={"file": "@Woda.jpeg;type=image/jpeg"})
+    assert response.status_code == 201, response.text
+
+
+def test_rate_own_photo(client, token):
+    response = client.put("/api/opinions/photos/1", json={"vote": 5}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 403, response.text
+
+
+def test_rate_photo(client, voter_token):
+    response = client.put("/api/opinions/photos/1", json={"vote": 4}, headers={"Authorization": f"Bearer {voter_token}"})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["rating"] == 4.0
+    assert data["rating_count"] == 1
+
+
+def test_rate_photo_again_replaces_vote(client, voter_token):
+    response = client.put("/api/opinions/photos/1", json={"vote": 2}, headers={"Authorization": f"Bearer {voter_token}"})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["rating"] == 2.0
+    assert data["rating_sum"] == 2
+    assert data["rating_count"] == 1
+
+
+def test_rate_photo_invalid_vote(client, voter_token):
+    response = client.put("/api/opinions/photos/1", json={"vote": 7}, headers={"Authorization": f"Bearer {voter_token}"})
+    assert response.status_code == 422, response.text
+
+
+def test_rate_missing_photo(client, voter_token):
+    response = client.put("/api/opinions/photos/999", json={"vote": 3}, headers={"Authorization": f"Bearer {voter_token}"})
+    assert response.status_code == 404, response.text
+
+
+def test_remove_rating(client, voter_token):
+    response = client.delete("/api/opinions/photos/1", headers={"Authorization": f"Bearer {voter_token}"})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["rating"] == 0.0
+    assert data["rating_count"] == 0
+
+    response = client.get("/api/opinions/photos/1")
+    assert response.status_code == 200, response.text
+    assert response.json()["rating_count"] == 0
@@ -0,0 +1,99 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.models import Photo, User
+
+
+@pytest.fixture()
+def token(client, user, session):
+    client.post("/api/auth/signup", json=user)
+    current_user: User = session.query(User).filter(User.email == user.get('email')).first()
+    current_user.confirmed = True
+    session.commit()
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get('username'), "password": user.get('password')}
+    )
+    data = response.json()
+    return data["access_token"]
+
+
+def test_update_avatar_points_to_a_served_url(client, token, monkeypatch):
+    """
+    Test that the new avatar is served at the URL stored for the user
+    """
+    monkeypatch.setattr(settings, "cloudinary_name", None)
+    image = BytesIO()
+    Image.new("RGB", (400, 300), "green").save(image, "JPEG")
+
+    response = client.patch("/api/users/avatar", headers={"Authorization": f"Bearer {token}"},
+                            files={"file": ("avatar.jpg", image.getvalue(), "image/jpeg")})
+    assert response.status_code == 200, response.text
+    avatar = response.json()["avatar"]
+    assert avatar.startswith("http://testserver/uploads/avatars/")
+
+    served = client.get(avatar)
+    assert served.status_code == 200
+    assert Image.open(BytesIO(served.content)).size == (250, 250)
+
+
+@pytest.fixture()
+def voter_token(client, session):
+    voter = {"username": "countervoter", "email": "countervoter@example.com", "password": "Voter!2"}
+    client.post("/api/auth/signup", json=voter)
+    current_user: User = session.query(User).filter(User.email == voter.get('email')).first()
+    current_user.confirmed = True
+    session.commit()
+    response = client.post("/api/auth/login", data={"username": voter.get('username'), "password": voter.get('password')})
+    return response.json()["access_token"]
+
+
+def read_profile(client, token):
+    response = client.get("/api/users/me/profile", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_profile_counts_photos_comments_and_votes(client, token, voter_token):
+    """
+    Test that the counters of the profile follow the photo, comment and vote writes
+    """
+    response = client.post("/api/photos/photos/?description=counted&tags=counted", headers={"Authorization": f"Bearer {token}"},
+                           files={"file": "@Woda.jpeg;type=image/jpeg"})
+    assert response.status_code == 201, response.text
+    photo_id = response.json()["id"]
+    response = client.put(f"/api/opinions/photos/{photo_id}", json={"vote": 4},
+                          headers={"Authorization": f"Bearer {voter_token}"})
+    assert response.status_code == 200, response.text
+    response = client.put(f"/api/opinions/photos/{photo_id}", json={"vote": 5},
+                          headers={"Authorization": f"Bearer {voter_token}"})
+    assert response.status_code == 200, response.text
+    response = client.post(f"/api/comments/photos/{photo_id}/comments/", json={"content": "counted too"},
+                           headers={"Authorization": f"Bearer {voter_token}"})
+    assert response.status_code == 201, response.text
+
+    profile = read_profile(client, token)
+    assert profile["username"] == "testuser1"
+    assert (profile["photo_amount"], profile["comment_count"], profile["votes_received"]) == (1, 0, 1)
+    profile = read_profile(client, voter_token)
+    assert (profile["photo_amount"], profile["comment_count"], profile["votes_received"]) == (0, 1, 0)
+
+
+def test_reconcile_counters_is_admin_only(client, token, voter_token, session):
+    """
+    Test that only an admin can repair the counters, and that only the drifted users are repaired
+    """
+    current_user: User = session.query(User).filter(User.username == "testuser1").first()
+    photo_count = session.query(Photo).filter(Photo.user_id == current_user.id).count()
+    current_user.photo_count = photo_count + 7
+    session.commit()
+
+    response = client.post("/api/users/counters/reconcile", headers={"Authorization": f"Bearer {voter_token}"})
+    assert response.status_code == 403, response.text
+    response = client.post("/api/users/counters/reconcile", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    assert response.json() == {"repaired": 1}
+    assert read_profile(client, token)["photo_amount"] == photo_count
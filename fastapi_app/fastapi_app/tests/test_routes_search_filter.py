@@ -1,7 +1,8 @@
+import json
+
 from fastapi.testclient import TestClient
 from fastapi import status
 from fastapi_app.main import app
-from unittest.mock import MagicMock, patch
 import pytest
 from fastapi_app.src.database.models import User, Photo
 from fastapi_app.src.services.auth import auth_service
@@ -10,9 +11,7 @@ from fastapi_app.src.services.auth import Auth
 client = TestClient(app=app)
 
 @pytest.fixture()
-def token(client, user, session, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("fastapi_app.src.routes.auth.send_email", mock_send_email)
+def token(client, user, session):
     client.post("/api/auth/signup", json=user)
     current_user: User = session.query(User).filter(User.email == user.get('email')).first()
     current_user.confirmed = True
@@ -83,4 +82,29 @@ def test_read_photo_authorized_by_tag_and_created_date(client, token):
     """
     response = client.get('http://localhost:8000/api/search_filter/photos/search/tag/pretty?created_at=2024-07-29')
     headers={"Authorization": f"Bearer {token}"}
-    assert response.status_code == 200, response.text
\ No newline at end of file
+    assert response.status_code == 200, response.text
+
+def test_export_photos_by_tag_as_ndjson(client, token):
+    """
+    Test about streaming every photo with a tag as newline-delimited JSON
+    """
+    response = client.get('http://localhost:8000/api/search_filter/photos/search/tag/pretty',
+                          headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows and all("pretty" in [tag["name"] for tag in row["tags"]] for row in rows)
+
+def test_search_photos_by_boolean_tag_query(client, token):
+    """
+    Test about searching photos with a boolean query over their tags
+    """
+    response = client.get('http://localhost:8000/api/search_filter/photos/tags', params={"q": "PRETTY NOT ugly"})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["total"] >= 1
+    assert all("pretty" in [tag["name"] for tag in photo["tags"]] for photo in data["photos"])
+    assert "pretty" not in [facet["name"] for facet in data["facets"]]
+
+    response = client.get('http://localhost:8000/api/search_filter/photos/tags', params={"q": "pretty AND"})
+    assert response.status_code == 400, response.text
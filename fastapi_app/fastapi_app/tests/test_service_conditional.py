@@ -0,0 +1,57 @@
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from fastapi_app.src.services.conditional import CachePolicy, Conditional, entity_tag, etag_matches
+
+app = FastAPI()
+policy = CachePolicy("public, no-cache")
+served = []
+
+
+@app.get("/items/{version}")
+async def read_item(version: int, conditional: Conditional = Depends(policy)):
+    conditional.check(entity_tag("item", version))
+    served.append(version)
+    return {"version": version}
+
+
+client = TestClient(app)
+
+
+def test_entity_tag_depends_on_every_part():
+    assert entity_tag("photo", 1, None) == entity_tag("photo", 1, None)
+    assert entity_tag("photo", 1, None) != entity_tag("photo", 1, "2024-01-01")
+    assert entity_tag("photo", 1).startswith('W/"')
+
+
+def test_etag_matches_uses_weak_comparison():
+    etag = entity_tag("photo", 1)
+    assert etag_matches(f'"other", {etag.removeprefix("W/")}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_matching_request_is_not_modified():
+    response = client.get("/items/1")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, no-cache"
+    assert response.headers["vary"] == "Accept-Encoding"
+    served.clear()
+
+    response = client.get("/items/1", headers={"If-None-Match": response.headers["etag"]})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == entity_tag("item", 1)
+    assert response.headers["cache-control"] == "public, no-cache"
+    assert served == []
+
+
+def test_changed_resource_is_served():
+    etag = client.get("/items/1").headers["etag"]
+
+    response = client.get("/items/2", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json() == {"version": 2}
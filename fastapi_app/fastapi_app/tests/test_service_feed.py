@@ -0,0 +1,83 @@
+import uuid
+
+import pytest
+
+from fastapi_app.src.database.models import Photo, User
+from fastapi_app.src.database.redis_db import close_redis, get_redis
+from fastapi_app.src.repository import follows as repository_follows
+from fastapi_app.src.services.feed import POPULAR_KEY, Feed
+
+
+async def new_user(session):
+    name = uuid.uuid4().hex[:20]
+    user = User(username=name, email=f"{name}@example.com", password="password", confirmed=True)
+    session.add(user)
+    session.commit()
+    # The IDs start over with the test database, the timelines of a previous run must go.
+    await get_redis().delete(Feed.timeline_key(user.id), Feed.following_key(user.id), POPULAR_KEY)
+    return user
+
+
+def new_photo(session, user):
+    photo = Photo(user_id=user.id, url="http://example.com/photo.jpg", description="photo")
+    session.add(photo)
+    session.commit()
+    return photo
+
+
+async def follow(session, feed, follower, followee):
+    followee = await repository_follows.follow_user(follower, followee.username, session)
+    await feed.follow(session, follower.id, followee)
+
+
+@pytest.mark.asyncio
+async def test_followed_photos_are_pushed_to_the_timeline(session):
+    feed = Feed()
+    reader, author, stranger = await new_user(session), await new_user(session), await new_user(session)
+    old = new_photo(session, author)
+    await follow(session, feed, reader, author)
+
+    photo = new_photo(session, author)
+    await feed.publish(session, photo)
+    await feed.publish(session, new_photo(session, stranger))
+
+    assert [item.id for item in await feed.read(session, reader.id, None, 10)] == [photo.id, old.id]
+    assert [item.id for item in await feed.read(session, reader.id, photo.id, 10)] == [old.id]
+    await close_redis()
+
+
+@pytest.mark.asyncio
+async def test_popular_photos_are_pulled(session):
+    feed = Feed()
+    feed.threshold = 1
+    reader, author = await new_user(session), await new_user(session)
+    await feed.read(session, reader.id, None, 10)
+    await follow(session, feed, reader, author)
+
+    photo = new_photo(session, author)
+    await feed.publish(session, photo)
+
+    assert await get_redis().sismember(POPULAR_KEY, author.id)
+    assert str(photo.id) not in await get_redis().lrange(feed.timeline_key(reader.id), 0, -1)
+    assert [item.id for item in await feed.read(session, reader.id, None, 10)] == [photo.id]
+    await close_redis()
+
+
+@pytest.mark.asyncio
+async def test_unfollow_and_rebuild(session):
+    feed = Feed()
+    reader, author = await new_user(session), await new_user(session)
+    photo = new_photo(session, author)
+    await follow(session, feed, reader, author)
+    own = new_photo(session, reader)
+    await feed.publish(session, own)
+
+    await get_redis().delete(feed.timeline_key(reader.id), feed.following_key(reader.id))
+    assert [item.id for item in await feed.read(session, reader.id, None, 10)] == [own.id, photo.id]
+
+    author = await repository_follows.unfollow_user(reader, author.username, session)
+    await feed.unfollow(session, reader.id, author)
+
+    assert author.follower_count == 0
+    assert [item.id for item in await feed.read(session, reader.id, None, 10)] == [own.id]
+    await close_redis()
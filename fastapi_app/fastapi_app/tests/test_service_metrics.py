@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+from fastapi_app.src.services import metrics
+from fastapi_app.src.services.metrics import Counter, Histogram, RequestStats, current_request, record_db_query
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    # The metrics of the tests register in a private registry, so they are not exported by /metrics.
+    private = []
+    monkeypatch.setattr(metrics, "registry", private)
+    return private
+
+
+def test_counter_sums_threads(registry):
+    counter = Counter("test_events_total", "Test events.", ("kind",))
+    assert registry == [counter]
+    counter.inc(("a",))
+    worker = threading.Thread(target=lambda: counter.inc(("a",), 2))
+    worker.start()
+    worker.join()
+
+    assert counter.samples() == ['test_events_total{kind="a"} 3']
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_duration_seconds", "Test durations.", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    assert histogram.samples() == [
+        'test_duration_seconds_bucket{le="0.1"} 1',
+        'test_duration_seconds_bucket{le="1.0"} 2',
+        'test_duration_seconds_bucket{le="+Inf"} 3',
+        'test_duration_seconds_sum 5.55',
+        'test_duration_seconds_count 3',
+    ]
+
+
+def test_db_queries_are_counted_per_request():
+    stats = RequestStats({"type": "http"})
+    token = current_request.set(stats)
+    try:
+        record_db_query(0.002)
+        record_db_query(0.003)
+    finally:
+        current_request.reset(token)
+
+    assert stats.db_queries == 2
+    assert stats.route == "unmatched"
@@ -0,0 +1,112 @@
+import asyncio
+import subprocess
+import sys
+from datetime import datetime
+from email.message import EmailMessage
+from pathlib import Path
+
+import pytest
+from aiosmtpd.controller import Controller
+from aiosmtplib import SMTPRecipientRefused, SMTPRecipientsRefused, SMTPResponseException
+from sqlalchemy.orm import sessionmaker
+
+from fastapi_app.src.database.models import EmailOutbox
+from fastapi_app.src.repository.outbox import retry_delay
+from fastapi_app.src.services.outbox import OutboxWorker, SMTPPool, is_permanent
+
+
+class Handler:
+    """
+    Local SMTP stand-in refusing ``rejected@`` recipients for good and ``busy@`` ones for now.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.peers = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("rejected@"):
+            return "550 No such user"
+        if address.startswith("busy@"):
+            return "451 Try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope.rcpt_tos)
+        self.peers.add(session.peer)
+        return "250 Message accepted for delivery"
+
+
+@pytest.fixture()
+def smtp_server():
+    controller = Controller(Handler(), hostname="127.0.0.1", port=8026)
+    controller.start()
+    yield controller
+    controller.stop()
+
+
+def message(recipient):
+    message = EmailMessage()
+    message["From"] = "app@example.com"
+    message["To"] = recipient
+    message["Subject"] = "Hello"
+    message.set_content("Hello")
+    return message
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_its_connections(smtp_server):
+    pool = SMTPPool("127.0.0.1", 8026, None, None, use_tls=False, size=2)
+
+    await asyncio.gather(*(pool.send(message(f"user{number}@example.com")) for number in range(10)))
+    await pool.close()
+
+    assert len(smtp_server.handler.messages) == 10
+    assert len(smtp_server.handler.peers) <= 2
+
+
+def test_worker_module_imports_on_its_own():
+    # The worker runs as ``python -m fastapi_app.src.services.outbox``, without the app imported first.
+    result = subprocess.run([sys.executable, "-c", "import fastapi_app.src.services.outbox"],
+                            cwd=Path(__file__).parents[2], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_is_permanent():
+    assert is_permanent(SMTPResponseException(550, "No such user"))
+    assert not is_permanent(SMTPResponseException(451, "Try again later"))
+    assert not is_permanent(SMTPRecipientsRefused([SMTPRecipientRefused(451, "Busy", "busy@example.com")]))
+    assert not is_permanent(ConnectionRefusedError())
+
+
+def test_retry_delay_doubles_up_to_the_limit():
+    assert 15 <= retry_delay(1, 30, 3600) <= 30
+    assert 60 <= retry_delay(3, 30, 3600) <= 120
+    assert 1800 <= retry_delay(20, 30, 3600) <= 3600
+
+
+@pytest.mark.asyncio
+async def test_worker_delivers_and_retries(session, smtp_server):
+    recipients = ["outbox@example.com", "rejected@example.com", "busy@example.com"]
+    session.add_all([
+        EmailOutbox(recipient=recipient, subject="Confirm your email", template="email_template.html",
+                    context={"host": "http://localhost/", "username": "outbox", "token": "token"})
+        for recipient in recipients
+    ])
+    session.commit()
+    pool = SMTPPool("127.0.0.1", 8026, None, None, use_tls=False, size=2)
+    worker = OutboxWorker(pool, sessionmaker(bind=session.get_bind()), batch_size=10)
+
+    assert await worker.run_once() == 3
+    await pool.close()
+
+    session.expire_all()
+    emails = {email.recipient: email for email in session.query(EmailOutbox).filter(EmailOutbox.recipient.in_(recipients))}
+    assert emails["outbox@example.com"].status == "sent"
+    assert emails["rejected@example.com"].status == "failed"
+    assert emails["busy@example.com"].status == "pending"
+    assert emails["busy@example.com"].attempts == 1
+    assert emails["busy@example.com"].next_attempt_at > datetime.utcnow()
+    assert smtp_server.handler.messages == [["outbox@example.com"]]
+    assert await worker.run_once() == 0
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+from starlette.requests import Request
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.redis_db import close_redis
+from fastapi_app.src.routes.realtime import stream_photo_events
+from fastapi_app.src.services.realtime import PhotoEventHub, Subscriber, channel, photo_event_hub
+
+
+@pytest.mark.asyncio
+async def test_subscriber_batches_messages():
+    subscriber = Subscriber()
+    subscriber.push('{"type": "comment_created"}')
+    subscriber.push('{"type": "comment_deleted"}')
+
+    batch = await subscriber.next_batch(timeout=0.1)
+
+    assert batch == ['{"type": "comment_created"}', '{"type": "comment_deleted"}']
+    assert await subscriber.next_batch(timeout=0.01) == []
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_drops_oldest_messages(monkeypatch):
+    monkeypatch.setattr(settings, "realtime_max_queue_messages", 2)
+    subscriber = Subscriber()
+    for number in range(5):
+        subscriber.push(f'{{"number": {number}}}')
+
+    batch = await subscriber.next_batch(timeout=0.1)
+
+    assert json.loads(batch[0]) == {"type": "lagged", "dropped": 3}
+    assert batch[1:] == ['{"number": 3}', '{"number": 4}']
+
+
+@pytest.mark.asyncio
+async def test_subscriber_memory_limit(monkeypatch):
+    monkeypatch.setattr(settings, "realtime_max_queue_bytes", 10)
+    subscriber = Subscriber()
+    subscriber.push("x" * 8)
+    subscriber.push("y" * 8)
+
+    assert subscriber.size <= 10
+    assert subscriber.dropped == 1
+
+
+def test_dispatch_reaches_only_subscribers_of_the_photo():
+    hub = PhotoEventHub()
+    watching, other = Subscriber(), Subscriber()
+    hub.subscribers = {1: {watching}, 2: {other}}
+
+    hub.dispatch(channel(1), '{"type": "rating_changed"}')
+
+    assert list(watching.messages) == ['{"type": "rating_changed"}']
+    assert not other.messages
+
+
+@pytest.mark.asyncio
+async def test_event_stream_subscribes_only_while_streaming():
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": []}, receive=None)
+    before = photo_event_hub.count
+
+    response = await stream_photo_events(1, request)
+    assert photo_event_hub.count == before
+
+    events = response.body_iterator
+    assert await events.__anext__() == "retry: 3000\n\n"
+    assert photo_event_hub.count == before + 1
+    await events.aclose()
+    assert photo_event_hub.count == before
+    await photo_event_hub.close()
+    await close_redis()
@@ -1,17 +1,33 @@
-import redis.asyncio as redis
+import asyncio
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from fastapi.staticfiles import StaticFiles
 
-from fastapi_limiter import FastAPILimiter
-
-from fastapi_app.src.routes import auth, users, comments, search_filter, photos
+from fastapi_app.src.routes import auth, users, comments, search_filter, photos, opinions, leaderboards, realtime, admin, feed, tags
 from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.redis_db import close_redis
+from fastapi_app.src.services.leaderboard import leaderboard_service
+from fastapi_app.src.services.realtime import photo_event_hub
+from fastapi_app.src.services.related_tags import related_tags
+from fastapi_app.src.services.tag_index import tag_index
+from fastapi_app.src.services import metrics
+from fastapi_app.src.services.profiler import ProfilerMiddleware
+from fastapi_app.src.services.storage import AVATAR_DIR
+from fastapi_app.src.services.admission import AdmissionMiddleware
+from fastapi_app.src.services.rate_limit import RateLimitHeadersMiddleware
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 origins = ["*"]
 
+app.add_middleware(RateLimitHeadersMiddleware)
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(ProfilerMiddleware)
+app.add_middleware(metrics.MetricsMiddleware, query_count_header=settings.debug)
+# added last, so it is the outermost and the responses of the other middlewares, e.g. the 503 of
+# a shed request, carry the CORS headers too
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -25,22 +41,48 @@ app.include_router(users.router, prefix="/api")
 app.include_router(photos.router, prefix="/api")
 app.include_router(comments.router, prefix="/api")
 app.include_router(search_filter.router, prefix="/api")
+app.include_router(opinions.router, prefix="/api")
+app.include_router(leaderboards.router, prefix="/api")
+app.include_router(realtime.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
+app.include_router(feed.router, prefix="/api")
+app.include_router(tags.router, prefix="/api")
+app.mount("/uploads/avatars", StaticFiles(directory=AVATAR_DIR), name="avatars")
 
 
 @app.on_event("startup")
 async def startup():
     """
-    The function creates a connection to the Redis server and initializes the FastAPI query limiter.
-    """
-    r = await redis.Redis(
-        host=settings.redis_host,
-        port=settings.redis_port,
-        password=settings.redis_password,
-        db=0,
-        encoding="utf-8",
-        decode_responses=True,
-    )
-    await FastAPILimiter.init(r)
+    The function rebuilds the leaderboards on a cold start, loads the tag index and starts their periodic upkeep
+    and the updates of the related tags.
+    """
+    await leaderboard_service.rebuild_if_empty()
+    await tag_index.refresh()
+    app.state.background_tasks = [asyncio.create_task(leaderboard_service.run_compaction()),
+                                  asyncio.create_task(tag_index.run()),
+                                  asyncio.create_task(related_tags.run())]
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """
+    The function stops the background tasks, the realtime fan-out and closes the Redis connection pool.
+    """
+    for task in app.state.background_tasks:
+        task.cancel()
+    await photo_event_hub.close()
+    await close_redis()
+
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """
+    The function exposes the metrics of this worker in the Prometheus text format.
+
+    :return: The metrics.
+    :rtype: Response
+    """
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 
 @app.get("/")
@@ -1,7 +1,15 @@
+import base64
+import binascii
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_, update
 from sqlalchemy.orm import Session
 
 from fastapi_app.src.database import models
 from fastapi_app.src import schemas
+from fastapi_app.src.repository.counters import update_user_counters
+from fastapi_app.src.services.cache import photo_cache
+from fastapi_app.src.services.search_cache import photo_dependency, search_cache
 
 from datetime import datetime
 
@@ -19,6 +27,82 @@ async def get_comment(db: Session, comment_id: int):
     """
     return db.query(models.Comment).filter(models.Comment.id == comment_id).first()
 
+def encode_cursor(comment: models.Comment) -> str:
+    """
+    Encode the position of a comment into an opaque pagination cursor.
+
+    :param comment: The last comment of a page.
+    :type comment: models.Comment
+    :return: The cursor.
+    :rtype: str
+    """
+    position = f"{comment.created_at.isoformat()}|{comment.id}"
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Decode a pagination cursor into the creation date and ID of the last seen comment.
+
+    :param cursor: The cursor.
+    :type cursor: str
+    :return: The creation date and ID of the comment.
+    :rtype: tuple[datetime, int]
+    :raises HTTPException: If the cursor is malformed.
+    """
+    try:
+        created_at, comment_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(comment_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+async def get_photo_comments(db: Session, photo_id: int, limit: int, cursor: str | None = None):
+    """
+    Retrieve a page of the comments of a photo, oldest first.
+
+    Pages are addressed by the ``(created_at, id)`` of the last comment of the previous page,
+    so every page is a range scan of the ``(photo_id, created_at, id)`` index no matter how deep
+    the client has paged.
+
+    :param db: The database session.
+    :type db: Session
+    :param photo_id: The ID of the photo.
+    :type photo_id: int
+    :param limit: The maximum number of comments on the page.
+    :type limit: int
+    :param cursor: The cursor returned with the previous page, None for the first page.
+    :type cursor: str | None
+    :return: The comments of the page and the cursor of the next page, or None on the last page.
+    :rtype: tuple[list[models.Comment], str | None]
+    """
+    query = db.query(models.Comment).filter(models.Comment.photo_id == photo_id)
+    if cursor:
+        query = query.filter(tuple_(models.Comment.created_at, models.Comment.id) > decode_cursor(cursor))
+    comments = query.order_by(models.Comment.created_at, models.Comment.id).limit(limit + 1).all()
+    if len(comments) > limit:
+        return comments[:limit], encode_cursor(comments[limit - 1])
+    return comments, None
+
+def change_comment_count(db: Session, photo_id: int, delta: int) -> bool:
+    """
+    Add a delta to the denormalized comment count of a photo, without committing.
+
+    :param db: The database session.
+    :type db: Session
+    :param photo_id: The ID of the photo.
+    :type photo_id: int
+    :param delta: The change of the count.
+    :type delta: int
+    :return: True if the photo exists.
+    :rtype: bool
+    """
+    stmt = (
+        update(models.Photo)
+        .where(models.Photo.id == photo_id)
+        .values(comment_count=models.Photo.comment_count + delta, updated_at=models.Photo.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(stmt).rowcount > 0
+
 async def create_comment(db: Session, comment: schemas.CommentCreate, user_id: int, photo_id: int):
     """
     Create a new comment and add it to the database.
@@ -31,12 +115,18 @@ async def create_comment(db: Session, comment: schemas.CommentCreate, user_id: i
     :type user_id: int
     :param photo_id: The ID of the photo being commented on.
     :type photo_id: int
-    :return: The created comment.
+    :return: The created comment, or None if the photo does not exist.
     :rtype: models.Comment
     """
+    if not change_comment_count(db, photo_id, 1):
+        db.rollback()
+        return None
     db_comment = models.Comment(**comment.dict(), user_id=user_id, photo_id=photo_id)
     db.add(db_comment)
+    update_user_counters(db, user_id, comment_count=1)
     db.commit()
+    await photo_cache.invalidate(photo_id)
+    await search_cache.invalidate(photo_dependency(photo_id))
     db.refresh(db_comment)
     return db_comment
 
@@ -75,6 +165,11 @@ async def delete_comment(db: Session, comment_id: int):
     """
     db_comment = await get_comment(db, comment_id)
     if db_comment:
+        photo_id = db_comment.photo_id
         db.delete(db_comment)
+        change_comment_count(db, photo_id, -1)
+        update_user_counters(db, db_comment.user_id, comment_count=-1)
         db.commit()
+        await photo_cache.invalidate(photo_id)
+        await search_cache.invalidate(photo_dependency(photo_id))
     return db_comment
@@ -0,0 +1,169 @@
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+
+from fastapi_app.src.database.models import Follow, Photo, User
+from fastapi_app.src.repository.counters import update_user_counters
+
+
+def _get_followee(follower: User, username: str, db: Session) -> User:
+    followee = db.query(User).filter(User.username == username).first()
+    if followee is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    if followee.id == follower.id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You cannot follow yourself")
+    return followee
+
+
+async def follow_user(follower: User, username: str, db: Session) -> User:
+    """
+    Makes a user follow another one.
+
+    :param follower: The following user.
+    :type follower: User
+    :param username: The username of the user to follow.
+    :type username: str
+    :param db: The database session.
+    :type db: Session
+    :return: The followed user, with the updated follower count.
+    :rtype: User
+    :raises HTTPException: 404 if the user does not exist, 400 for the user themselves, 409 if they are already followed.
+    """
+    followee = _get_followee(follower, username, db)
+    db.add(Follow(follower_id=follower.id, followee_id=followee.id))
+    update_user_counters(db, follower.id, following_count=1)
+    update_user_counters(db, followee.id, follower_count=1)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User already followed")
+    db.refresh(followee)
+    return followee
+
+
+async def unfollow_user(follower: User, username: str, db: Session) -> User:
+    """
+    Makes a user stop following another one.
+
+    :param follower: The following user.
+    :type follower: User
+    :param username: The username of the followed user.
+    :type username: str
+    :param db: The database session.
+    :type db: Session
+    :return: The formerly followed user, with the updated follower count.
+    :rtype: User
+    :raises HTTPException: 404 if the user does not exist or is not followed, 400 for the user themselves.
+    """
+    followee = _get_followee(follower, username, db)
+    deleted = db.query(Follow).filter(Follow.follower_id == follower.id, Follow.followee_id == followee.id).delete()
+    if not deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not followed")
+    update_user_counters(db, follower.id, following_count=-1)
+    update_user_counters(db, followee.id, follower_count=-1)
+    db.commit()
+    db.refresh(followee)
+    return followee
+
+
+def follower_ids(db: Session, user_id: int) -> list[int]:
+    """
+    Returns the IDs of the followers of a user.
+
+    :param db: The database session.
+    :type db: Session
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :return: The IDs of the followers.
+    :rtype: list[int]
+    """
+    return db.scalars(select(Follow.follower_id).where(Follow.followee_id == user_id)).all()
+
+
+def followee_ids(db: Session, user_id: int) -> list[int]:
+    """
+    Returns the IDs of the users a user follows.
+
+    :param db: The database session.
+    :type db: Session
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :return: The IDs of the followed users.
+    :rtype: list[int]
+    """
+    return db.scalars(select(Follow.followee_id).where(Follow.follower_id == user_id)).all()
+
+
+def popular_user_ids(db: Session, min_followers: int) -> list[int]:
+    """
+    Returns the IDs of the users with at least ``min_followers`` followers.
+
+    :param db: The database session.
+    :type db: Session
+    :param min_followers: The lowest follower count.
+    :type min_followers: int
+    :return: The IDs of the users.
+    :rtype: list[int]
+    """
+    return db.scalars(select(User.id).where(User.follower_count >= min_followers)).all()
+
+
+def recent_photo_ids(db: Session, user_ids: list[int], limit: int) -> list[int]:
+    """
+    Returns the IDs of the latest photos of some users, newest first.
+
+    :param db: The database session.
+    :type db: Session
+    :param user_ids: The IDs of the authors.
+    :type user_ids: list[int]
+    :param limit: Maximum number of photos.
+    :type limit: int
+    :return: The photo IDs.
+    :rtype: list[int]
+    """
+    if not user_ids:
+        return []
+    return db.scalars(
+        select(Photo.id).where(Photo.user_id.in_(user_ids)).order_by(Photo.id.desc()).limit(limit)
+    ).all()
+
+
+def feed_photos(db: Session, photo_ids: list[int], author_ids: list[int], before: int | None,
+                limit: int) -> list[Photo]:
+    """
+    Loads a page of the home feed with a single query: the photos of the timeline and the latest
+    photos of the followed authors whose photos are not pushed to the timelines.
+
+    Deleted photos drop out and photos present in both sources are returned once.
+
+    :param db: The database session.
+    :type db: Session
+    :param photo_ids: The IDs of the photos of the timeline.
+    :type photo_ids: list[int]
+    :param author_ids: The IDs of the authors whose photos are pulled.
+    :type author_ids: list[int]
+    :param before: Only photos with a lower ID, for the next pages.
+    :type before: int | None
+    :param limit: Maximum number of photos.
+    :type limit: int
+    :return: The photos with their tags, newest first.
+    :rtype: list[Photo]
+    """
+    conditions = []
+    if photo_ids:
+        conditions.append(Photo.id.in_(photo_ids))
+    if author_ids:
+        conditions.append(and_(Photo.user_id.in_(author_ids), Photo.id < before) if before
+                          else Photo.user_id.in_(author_ids))
+    if not conditions:
+        return []
+    return (
+        db.query(Photo)
+        .options(selectinload(Photo.tags))
+        .filter(or_(*conditions))
+        .order_by(Photo.id.desc())
+        .limit(limit)
+        .all()
+    )
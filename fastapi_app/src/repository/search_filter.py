@@ -1,12 +1,30 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from typing import Iterator
+
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, exists, false, func, not_, or_, select
+from fastapi_app.src.conf.config import settings
 from fastapi_app.src.database.models import Photo
 from fastapi_app.src.database import models
 from fastapi_app.src import schemas
-from datetime import datetime
+from datetime import datetime, timedelta
 from fastapi import HTTPException
 
 
+def _rating_range(rating_filter: int):
+    """
+    Build the filter for photos whose average rating rounds to the given number of stars.
+
+    The average is materialized on ``Photo.rating``, so the range condition is served by the
+    index on that column instead of aggregating the opinions table.
+
+    :param rating_filter: The number of stars.
+    :type rating_filter: int
+    :return: The filter conditions for ``Query.filter``.
+    :rtype: tuple
+    """
+    return models.Photo.rating >= rating_filter - 0.5, models.Photo.rating < rating_filter + 0.5
+
+
 async def get_description(db: Session, description: str,rating_filter:int = None, created_at: str = None):
     """
     Retrieve one or more photos from the database based on their descriptions.
@@ -31,7 +49,7 @@ async def get_description(db: Session, description: str,rating_filter:int = None
     if query:
         id = query.id
     if query and rating_filter:
-         query2 = db.query(models.Photo).filter(models.Photo.id==id).filter(models.Photo.rating == rating_filter).all()
+         query2 = db.query(models.Photo).filter(models.Photo.id==id).filter(*_rating_range(rating_filter)).all()
     elif query and created_at:
         query2 = db.query(models.Photo).filter(models.Photo.id==id).all()
         query2 = [q for q in query2 if str(q.created_at)[0:10] == created_at]
@@ -64,7 +82,7 @@ async def get_tag(db: Session, tagname: str, rating_filter:int = None, created_a
     if query:
         id = query.id
     if query and rating_filter:
-        query2 = db.query(models.Photo).filter(models.Photo.tags.any(id=id)).filter(models.Photo.rating == rating_filter).all()
+        query2 = db.query(models.Photo).filter(models.Photo.tags.any(id=id)).filter(*_rating_range(rating_filter)).all()
     elif query and created_at:
         query2 = db.query(models.Photo).filter(models.Photo.tags.any(id=id)).all()
         query2 = [q for q in query2 if str(q.created_at)[0:10] == created_at]
@@ -74,3 +92,171 @@ async def get_tag(db: Session, tagname: str, rating_filter:int = None, created_a
         raise HTTPException(status_code=400, detail="Tag does not exist")
     return query2
 
+
+
+def _created_on(created_at: str):
+    """
+    Build the filter for photos created on the given day.
+
+    :param created_at: The day, in the format YYYY-MM-DD.
+    :type created_at: str
+    :return: The filter conditions for ``Select.where``.
+    :rtype: tuple
+    :raises HTTPException: If the day is not a valid date.
+    """
+    try:
+        day = datetime.strptime(created_at, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="created_at must be a date in the format YYYY-MM-DD")
+    return models.Photo.created_at >= day, models.Photo.created_at < day + timedelta(days=1)
+
+
+def _stream(db: Session, condition, rating_filter: int = None, created_at: str = None,
+            batch_size: int = None) -> Iterator[list[models.Photo]]:
+    """
+    Stream the photos matching a condition in batches, through a server-side cursor.
+
+    Unlike the searches above, the filters are applied in the query, so they never hold the
+    whole result in memory. The photos are ordered by ID and their tags are loaded batch by batch.
+
+    :param db: The database session, it must stay open until the batches are consumed.
+    :type db: Session
+    :param condition: The search condition.
+    :param rating_filter: The rating of search photo.
+    :type rating_filter: int
+    :param created_at: The date of search photo creation.
+    :type created_at: str
+    :param batch_size: Number of photos fetched per batch, ``settings.export_batch_size`` by default.
+    :type batch_size: int
+    :return: The batches of photos.
+    :rtype: Iterator[list[models.Photo]]
+    :raises HTTPException: If both filters are given or the date is invalid.
+    """
+    if rating_filter and created_at:
+        raise HTTPException(status_code=400, detail="Choose only one filter parameter at once. Rating or created_at")
+    statement = select(models.Photo).where(condition).options(selectinload(models.Photo.tags)).order_by(models.Photo.id)
+    if rating_filter:
+        statement = statement.where(*_rating_range(rating_filter))
+    elif created_at:
+        statement = statement.where(*_created_on(created_at))
+    statement = statement.execution_options(yield_per=batch_size or settings.export_batch_size)
+    return db.scalars(statement).partitions()
+
+
+async def stream_description(db: Session, description: str, rating_filter: int = None, created_at: str = None,
+                             batch_size: int = None) -> Iterator[list[models.Photo]]:
+    """
+    Stream the photos whose description contains the given text (case-insensitive), see :func:`_stream`.
+
+    :param db: The database session, it must stay open until the batches are consumed.
+    :type db: Session
+    :param description: The description to search for.
+    :type description: str
+    :param rating_filter: The rating of search photo.
+    :type rating_filter: int
+    :param created_at: The date of search photo creation.
+    :type created_at: str
+    :param batch_size: Number of photos fetched per batch.
+    :type batch_size: int
+    :return: The batches of photos.
+    :rtype: Iterator[list[models.Photo]]
+    :raises HTTPException: If both filters are given or the date is invalid.
+    """
+    return _stream(db, models.Photo.description.ilike(f'%{description}%'), rating_filter, created_at, batch_size)
+
+
+async def stream_tag(db: Session, tagname: str, rating_filter: int = None, created_at: str = None,
+                     batch_size: int = None) -> Iterator[list[models.Photo]]:
+    """
+    Stream the photos with the given tag, see :func:`_stream`.
+
+    :param db: The database session, it must stay open until the batches are consumed.
+    :type db: Session
+    :param tagname: The tag to search for.
+    :type tagname: str
+    :param rating_filter: The rating of search photo.
+    :type rating_filter: int
+    :param created_at: The date of search photo creation.
+    :type created_at: str
+    :param batch_size: Number of photos fetched per batch.
+    :type batch_size: int
+    :return: The batches of photos.
+    :rtype: Iterator[list[models.Photo]]
+    :raises HTTPException: If the tag does not exist, both filters are given or the date is invalid.
+    """
+    tag = db.query(models.Tag).filter(models.Tag.name.ilike(tagname)).first()
+    if tag is None:
+        raise HTTPException(status_code=400, detail="Tag does not exist")
+    return _stream(db, models.Photo.tags.any(id=tag.id), rating_filter, created_at, batch_size)
+
+
+def _tag_condition(node: tuple, tag_ids: dict[str, list[int]]):
+    """
+    Translate a parsed tag query into a condition on the photos.
+
+    Every tag becomes an ``EXISTS`` on its posting list in ``photo_tag``, which the database runs
+    as a semi-join, or an anti-join under ``NOT``, over the ``(photo_id, tag_id)`` index.
+
+    :param node: The syntax tree, see :func:`fastapi_app.src.services.tag_query.parse`.
+    :type node: tuple
+    :param tag_ids: The IDs of the tags by lowercase name, unknown tags match no photo.
+    :type tag_ids: dict[str, list[int]]
+    :return: The condition for ``Select.where``.
+    """
+    kind = node[0]
+    if kind == "tag":
+        ids = tag_ids.get(node[1])
+        if not ids:
+            return false()
+        return exists().where(models.photo_tag_table.c.photo_id == models.Photo.id,
+                              models.photo_tag_table.c.tag_id.in_(ids))
+    if kind == "not":
+        return not_(_tag_condition(node[1], tag_ids))
+    children = [_tag_condition(child, tag_ids) for child in node[1]]
+    return and_(*children) if kind == "and" else or_(*children)
+
+
+async def search_tags(db: Session, node: tuple, names: set[str], before: int = None, limit: int = 20,
+                      facet_limit: int = 10) -> tuple[list[models.Photo], list[dict], int]:
+    """
+    Retrieve the photos matching a boolean tag query, with the facet counts of their other tags.
+
+    :param db: The database session.
+    :type db: Session
+    :param node: The syntax tree of the query, see :func:`fastapi_app.src.services.tag_query.parse`.
+    :type node: tuple
+    :param names: The lowercase tags of the query, they are left out of the facets.
+    :type names: set[str]
+    :param before: Only photos with a lower ID, i.e. the ID of the last photo of the previous page.
+    :type before: int
+    :param limit: Maximum number of photos.
+    :type limit: int
+    :param facet_limit: Maximum number of facets.
+    :type facet_limit: int
+    :return: The page of photos with their tags, newest first, the most frequent other tags of
+        all the matching photos as ``{"name": ..., "count": ...}`` and the number of matching photos.
+    :rtype: tuple[list[models.Photo], list[dict], int]
+    """
+    tag_ids = {}
+    for tag_id, name in db.execute(select(models.Tag.id, func.lower(models.Tag.name))
+                                   .where(func.lower(models.Tag.name).in_(sorted(names)))):
+        tag_ids.setdefault(name, []).append(tag_id)
+    condition = _tag_condition(node, tag_ids)
+    matching = select(models.Photo.id).where(condition)
+
+    statement = select(models.Photo).where(condition).options(selectinload(models.Photo.tags))
+    if before:
+        statement = statement.where(models.Photo.id < before)
+    photos = db.scalars(statement.order_by(models.Photo.id.desc()).limit(limit)).all()
+
+    total = db.scalar(select(func.count()).select_from(matching.subquery()))
+    photo_count = func.count(models.photo_tag_table.c.photo_id.distinct())
+    facets = db.execute(
+        select(models.Tag.name, photo_count)
+        .join(models.photo_tag_table, models.photo_tag_table.c.tag_id == models.Tag.id)
+        .where(models.photo_tag_table.c.photo_id.in_(matching), func.lower(models.Tag.name).not_in(sorted(names)))
+        .group_by(models.Tag.name)
+        .order_by(photo_count.desc(), models.Tag.name)
+        .limit(facet_limit)
+    )
+    return photos, [{"name": name, "count": count} for name, count in facets], total
@@ -1,7 +1,7 @@
 from libgravatar import Gravatar
 from sqlalchemy.orm import Session
 
-from fastapi_app.src.database.models import User, Photo
+from fastapi_app.src.database.models import EmailOutbox, User
 from fastapi_app.src.schemas import UserModel, ProfileStatusUpdate
 from fastapi_app.src.services.auth import auth_service
 
@@ -32,7 +32,7 @@ async def get_user_by_username(username: str, db: Session) -> User:
     """
     return db.query(User).filter(User.username == username).first()
 
-async def create_user(body: UserModel, db: Session) -> User:
+async def create_user(body: UserModel, db: Session, emails: list[EmailOutbox] | None = None) -> User:
     """
     Creates a new user.
 
@@ -40,6 +40,8 @@ async def create_user(body: UserModel, db: Session) -> User:
     :type body: UserModel
     :param db: The database session.
     :type db: Session
+    :param emails: Emails added to the outbox in the same transaction, e.g. the confirmation email.
+    :type emails: list[EmailOutbox] | None
     :return: The newly created user object.
     :rtype: User
     :raises Exception: If an error occurs while fetching the Gravatar image.
@@ -58,6 +60,7 @@ async def create_user(body: UserModel, db: Session) -> User:
         
     new_user = User(**body.dict(), avatar = avatar, role = role)
     db.add(new_user)
+    db.add_all(emails or [])
     db.commit()
     db.refresh(new_user)
     return new_user
@@ -110,10 +113,33 @@ async def update_avatar(email, url: str, db: Session) -> User:
     db.commit()
     return user
 
+async def replace_avatar(user_id: int, expected: str, url: str, db: Session) -> bool:
+    """
+    Replaces the avatar URL of a user, unless it changed meanwhile.
+
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :param expected: The avatar URL being replaced.
+    :type expected: str
+    :param url: The new avatar URL.
+    :type url: str
+    :param db: The database session.
+    :type db: Session
+    :return: True if the avatar was replaced.
+    :rtype: bool
+    """
+    replaced = db.query(User).filter(User.id == user_id, User.avatar == expected).update(
+        {User.avatar: url}, synchronize_session=False)
+    db.commit()
+    return replaced > 0
+
 async def get_profile(username: str, db: Session):
     """
     Retrieve the profile information for a given username.
 
+    The activity counters are read from the denormalized columns of the user, so the profile
+    is a single-row lookup.
+
     :param username: The username of the user whose profile is to be retrieved.
     :type username: str
     :param db: The database session used to query the user information.
@@ -124,16 +150,44 @@ async def get_profile(username: str, db: Session):
     user_information = db.query(User).filter(User.username==username).first()
     if not user_information:
         return None
-    amount_of_user_photos = db.query(Photo).filter(Photo.user_id==user_information.id).count()
-    profile_information = {
-                            'username':     user_information.username,
-                            'avatar':       user_information.avatar,
-                            'created_at':   user_information.created_at,
-                            'email':        user_information.email,
-                            'role':         user_information.role,
-                            'photo_amount': amount_of_user_photos
+    return profile_information(user_information)
+
+def profile_information(user: User) -> dict:
+    """
+    Build the profile information of a user.
+
+    :param user: The user.
+    :type user: User
+    :return: A dictionary containing the user's profile information.
+    :rtype: dict
+    """
+    return {
+        'username':       user.username,
+        'avatar':         user.avatar,
+        'created_at':     user.created_at,
+        'email':          user.email,
+        'role':           user.role,
+        'photo_amount':   user.photo_count,
+        'comment_count':  user.comment_count,
+        'votes_received': user.votes_received,
     }
-    return profile_information
+
+async def get_public_profiles(user_ids: list[int], db: Session) -> dict[int, dict]:
+    """
+    Retrieve the profile information of many users with a single query, e.g. the authors of comments.
+
+    The email addresses are left out, the profiles are looked up by anyone.
+
+    :param user_ids: The IDs of the users.
+    :type user_ids: list[int]
+    :param db: The database session.
+    :type db: Session
+    :return: The profile information of the existing users, by ID.
+    :rtype: dict[int, dict]
+    """
+    users = db.query(User).filter(User.id.in_(user_ids)).all()
+    return {user.id: {key: value for key, value in profile_information(user).items() if key != 'email'}
+            for user in users}
 
 async def ban_user(username: str, current_user: User, db: Session):
     """
@@ -189,7 +243,8 @@ async def get_current_user_profile(user: User, db: Session):
     Retrieve the current user's profile information.
 
     This function fetches the profile information of the current authenticated user,
-    including the number of photos they have uploaded.
+    including the number of photos they have uploaded. The user is re-read by primary key,
+    because the authenticated user may come from the cache with outdated counters.
 
     :param user: The current authenticated user.
     :type user: User
@@ -198,13 +253,4 @@ async def get_current_user_profile(user: User, db: Session):
     :return: A dictionary containing the user's profile information.
     :rtype: dict
     """
-    amount_of_user_photos = db.query(Photo).filter(Photo.user_id==user.id).count()
-    profile_information = {
-                            'username':     user.username,
-                            'avatar':       user.avatar,
-                            'created_at':   user.created_at,
-                            'email':        user.email,
-                            'role':         user.role,
-                            'photo_amount': amount_of_user_photos
-    }
-    return profile_information
\ No newline at end of file
+    return profile_information(db.get(User, user.id))
@@ -0,0 +1,135 @@
+import asyncio
+from typing import List, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.models import User
+from fastapi_app.src.schemas import ProfileSignature, QueryReport
+from fastapi_app.src.services import profiler
+from fastapi_app.src.services.auth import auth_service
+from fastapi_app.src.services.query_stats import query_stats
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/queries", response_model=List[QueryReport])
+async def read_query_report(
+    limit: int = Query(20, ge=1, le=500),
+    order_by: Literal["total", "mean", "max", "count"] = "total",
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    Retrieves the most expensive SQL fingerprints executed by this worker (admin access required).
+
+    :param limit: Maximum number of fingerprints.
+    :type limit: int
+    :param order_by: Sort key: total time, mean time, maximum time or number of executions.
+    :type order_by: str
+    :param current_user: The current user object.
+    :type current_user: User
+    :return: The statistics of the fingerprints, most expensive first.
+    :rtype: List[QueryReport]
+    :raises HTTPException: If the current user does not have admin privileges.
+    """
+    await auth_service.check_role(current_user, "admin")
+    return query_stats.top(limit, order_by)
+
+
+@router.delete("/queries", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_query_report(current_user: User = Depends(auth_service.get_current_user)):
+    """
+    Resets the SQL statistics of this worker (admin access required).
+
+    :param current_user: The current user object.
+    :type current_user: User
+    :raises HTTPException: If the current user does not have admin privileges.
+    """
+    await auth_service.check_role(current_user, "admin")
+    query_stats.reset()
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(10, gt=0),
+    include_idle: bool = False,
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    Samples the stacks of this worker for some seconds (admin access required).
+
+    The worker keeps serving requests while it is profiled. The response is a collapsed stack
+    file, to be rendered with ``flamegraph.pl`` or speedscope.
+
+    :param seconds: Duration of the profile, capped by the ``profiler_max_seconds`` setting.
+    :type seconds: float
+    :param include_idle: Also count the samples of threads waiting for work.
+    :type include_idle: bool
+    :param current_user: The current user object.
+    :type current_user: User
+    :return: The profile in the collapsed stack format.
+    :rtype: PlainTextResponse
+    :raises HTTPException: If the current user does not have admin privileges or a profiler is already running.
+    """
+    await auth_service.check_role(current_user, "admin")
+    sampler = profiler.SamplingProfiler(settings.profiler_interval_ms / 1000, include_idle=include_idle)
+    try:
+        sampler.start()
+    except profiler.ProfilerBusy:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profiler is already running")
+    try:
+        await asyncio.sleep(min(seconds, settings.profiler_max_seconds))
+    finally:
+        sampler.stop()
+    return PlainTextResponse(sampler.collapsed(), headers={"Content-Disposition": 'attachment; filename="profile.folded"'})
+
+
+@router.post("/profile/signature", response_model=ProfileSignature)
+async def sign_profile_request(
+    path: str,
+    method: str = "GET",
+    ttl: int = Query(300, ge=1, le=86400),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    Signs the ``X-Profile`` header that profiles single requests to an endpoint (admin access required).
+
+    Requests sent with the header return an ``X-Profile-Id`` header; the profile is then available
+    from ``GET /admin/profiles/{profile_id}``.
+
+    :param path: The path of the profiled requests, e.g. ``/api/search_filter/description``.
+    :type path: str
+    :param method: The HTTP method of the profiled requests.
+    :type method: str
+    :param ttl: Validity of the signature in seconds.
+    :type ttl: int
+    :param current_user: The current user object.
+    :type current_user: User
+    :return: The header name and its signed value.
+    :rtype: ProfileSignature
+    :raises HTTPException: If the current user does not have admin privileges.
+    """
+    await auth_service.check_role(current_user, "admin")
+    return ProfileSignature(header=profiler.PROFILE_HEADER, value=profiler.sign_request(method, path, ttl),
+                            method=method.upper(), path=path)
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def read_request_profile(profile_id: str, current_user: User = Depends(auth_service.get_current_user)):
+    """
+    Retrieves the profile of a single request (admin access required).
+
+    :param profile_id: The ID returned in the ``X-Profile-Id`` response header.
+    :type profile_id: str
+    :param current_user: The current user object.
+    :type current_user: User
+    :return: The profile in the collapsed stack format.
+    :rtype: PlainTextResponse
+    :raises HTTPException: If the current user does not have admin privileges or the profile does not exist.
+    """
+    await auth_service.check_role(current_user, "admin")
+    profile = await profiler.load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return PlainTextResponse(profile)
@@ -0,0 +1,91 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.orm import Session
+
+from fastapi_app.src.database.db import get_db
+from fastapi_app.src.database.models import Photo, User
+from fastapi_app.src.schemas import LeaderboardEntry
+from fastapi_app.src.services.auth import auth_service
+from fastapi_app.src.services.leaderboard import leaderboard_service
+
+router = APIRouter(prefix="/leaderboards", tags=["leaderboards"])
+
+
+def load_entries(db: Session, ranking: list[tuple[int, float]]) -> list[dict]:
+    """
+    Loads the photos of a leaderboard with a single query and keeps the ranking order.
+
+    Photos deleted in the meantime are skipped.
+
+    :param db: The database session.
+    :type db: Session
+    :param ranking: Pairs of photo ID and score, in ranking order.
+    :type ranking: list[tuple[int, float]]
+    :return: The leaderboard entries.
+    :rtype: list[dict]
+    """
+    if not ranking:
+        return []
+    photos = {photo.id: photo for photo in db.query(Photo).filter(Photo.id.in_([photo_id for photo_id, _ in ranking]))}
+    return [
+        {
+            "id": photo.id,
+            "user_id": photo.user_id,
+            "url": photo.url,
+            "description": photo.description,
+            "rating": photo.rating,
+            "rating_count": photo.rating_count,
+            "score": score,
+        }
+        for photo_id, score in ranking
+        if (photo := photos.get(photo_id)) is not None
+    ]
+
+
+@router.get("/top-rated", response_model=List[LeaderboardEntry])
+async def top_rated(limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    """
+    Retrieves the best rated photos voted on this week.
+
+    :param limit: Maximum number of photos.
+    :type limit: int
+    :param db: The database session.
+    :type db: Session
+    :return: The top rated photos, best first.
+    :rtype: List[LeaderboardEntry]
+    """
+    return load_entries(db, await leaderboard_service.top_rated(limit))
+
+
+@router.get("/trending", response_model=List[LeaderboardEntry])
+async def trending(limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    """
+    Retrieves the photos with the most recent votes and comments.
+
+    :param limit: Maximum number of photos.
+    :type limit: int
+    :param db: The database session.
+    :type db: Session
+    :return: The trending photos, hottest first.
+    :rtype: List[LeaderboardEntry]
+    """
+    return load_entries(db, await leaderboard_service.trending(limit))
+
+
+@router.post("/rebuild", status_code=status.HTTP_202_ACCEPTED)
+async def rebuild(current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+    """
+    Rebuilds the leaderboards from the database (admin access required).
+
+    :param current_user: The current user object.
+    :type current_user: User
+    :param db: The database session.
+    :type db: Session
+    :return: A confirmation message.
+    :rtype: dict
+    :raises HTTPException: If the current user does not have admin privileges.
+    """
+    await auth_service.check_role(current_user, "admin")
+    await leaderboard_service.rebuild(db)
+    return {"detail": "Leaderboards rebuilt"}
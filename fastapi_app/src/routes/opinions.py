@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from fastapi_app.src.database.db import get_db
+from fastapi_app.src.database.models import Photo, User
+from fastapi_app.src.repository import opinions as repository_opinions
+from fastapi_app.src.schemas import OpinionModel, PhotoRating
+from fastapi_app.src.services.auth import auth_service
+from fastapi_app.src.services.leaderboard import leaderboard_service
+from fastapi_app.src.services import realtime
+
+router = APIRouter(prefix="/opinions", tags=["opinions"])
+
+
+@router.put("/photos/{photo_id}", response_model=PhotoRating)
+async def rate_photo(
+    photo_id: int,
+    body: OpinionModel,
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Rates a photo. Voting again for the same photo replaces the previous vote.
+
+    :param photo_id: The ID of the photo to rate.
+    :type photo_id: int
+    :param body: The vote.
+    :type body: OpinionModel
+    :param current_user: The current authenticated user.
+    :type current_user: User
+    :param db: The database session.
+    :type db: Session
+    :return: The updated rating of the photo.
+    :rtype: PhotoRating
+    :raises HTTPException: If the photo is not found or belongs to the current user.
+    """
+    photo, new_vote = await repository_opinions.rate_photo(db, photo_id, current_user.id, body.vote)
+    if photo is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found")
+    await leaderboard_service.record_vote(photo, new_vote)
+    await realtime.publish(photo.id, "rating_changed", PhotoRating.from_orm(photo).json())
+    return photo
+
+
+@router.delete("/photos/{photo_id}", response_model=PhotoRating)
+async def remove_rating(
+    photo_id: int,
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Withdraws the current user's vote for a photo.
+
+    :param photo_id: The ID of the rated photo.
+    :type photo_id: int
+    :param current_user: The current authenticated user.
+    :type current_user: User
+    :param db: The database session.
+    :type db: Session
+    :return: The updated rating of the photo.
+    :rtype: PhotoRating
+    :raises HTTPException: If the photo is not found or the user has not voted for it.
+    """
+    photo = await repository_opinions.remove_rating(db, photo_id, current_user.id)
+    if photo is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Vote not found")
+    await leaderboard_service.record_vote(photo, new_vote=False)
+    await realtime.publish(photo.id, "rating_changed", PhotoRating.from_orm(photo).json())
+    return photo
+
+
+@router.get("/photos/{photo_id}", response_model=PhotoRating)
+async def read_rating(photo_id: int, db: Session = Depends(get_db)):
+    """
+    Retrieves the rating of a photo.
+
+    :param photo_id: The ID of the photo.
+    :type photo_id: int
+    :param db: The database session.
+    :type db: Session
+    :return: The rating of the photo.
+    :rtype: PhotoRating
+    :raises HTTPException: If the photo is not found.
+    """
+    photo = db.query(Photo).filter(Photo.id == photo_id).first()
+    if photo is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found")
+    return photo
@@ -0,0 +1,87 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Request, WebSocket, status
+from fastapi.responses import StreamingResponse
+from starlette.websockets import WebSocketDisconnect
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.services.realtime import photo_event_hub
+
+router = APIRouter(prefix="/realtime", tags=["realtime"])
+
+
+@router.get("/photos/{photo_id}/events")
+async def stream_photo_events(photo_id: int, request: Request):
+    """
+    Streams the comment and rating events of a photo as Server-Sent Events.
+
+    :param photo_id: The ID of the photo.
+    :type photo_id: int
+    :param request: The request object.
+    :type request: Request
+    :return: The event stream.
+    :rtype: StreamingResponse
+    :raises HTTPException: If the worker cannot accept more subscribers.
+    """
+    if photo_event_hub.is_full():
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many subscribers",
+                            headers={"Retry-After": "5"})
+
+    async def events():
+        # subscribed only once the response streams, so a client gone before that leaks nothing
+        subscriber = await photo_event_hub.subscribe(photo_id)
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                batch = await subscriber.next_batch(settings.realtime_heartbeat_seconds)
+                if not batch:
+                    yield ": keep-alive\n\n"
+                for message in batch:
+                    yield f"data: {message}\n\n"
+        finally:
+            await photo_event_hub.unsubscribe(photo_id, subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.websocket("/photos/{photo_id}/ws")
+async def photo_events_websocket(websocket: WebSocket, photo_id: int):
+    """
+    Sends the comment and rating events of a photo over a WebSocket.
+
+    Messages sent by the client are ignored; the socket is closed with code 1013 when the worker
+    cannot accept more subscribers.
+
+    :param websocket: The WebSocket connection.
+    :type websocket: WebSocket
+    :param photo_id: The ID of the photo.
+    :type photo_id: int
+    """
+    if photo_event_hub.is_full():
+        await websocket.close(code=1013)
+        return
+    await websocket.accept()
+    subscriber = await photo_event_hub.subscribe(photo_id)
+    receiver = asyncio.create_task(websocket.receive())
+    try:
+        while True:
+            waiter = asyncio.create_task(subscriber.next_batch(settings.realtime_heartbeat_seconds))
+            done, _ = await asyncio.wait({receiver, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            if waiter in done:
+                batch = waiter.result()
+                if not batch:
+                    await websocket.send_text('{"type": "keep-alive"}')
+                for message in batch:
+                    await websocket.send_text(message)
+            else:
+                waiter.cancel()
+            if receiver in done:
+                if receiver.result()["type"] == "websocket.disconnect":
+                    break
+                receiver = asyncio.create_task(websocket.receive())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        await photo_event_hub.unsubscribe(photo_id, subscriber)
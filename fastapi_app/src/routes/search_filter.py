@@ -1,71 +1,187 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from fastapi_app.src.database import models as models
 from fastapi_app.src import schemas
 from fastapi_app.src.database.db import get_db
+from fastapi_app.src.conf.config import settings
 from fastapi_app.src.services.auth import auth_service
+from fastapi_app.src.services.conditional import CachePolicy, Conditional
+from fastapi_app.src.services.rate_limit import RateLimiter
 from fastapi_app.src.repository import search_filter as crud
+from fastapi_app.src.services.search_cache import (
+    description_dependency, photo_dependency, search_cache, tag_dependency
+)
+from fastapi_app.src.services.serialization import (
+    NDJSON_MEDIA_TYPE, RawJSONResponse, accepts_ndjson, dumps, ndjson, project
+)
+from fastapi_app.src.services.tag_query import TagQueryError, parse, tag_names
 from datetime import datetime
 
 router = APIRouter(prefix="/search_filter", tags=["search_filter"])
+search_policy = CachePolicy("public, no-cache", vary=("Accept", "Accept-Encoding"))
 
-@router.get("/photos/search/{description}", response_model=List[schemas.DescriptionSearch])
+@router.get("/photos/search/{description}", response_model=List[schemas.DescriptionSearch],
+            dependencies=[Depends(RateLimiter("search"))])
 async def get_photo_by_description(
     description: str,
+    response: Response,
     rating_filter: int | None = None,
     created_at: str | None = None,
-    db: Session = Depends(get_db)
+    accept: str | None = Header(default=None),
+    db: Session = Depends(get_db),
+    conditional: Conditional = Depends(search_policy)
     ):
     """
     Retrieve a photo by its description or description with rating or date of creation.
 
+    The page is projected from the rows without validation and sent as encoded in the cache.
+    Clients accepting ``application/x-ndjson`` get every matching photo instead, streamed from a
+    server-side cursor one JSON object per line, without caching.
+
     :param description: The description of search photo.
     :type description: str
+    :param response: The response carrying the caching headers.
+    :type response: Response
     :param rating_filter: The rating of search photo.
     :type rating_filter: int
     :param created_at: The creation date of search photo.
     :type created_at: str
+    :param accept: The ``Accept`` header, selecting the streamed export.
+    :type accept: str | None
     :param db: The database session.
     :type db: Session
-    :return: The photo.
-    :rtype: dict
+    :param conditional: Validator of the ``If-None-Match`` header, the tag is derived from the cached page.
+    :type conditional: Conditional
+    :return: The photos.
+    :rtype: RawJSONResponse | StreamingResponse
     :raises HTTPException: If the photo is not found, or the photo with selected rating or creation date is not found, raises a 404 error with the detail message.
+    :raises NotModified: If the client already has the current page.
     """
+    if accepts_ndjson(accept):
+        batches = await crud.stream_description(db, description=description, rating_filter=rating_filter,
+                                                created_at=created_at)
+        return StreamingResponse(ndjson(batches, schemas.DescriptionSearch), media_type=NDJSON_MEDIA_TYPE,
+                                 headers=response.headers)
+    params = {"description": search_cache.normalize(description), "rating_filter": rating_filter,
+              "created_at": created_at}
+    cached = await search_cache.get("description", params)
+    if cached.page is not None:
+        conditional.check(cached.page.etag)
+        return RawJSONResponse(cached.page.body, headers=response.headers)
+    await search_cache.track_description_query(params["description"])
 
     query = await crud.get_description(db, description=description, rating_filter = rating_filter, created_at = created_at)
     
     if not query:
          raise HTTPException(status_code=400, detail="Description does not exist")
-    return query
+    page = project(query, schemas.DescriptionSearch)
+    dependencies = [description_dependency(params["description"])]
+    dependencies += [photo_dependency(photo.id) for photo in query]
+    stored = await search_cache.set("description", params, page, dependencies, cached.generation)
+    conditional.check(stored.etag)
+    return RawJSONResponse(stored.body, headers=response.headers)
 
 
-@router.get("/photos/search/tag/{tagname}", response_model=List[schemas.TagSearch])
+@router.get("/photos/search/tag/{tagname}", response_model=List[schemas.TagSearch],
+            dependencies=[Depends(RateLimiter("search"))])
 async def get_photo_by_tag(
     tagname: str,
+    response: Response,
     rating_filter: int | None = None,
     created_at: str | None = None,
-    db: Session = Depends(get_db)
+    accept: str | None = Header(default=None),
+    db: Session = Depends(get_db),
+    conditional: Conditional = Depends(search_policy)
     ):
     """
     Retrieve a photo by its tag or tag with rating or date of creation.
 
+    The page is projected from the rows without validation and sent as encoded in the cache.
+    Clients accepting ``application/x-ndjson`` get every matching photo instead, streamed from a
+    server-side cursor one JSON object per line, without caching.
+
     :param tagname: The tagname of search photo.
     :type tagname: str
+    :param response: The response carrying the caching headers.
+    :type response: Response
     :param rating_filter: The rating of search photo.
     :type rating_filter: int
     :param created_at: The creation date of search photo.
     :type created_at: str
+    :param accept: The ``Accept`` header, selecting the streamed export.
+    :type accept: str | None
     :param db: The database session.
     :type db: Session
-    :return: The photo.
-    :rtype: dict
+    :param conditional: Validator of the ``If-None-Match`` header, the tag is derived from the cached page.
+    :type conditional: Conditional
+    :return: The photos.
+    :rtype: RawJSONResponse | StreamingResponse
     :raises HTTPException: If the photo is not found, or the photo with selected rating or creation date is not found, raises a 404 error with the detail message.
+    :raises NotModified: If the client already has the current page.
     """
+    if accepts_ndjson(accept):
+        batches = await crud.stream_tag(db, tagname=tagname, rating_filter=rating_filter, created_at=created_at)
+        return StreamingResponse(ndjson(batches, schemas.TagSearch), media_type=NDJSON_MEDIA_TYPE,
+                                 headers=response.headers)
+    params = {"tagname": search_cache.normalize(tagname), "rating_filter": rating_filter, "created_at": created_at}
+    cached = await search_cache.get("tag", params)
+    if cached.page is not None:
+        conditional.check(cached.page.etag)
+        return RawJSONResponse(cached.page.body, headers=response.headers)
+
     query = await crud.get_tag(db, tagname=tagname, rating_filter = rating_filter, created_at = created_at)
     
     if not query:
          raise HTTPException(status_code=400, detail="Tag does not exist")
-    return query
+    page = project(query, schemas.TagSearch)
+    dependencies = [photo_dependency(photo.id) for photo in query]
+    dependencies += [tag_dependency(tag.id) for photo in query for tag in photo.tags
+                     if tag.name.lower() == params["tagname"]]
+    stored = await search_cache.set("tag", params, page, dependencies, cached.generation)
+    conditional.check(stored.etag)
+    return RawJSONResponse(stored.body, headers=response.headers)
+
+
+@router.get("/photos/tags", response_model=schemas.TagQueryResult, dependencies=[Depends(RateLimiter("search"))])
+async def search_photos_by_tags(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=500),
+    before: int | None = Query(None, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    facets: int = Query(10, ge=0, le=50),
+    db: Session = Depends(get_db),
+    ):
+    """
+    Retrieve the photos matching a boolean query over their tags, e.g. ``sunset AND beach NOT people``.
+
+    The response also counts the other tags of all the matching photos, so the query can be
+    narrowed further. Results are not cached: the facets change with every new photo.
+
+    :param response: The response carrying the headers set by the dependencies.
+    :type response: Response
+    :param q: The query, tags combined with ``AND``, ``OR``, ``NOT`` and parentheses.
+    :type q: str
+    :param before: Only photos older than this photo ID, i.e. the ID of the last photo of the previous page.
+    :type before: int | None
+    :param limit: Maximum number of photos.
+    :type limit: int
+    :param facets: Maximum number of facets.
+    :type facets: int
+    :param db: The database session.
+    :type db: Session
+    :return: The photos, the facets and the number of matching photos.
+    :rtype: RawJSONResponse
+    :raises HTTPException: If the query is malformed or has too many tags, raises a 400 error.
+    """
+    try:
+        node = parse(q, settings.tag_query_max_terms)
+    except TagQueryError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    photos, facet_counts, total = await crud.search_tags(db, node, tag_names(node), before=before, limit=limit,
+                                                         facet_limit=facets)
+    return RawJSONResponse(dumps({"photos": project(photos, schemas.TagSearch), "facets": facet_counts,
+                                  "total": total}), headers=response.headers)
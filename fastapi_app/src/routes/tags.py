@@ -0,0 +1,44 @@
+from typing import List
+
+from fastapi import APIRouter, Query
+
+from fastapi_app.src.schemas import RelatedTag, TagSuggestion
+from fastapi_app.src.services.related_tags import related_tags
+from fastapi_app.src.services.serialization import RawJSONResponse, dumps
+from fastapi_app.src.services.tag_index import tag_index
+
+router = APIRouter(prefix="/tags", tags=["tags"])
+
+
+@router.get("/suggest", response_model=List[TagSuggestion])
+async def suggest_tags(prefix: str = Query(..., min_length=1, max_length=50), limit: int = Query(10, ge=1, le=50)):
+    """
+    Suggests the most used tags starting with a prefix, for the autocomplete of the tag inputs.
+
+    The tags come from the in-memory index of the worker, no database or Redis call is made.
+
+    :param prefix: The beginning of the tag, case does not matter.
+    :type prefix: str
+    :param limit: Maximum number of tags.
+    :type limit: int
+    :return: The tags, most used first.
+    :rtype: RawJSONResponse
+    """
+    return RawJSONResponse(dumps(tag_index.suggest(prefix, limit)))
+
+
+@router.get("/related", response_model=List[RelatedTag])
+async def read_related_tags(tags: List[str] = Query(..., max_items=10), limit: int = Query(10, ge=1, le=50)):
+    """
+    Suggests the tags most often used together with some tags, e.g. while an uploader types the tags of a photo.
+
+    The suggestions come from the in-memory co-occurrence counts of the worker.
+
+    :param tags: The tags already chosen, case does not matter.
+    :type tags: List[str]
+    :param limit: Maximum number of tags.
+    :type limit: int
+    :return: The related tags, best first.
+    :rtype: RawJSONResponse
+    """
+    return RawJSONResponse(dumps(related_tags.suggest(tags, limit)))
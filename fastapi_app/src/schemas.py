@@ -134,6 +134,19 @@ class Comment(CommentBase):
         orm_mode = True
 
 
+class CommentPage(BaseModel):
+    """
+    Comment Page Model
+
+    :param items: comments on the page, oldest first
+    :type items: List[Comment]
+    :param next_cursor: cursor of the next page, None on the last page
+    :type next_cursor: str, optional
+    """
+    items: List[Comment]
+    next_cursor: Optional[str] = None
+
+
 class PhotoBase(BaseModel):
     """
     Photo Base Model
@@ -195,8 +208,12 @@ class DescriptionSearch(BaseModel):
     :type: datetime
     :param updated_at: the date and time of the photo's updating 
     :type: datetime
-    :param rating: rating of the photo - if the user like this photo or not.Use digits :max is 6  and min is 1.
-    :type rating: int 
+    :param rating: average rating of the photo, from 1 to 5 stars, 0 if nobody has voted yet.
+    :type rating: float
+    :param rating_count: number of votes given to the photo
+    :type rating_count: int
+    :param comment_count: number of comments of the photo
+    :type comment_count: int
     """
     id: int
     user_id: int
@@ -205,7 +222,9 @@ class DescriptionSearch(BaseModel):
     tags: list
     created_at: datetime | None
     updated_at: datetime | None
-    rating: int | None
+    rating: float | None
+    rating_count: int | None
+    comment_count: int | None
     class Config:
         orm_mode = True
  
@@ -229,8 +248,12 @@ class TagSearch(BaseModel):
     :type: datetime
     :param updated_at: the date and time of the photo's updating 
     :type: datetime
-    :param rating: rating of the photo - if the user like this photo or not.Use digits :max is 6  and min is 1.
-    :type rating: int 
+    :param rating: average rating of the photo, from 1 to 5 stars, 0 if nobody has voted yet.
+    :type rating: float
+    :param rating_count: number of votes given to the photo
+    :type rating_count: int
+    :param comment_count: number of comments of the photo
+    :type comment_count: int
     """
     id: int
     user_id: int
@@ -239,12 +262,119 @@ class TagSearch(BaseModel):
     tags: list | None
     created_at: datetime | None
     updated_at: datetime | None
-    rating: int | None
+    rating: float | None
+    rating_count: int | None
+    comment_count: int | None
     class Config:
         orm_mode = True
 
 
 
+class OpinionModel(BaseModel):
+    """
+    Opinion Model
+
+    :param vote: number of stars given to the photo, from 1 to 5
+    :type vote: int
+    """
+    vote: int = Field(ge=1, le=5)
+
+
+class PhotoRating(BaseModel):
+    """
+    Photo Rating Model
+
+    :param id: photo's id number
+    :type id: int
+    :param rating: average rating of the photo
+    :type rating: float
+    :param rating_sum: sum of all votes given to the photo
+    :type rating_sum: int
+    :param rating_count: number of votes given to the photo
+    :type rating_count: int
+    """
+    id: int
+    rating: float
+    rating_sum: int
+    rating_count: int
+
+    class Config:
+        orm_mode = True
+
+
+class TagSuggestion(BaseModel):
+    """
+    Tag Suggestion Model
+
+    :param name: name of the tag
+    :type name: str
+    :param count: number of photos with the tag
+    :type count: int
+    """
+    name: str
+    count: int
+
+
+class RelatedTag(BaseModel):
+    """
+    Related Tag Model
+
+    :param name: name of the tag
+    :type name: str
+    :param score: relatedness to the given tags, the sum of their normalized pointwise mutual information
+    :type score: float
+    :param count: number of photos shared with the given tags
+    :type count: int
+    """
+    name: str
+    score: float
+    count: int
+
+
+class TagQueryResult(BaseModel):
+    """
+    Tag Query Result Model
+
+    :param photos: the page of matching photos, newest first
+    :type photos: List[TagSearch]
+    :param facets: the most frequent other tags of all the matching photos
+    :type facets: List[TagSuggestion]
+    :param total: number of matching photos
+    :type total: int
+    """
+    photos: List[TagSearch]
+    facets: List[TagSuggestion]
+    total: int
+
+
+class LeaderboardEntry(BaseModel):
+    """
+    Leaderboard Entry Model
+
+    :param id: photo's id number
+    :type id: int
+    :param user_id: id number of the photo's owner
+    :type user_id: int
+    :param url: url adress of the photo
+    :type url: str
+    :param description: description of the photo
+    :type description: str, optional
+    :param rating: average rating of the photo
+    :type rating: float
+    :param rating_count: number of votes given to the photo
+    :type rating_count: int
+    :param score: ranking score of the photo in the leaderboard
+    :type score: float
+    """
+    id: int
+    user_id: int
+    url: str
+    description: Optional[str] = None
+    rating: float | None
+    rating_count: int | None
+    score: float
+
+
 class UserSearch(BaseModel):
     """
     User Search Model
@@ -271,6 +401,10 @@ class ProfileResponse(BaseModel):
     :type avatar: str
     :param photo_amount: number of images for a selected user
     :type photo_amount: int
+    :param comment_count: number of comments written by the user
+    :type comment_count: int
+    :param votes_received: number of votes given to the user's photos
+    :type votes_received: int
     """
     username: str
     email: EmailStr
@@ -278,6 +412,8 @@ class ProfileResponse(BaseModel):
     created_at: datetime
     avatar: str
     photo_amount: int
+    comment_count: int = 0
+    votes_received: int = 0
 
     class Config:
         orm_mode = True
@@ -297,3 +433,47 @@ class ProfileStatusUpdate(BaseModel):
     password: str
     avatar: str
 
+
+
+class QueryReport(BaseModel):
+    """
+    Query Report Model
+
+    :param fingerprint: normalized SQL statement
+    :type fingerprint: str
+    :param route: route template of the requests that executed the statement
+    :type route: str
+    :param count: number of executions
+    :type count: int
+    :param total_ms: total execution time in milliseconds
+    :type total_ms: float
+    :param mean_ms: mean execution time in milliseconds
+    :type mean_ms: float
+    :param max_ms: longest execution time in milliseconds
+    :type max_ms: float
+    """
+    fingerprint: str
+    route: str
+    count: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
+
+
+class ProfileSignature(BaseModel):
+    """
+    Profile Signature Model
+
+    :param header: name of the request header enabling the profiling
+    :type header: str
+    :param value: signed header value
+    :type value: str
+    :param method: HTTP method the signature is valid for
+    :type method: str
+    :param path: path the signature is valid for
+    :type path: str
+    """
+    header: str
+    value: str
+    method: str
+    path: str
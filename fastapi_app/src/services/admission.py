@@ -0,0 +1,267 @@
+import asyncio
+import heapq
+import itertools
+import math
+import re
+import time
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.services.metrics import ADMISSION_LIMIT, ADMISSION_QUEUED, ADMISSION_SHED
+
+CRITICAL, NORMAL, BULK = 0, 1, 2
+PRIORITY_NAMES = ("critical", "normal", "bulk")
+
+# Share of the concurrency limit every priority may use: as the limit shrinks, bulk requests are
+# shed first and the critical ones keep the whole limit.
+PRIORITY_SHARES = (1.0, 0.8, 0.5)
+
+# (method or None for any, path pattern, priority or None to bypass the admission control), the
+# first match wins. Realtime subscriptions are long-lived and limited by the realtime hub itself.
+PRIORITY_RULES = (
+    (None, re.compile(r"/api/realtime/"), None),
+    ("POST", re.compile(r"/api/auth/login$"), CRITICAL),
+    ("GET", re.compile(r"/api/auth/refresh_token$"), CRITICAL),
+    ("GET", re.compile(r"/api/photos/photos/\d+$"), CRITICAL),
+    ("GET", re.compile(r"/(metrics)?$"), CRITICAL),
+    ("GET", re.compile(r"/api/search_filter/"), BULK),
+    ("POST", re.compile(r"/api/photos/photos/$"), BULK),
+)
+
+
+def classify(method: str, path: str) -> int | None:
+    """
+    Returns the priority of a request.
+
+    :param method: The HTTP method.
+    :type method: str
+    :param path: The request path.
+    :type path: str
+    :return: The priority, ``NORMAL`` if no rule matches, or None if the request bypasses the admission control.
+    :rtype: int | None
+    """
+    for rule_method, pattern, priority in PRIORITY_RULES:
+        if (rule_method is None or rule_method == method) and pattern.match(path):
+            return priority
+    return NORMAL
+
+
+class GradientLimit:
+    """
+    Concurrency limit adapted to the observed latency, after the gradient algorithm of Netflix's
+    concurrency-limits.
+
+    The latency of every request is compared with its long-term average. While it stays within
+    the tolerance the limit grows by its square root, which leaves room for a small queue in the
+    database; when the latency rises above it the limit shrinks in proportion, by at most half.
+    The limit only grows while it is actually used, so an idle worker does not inflate it.
+
+    :param initial: The initial limit.
+    :type initial: float
+    :param min_limit: The lowest limit.
+    :type min_limit: float
+    :param max_limit: The highest limit.
+    :type max_limit: float
+    :param tolerance: The tolerated ratio between the recent and the long-term latency.
+    :type tolerance: float
+    :param smoothing: Weight of a new estimate of the limit.
+    :type smoothing: float
+    :param short_window: Number of requests averaged by the recent latency.
+    :type short_window: int
+    :param long_window: Number of requests averaged by the long-term latency.
+    :type long_window: int
+    """
+
+    def __init__(self, initial: float, min_limit: float, max_limit: float, tolerance: float,
+                 smoothing: float = 0.2, short_window: int = 10, long_window: int = 600):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.short_window = short_window
+        self.long_window = long_window
+        self.short_rtt = None
+        self.long_rtt = None
+
+    def update(self, rtt: float, inflight: int) -> float:
+        """
+        Adapts the limit to the latency of a finished request.
+
+        :param rtt: The latency of the request in seconds.
+        :type rtt: float
+        :param inflight: Number of requests being processed, including this one.
+        :type inflight: int
+        :return: The new limit.
+        :rtype: float
+        """
+        if self.long_rtt is None:
+            self.short_rtt = self.long_rtt = rtt
+        else:
+            self.short_rtt += (rtt - self.short_rtt) / self.short_window
+            self.long_rtt += (rtt - self.long_rtt) / self.long_window
+            # After an overload the long-term average is inflated, let it recover quickly.
+            if self.long_rtt > 2 * self.short_rtt:
+                self.long_rtt *= 0.95
+        if self.short_rtt <= 0:
+            return self.limit
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / self.short_rtt))
+        estimate = self.limit * gradient + math.sqrt(self.limit)
+        if estimate > self.limit and inflight < self.limit / 2:
+            return self.limit
+        estimate = self.limit * (1 - self.smoothing) + estimate * self.smoothing
+        self.limit = max(self.min_limit, min(self.max_limit, estimate))
+        return self.limit
+
+
+class AdmissionController:
+    """
+    Admits requests up to the adaptive concurrency limit of the worker.
+
+    A request is admitted right away if its priority has room within its share of the limit and
+    no request of the same or a higher priority is waiting. Otherwise critical and normal requests
+    wait in a bounded priority queue, for a bounded time, while bulk requests are refused at once.
+    All the methods run on the event loop of the worker, so they need no lock.
+
+    :param limit: The adaptive limit.
+    :type limit: GradientLimit
+    :param queue_size: Maximum number of waiting requests.
+    :type queue_size: int
+    :param queue_timeout: Longest wait in seconds.
+    :type queue_timeout: float
+    """
+
+    def __init__(self, limit: GradientLimit, queue_size: int, queue_timeout: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.inflight = 0
+        self.queued = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        ADMISSION_LIMIT.set(limit.limit)
+
+    def _capacity(self, priority: int) -> float:
+        return self.limit.limit * PRIORITY_SHARES[priority]
+
+    def _first_waiter(self) -> tuple[int, int, asyncio.Future] | None:
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        return self._waiters[0] if self._waiters else None
+
+    def _wake(self) -> None:
+        while (waiter := self._first_waiter()) is not None and self.inflight < self._capacity(waiter[0]):
+            heapq.heappop(self._waiters)
+            self.inflight += 1
+            waiter[2].set_result(True)
+
+    async def acquire(self, priority: int) -> bool:
+        """
+        Waits for the admission of a request; every admitted request must call :meth:`release`.
+
+        :param priority: The priority of the request.
+        :type priority: int
+        :return: True if the request is admitted, False if it must be shed.
+        :rtype: bool
+        """
+        first = self._first_waiter()
+        if (first is None or first[0] > priority) and self.inflight < self._capacity(priority):
+            self.inflight += 1
+            return True
+        if priority == BULK or self.queued >= self.queue_size:
+            return False
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self.queued += 1
+        ADMISSION_QUEUED.set(self.queued)
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            if future.done() and not future.cancelled():
+                self.release()
+            future.cancel()
+            raise
+        finally:
+            self.queued -= 1
+            ADMISSION_QUEUED.set(self.queued)
+        # The slot may have been handed over just as the wait timed out.
+        if future.done() and not future.cancelled():
+            return True
+        future.cancel()
+        return False
+
+    def observe(self, rtt: float) -> None:
+        """
+        Feeds the latency of an admitted request to the adaptive limit, before releasing it.
+
+        :param rtt: The time to the first byte of the response, in seconds.
+        :type rtt: float
+        """
+        ADMISSION_LIMIT.set(self.limit.update(rtt, self.inflight))
+        self._wake()
+
+    def release(self) -> None:
+        """
+        Frees the slot of a finished request and admits the waiting requests that fit.
+        """
+        self.inflight -= 1
+        self._wake()
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware shedding the requests a worker cannot serve in time.
+
+    Without it, requests pile up in the worker while the database is slow, until it runs out of
+    memory. Requests above the adaptive concurrency limit are answered at once with 503 and
+    ``Retry-After``, by priority: authentication, token refresh and photo reads survive longest,
+    searches and uploads are shed first. The latency fed to the limit is the time to the first
+    byte, so streamed responses do not distort it.
+
+    :param app: The wrapped application.
+    :type app: ASGIApp
+    :param controller: The admission controller, by default one configured from the settings.
+    :type controller: AdmissionController | None
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController | None = None):
+        self.app = app
+        self.controller = controller or AdmissionController(
+            GradientLimit(settings.admission_initial_limit, settings.admission_min_limit,
+                          settings.admission_max_limit, settings.admission_latency_tolerance),
+            settings.admission_queue_size,
+            settings.admission_queue_timeout_ms / 1000,
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        priority = classify(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if priority is None or not settings.admission_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.controller.acquire(priority):
+            ADMISSION_SHED.inc((PRIORITY_NAMES[priority],))
+            response = JSONResponse({"detail": "Server overloaded, retry later"}, status_code=503,
+                                    headers={"Retry-After": str(settings.admission_retry_after_seconds)})
+            await response(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        first_byte = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal first_byte
+            if message["type"] == "http.response.start":
+                first_byte = time.perf_counter() - start
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if first_byte is not None:
+                self.controller.observe(first_byte)
+            self.controller.release()
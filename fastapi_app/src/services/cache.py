@@ -0,0 +1,278 @@
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import math
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from fastapi.encoders import jsonable_encoder
+from redis.exceptions import RedisError
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.redis_db import get_redis
+
+logger = logging.getLogger(__name__)
+
+class Cache:
+    """
+    Two-level cache-aside store: a small in-process L1 in front of Redis.
+
+    Values are stored as JSON-compatible data, shared by all hits of the worker: callers must not
+    modify them. Three measures
+    keep a popular key from stampeding the database when it expires:
+
+    * concurrent misses of a worker share a single load (single-flight),
+    * entries are refreshed early with a probability growing as the expiry approaches, scaled by
+      how long the last load took (the XFetch algorithm), so one request reloads the entry while
+      the others are still served from the cache,
+    * lookups of missing rows are cached too (negative caching), for a shorter time.
+
+    The L1 is per worker and is only invalidated locally, so its TTL bounds how long other workers
+    may serve a stale value after a write.
+
+    :param namespace: Prefix of the Redis keys.
+    :type namespace: str
+    :param ttl: Lifetime of the entries in Redis, in seconds.
+    :type ttl: float
+    :param negative_ttl: Lifetime of the cached misses, in seconds.
+    :type negative_ttl: float
+    """
+
+    def __init__(self, namespace: str, ttl: float, negative_ttl: float | None = None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.negative_ttl = settings.cache_negative_ttl_seconds if negative_ttl is None else negative_ttl
+        self.l1_ttl = settings.cache_l1_ttl_seconds
+        self.l1_size = settings.cache_l1_size
+        self.beta = settings.cache_early_refresh_beta
+        self._l1: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._loading: dict[str, asyncio.Future] = {}
+
+    def key(self, identifier) -> str:
+        """
+        Returns the Redis key of an entry.
+
+        :param identifier: The identifier of the entry within the namespace.
+        :return: The key, e.g. ``cache:photo:42``.
+        :rtype: str
+        """
+        return f"cache:{self.namespace}:{identifier}"
+
+    def _l1_get(self, key: str) -> dict | None:
+        item = self._l1.get(key)
+        if item is None:
+            return None
+        if item[0] < time.monotonic():
+            self._l1.pop(key, None)
+            return None
+        self._l1.move_to_end(key)
+        return item[1]
+
+    def _l1_set(self, key: str, entry: dict) -> None:
+        self._l1[key] = (time.monotonic() + self.l1_ttl, entry)
+        self._l1.move_to_end(key)
+        while len(self._l1) > self.l1_size:
+            self._l1.popitem(last=False)
+
+    def _fresh(self, entry: dict) -> bool:
+        """
+        Tells whether an entry can be served or should be refreshed early (XFetch).
+        """
+        return time.time() - entry["delta"] * self.beta * math.log(1.0 - random.random()) < entry["expires"]
+
+    async def get_or_load(self, identifier, loader: Callable[[], Any], not_found: type[Exception] | None = None):
+        """
+        Returns a cached value, loading and caching it on a miss.
+
+        :param identifier: The identifier of the entry within the namespace.
+        :param loader: Returns the value, JSON-serializable with ``jsonable_encoder``; may be a coroutine function.
+        :type loader: Callable
+        :param not_found: Exception raised by the loader for a missing row. It is cached and
+            raised again from the cache with the same message.
+        :type not_found: type[Exception] | None
+        :return: The value as JSON-compatible data.
+        """
+        key = self.key(identifier)
+        entry = self._l1_get(key)
+        if entry is None:
+            entry = await self._redis_get(key)
+            if entry is not None and self._fresh(entry):
+                self._l1_set(key, entry)
+            else:
+                entry = await self._single_flight(key, loader, not_found)
+        return self._unpack(entry, not_found)
+
+    async def get_many(self, identifiers: list, loader: Callable[[list], Any],
+                       not_found: type[Exception]) -> list:
+        """
+        Returns many cached values at once, loading all the misses with a single call.
+
+        The entries missing from the L1 are read with one ``MGET`` and the loaded ones written
+        with one pipeline. Entries due for an early refresh are loaded with the misses. The batch
+        load bypasses the single-flight of :meth:`get_or_load`, it is one query for all the misses.
+
+        :param identifiers: The identifiers of the entries, duplicates are looked up once.
+        :type identifiers: list
+        :param loader: Takes the identifiers of the misses and returns a dict of their values,
+            JSON-serializable with ``jsonable_encoder``, or ``not_found`` instances for the
+            missing rows; may be a coroutine function.
+        :type loader: Callable
+        :param not_found: Exception of the missing rows, cached as in :meth:`get_or_load`.
+        :type not_found: type[Exception]
+        :return: The values as JSON-compatible data or ``not_found`` instances, in the order of the identifiers.
+        :rtype: list
+        """
+        unique = list(dict.fromkeys(identifiers))
+        entries = {identifier: self._l1_get(self.key(identifier)) for identifier in unique}
+        misses = [identifier for identifier, entry in entries.items() if entry is None]
+        if misses:
+            try:
+                raw = await get_redis().mget([self.key(identifier) for identifier in misses])
+            except RedisError as err:
+                logger.warning("Reading %s entries from the cache failed: %s", self.namespace, err)
+                raw = [None] * len(misses)
+            for identifier, value in zip(misses, raw):
+                entry = json.loads(value) if value is not None else None
+                if entry is not None and self._fresh(entry):
+                    entries[identifier] = entry
+                    self._l1_set(self.key(identifier), entry)
+            misses = [identifier for identifier in misses if entries[identifier] is None]
+        if misses:
+            entries.update(await self._load_many(misses, loader, not_found))
+        values = []
+        for identifier in identifiers:
+            try:
+                values.append(self._unpack(entries[identifier], not_found))
+            except not_found as err:
+                values.append(err)
+        return values
+
+    async def _load_many(self, identifiers: list, loader: Callable[[list], Any],
+                         not_found: type[Exception]) -> dict:
+        start = time.perf_counter()
+        loaded = loader(identifiers)
+        if inspect.isawaitable(loaded):
+            loaded = await loaded
+        delta, now = time.perf_counter() - start, time.time()
+        entries, ttls = {}, {}
+        for identifier in identifiers:
+            value = loaded.get(identifier, not_found(identifier))
+            if isinstance(value, not_found):
+                entry, ttls[identifier] = {"missing": str(value)}, self.negative_ttl
+            else:
+                entry, ttls[identifier] = {"value": jsonable_encoder(value)}, self.ttl
+            entry["delta"] = delta
+            entry["expires"] = now + ttls[identifier]
+            entries[identifier] = entry
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                for identifier, entry in entries.items():
+                    pipe.set(self.key(identifier), json.dumps(entry), px=max(int(ttls[identifier] * 1000), 1))
+                await pipe.execute()
+        except RedisError as err:
+            logger.warning("Caching %s entries failed: %s", self.namespace, err)
+        for identifier, entry in entries.items():
+            self._l1_set(self.key(identifier), entry)
+        return entries
+
+    async def _single_flight(self, key: str, loader: Callable[[], Any], not_found: type[Exception] | None) -> dict:
+        loop = asyncio.get_running_loop()
+        pending = self._loading.get(key)
+        if pending is not None and pending.get_loop() is loop:
+            return await asyncio.shield(pending)
+        future = self._loading[key] = loop.create_future()
+        try:
+            entry = await self._load(key, loader, not_found)
+        except Exception as err:
+            future.set_exception(err)
+            future.exception()  # marks it retrieved, the waiting requests re-raise it
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(entry)
+            return entry
+        finally:
+            if self._loading.get(key) is future:
+                del self._loading[key]
+
+    async def _load(self, key: str, loader: Callable[[], Any], not_found: type[Exception] | None) -> dict:
+        start = time.perf_counter()
+        try:
+            value = loader()
+            if inspect.isawaitable(value):
+                value = await value
+        except Exception as err:
+            if not_found is None or not isinstance(err, not_found):
+                raise
+            entry, ttl = {"missing": str(err)}, self.negative_ttl
+        else:
+            entry, ttl = {"value": jsonable_encoder(value)}, self.ttl
+        entry["delta"] = time.perf_counter() - start
+        entry["expires"] = time.time() + ttl
+        try:
+            await get_redis().set(key, json.dumps(entry), px=max(int(ttl * 1000), 1))
+        except RedisError as err:
+            logger.warning("Caching %s failed: %s", key, err)
+        self._l1_set(key, entry)
+        return entry
+
+    async def _redis_get(self, key: str) -> dict | None:
+        try:
+            raw = await get_redis().get(key)
+        except RedisError as err:
+            logger.warning("Reading %s from the cache failed: %s", key, err)
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    @staticmethod
+    def _unpack(entry: dict, not_found: type[Exception] | None):
+        if "missing" in entry:
+            raise (not_found or LookupError)(entry["missing"])
+        return entry["value"]
+
+    async def invalidate(self, identifier) -> None:
+        """
+        Drops an entry after the cached row changed; call it after the change was committed.
+
+        :param identifier: The identifier of the entry within the namespace.
+        """
+        key = self.key(identifier)
+        self._l1.pop(key, None)
+        try:
+            await get_redis().delete(key)
+        except RedisError as err:
+            logger.warning("Invalidating %s failed: %s", key, err)
+
+    def cached(self, key: Callable[..., Any], not_found: type[Exception] | None = None):
+        """
+        Decorates a repository read with the cache.
+
+        The decorated function becomes a coroutine function returning the JSON-compatible form of
+        the result; the original function stays available as ``uncached``.
+
+        :param key: Builds the identifier of the entry from the arguments of the read.
+        :type key: Callable
+        :param not_found: Exception raised by the read for a missing row, see :meth:`get_or_load`.
+        :type not_found: type[Exception] | None
+        :return: The decorator.
+        :rtype: Callable
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                return await self.get_or_load(key(*args, **kwargs), lambda: func(*args, **kwargs), not_found)
+
+            wrapper.uncached = func
+            return wrapper
+
+        return decorator
+
+
+# The version changes with the shape of the cached photos (see photo_data), so entries of the old shape are not served.
+photo_cache = Cache("photo:v2", ttl=settings.photo_cache_ttl_seconds)
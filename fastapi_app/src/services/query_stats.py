@@ -0,0 +1,114 @@
+import logging
+import re
+import threading
+from functools import lru_cache
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.services.metrics import current_request
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAMETER = re.compile(r"%\([^)]+\)s|%s|(?<![:\w]):\w+|\$\d+|\?")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+OTHER_FINGERPRINT = "<other>"
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """
+    Normalizes a SQL statement, so that executions differing only in their values are grouped.
+
+    Literals and bind parameters become ``?`` and value lists such as ``IN (?, ?, ?)`` collapse
+    to ``(...)``, which also merges the expanded ``IN`` parameters rendered by SQLAlchemy.
+
+    :param statement: The SQL statement.
+    :type statement: str
+    :return: The fingerprint.
+    :rtype: str
+    """
+    normalized = _STRING.sub("?", statement)
+    normalized = _PARAMETER.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _VALUE_LIST.sub("(...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+class QueryStats:
+    """
+    Aggregated statistics of the SQL statements executed by this worker, by fingerprint and route.
+
+    :param max_entries: Maximum number of (fingerprint, route) pairs tracked; further pairs are
+        counted under ``<other>`` so that unexpected statements cannot grow the memory use.
+    :type max_entries: int
+    """
+
+    def __init__(self, max_entries: int = 2000):
+        self.max_entries = max_entries
+        self._entries: dict[tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration: float) -> None:
+        """
+        Records an executed statement and logs it if it was slow.
+
+        :param statement: The SQL statement.
+        :type statement: str
+        :param duration: The duration in seconds.
+        :type duration: float
+        """
+        stats = current_request.get()
+        route = stats.route if stats is not None else "background"
+        key = (fingerprint(statement), route)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_entries:
+                    key = (OTHER_FINGERPRINT, route)
+                entry = self._entries.setdefault(key, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += duration
+            if duration > entry[2]:
+                entry[2] = duration
+        if duration * 1000 >= settings.slow_query_ms:
+            logger.warning("Slow query (%.1f ms) in %s: %s", duration * 1000, route, key[0])
+
+    def top(self, limit: int = 20, order_by: str = "total") -> list[dict]:
+        """
+        Returns the most expensive fingerprints.
+
+        :param limit: Maximum number of fingerprints.
+        :type limit: int
+        :param order_by: Sort key: ``total``, ``mean``, ``max`` or ``count``.
+        :type order_by: str
+        :return: The statistics of the fingerprints, most expensive first.
+        :rtype: list[dict]
+        """
+        with self._lock:
+            entries = [(key, list(entry)) for key, entry in self._entries.items()]
+        report = [
+            {
+                "fingerprint": query,
+                "route": route,
+                "count": count,
+                "total_ms": round(total * 1000, 3),
+                "mean_ms": round(total * 1000 / count, 3),
+                "max_ms": round(longest * 1000, 3),
+            }
+            for (query, route), (count, total, longest) in entries
+        ]
+        report.sort(key=lambda item: item["count"] if order_by == "count" else item[f"{order_by}_ms"], reverse=True)
+        return report[:limit]
+
+    def reset(self) -> None:
+        """
+        Forgets all recorded statements.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+query_stats = QueryStats()
@@ -0,0 +1,302 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from typing import Iterable, NamedTuple
+
+from redis.exceptions import RedisError
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.redis_db import get_redis, run_script
+from fastapi_app.src.services.conditional import entity_tag
+from fastapi_app.src.services.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+ENTRY_KEY_PREFIX = "search:"
+VERSION_KEY_PREFIX = "search:version:"
+DESCRIPTION_QUERIES_KEY = "search:description:queries"
+WRITES_KEY = "search:writes"
+
+# An entry is "<JSON object of dependency versions>\n<JSON value>". It is served only while every
+# dependency still has the version it had when the entry was stored. Both scripts return the versions,
+# the entity tag of the page is derived from them.
+#
+# The dependencies of a page are only known once it is computed, so their versions can't be read
+# before the query. Instead a miss returns the write generation, a counter every invalidation
+# increments before the versions. If an invalidation started since, the versions read at store time
+# could already count a write the query did not see: such a page is only kept for the short race
+# TTL, and its versions get the digest of the page under the '#' key, so that its entity tag can't
+# match a different page stamped with the same versions.
+_READ_SCRIPT = """
+local raw = redis.call('GET', KEYS[1])
+if raw then
+    local split = string.find(raw, '\\n', 1, true)
+    for dependency, version in pairs(cjson.decode(string.sub(raw, 1, split - 1))) do
+        if dependency ~= '#' and (redis.call('GET', ARGV[1] .. dependency) or '0') ~= version then
+            raw = false
+            break
+        end
+    end
+end
+if raw then
+    return {1, raw}
+end
+return {0, redis.call('GET', KEYS[2]) or '0'}
+"""
+
+_WRITE_SCRIPT = """
+local versions = {}
+for i = 6, #ARGV do
+    versions[ARGV[i]] = redis.call('GET', ARGV[2] .. ARGV[i]) or '0'
+end
+local ttl = ARGV[1]
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[4] then
+    ttl = ARGV[5]
+    versions['#'] = redis.sha1hex(ARGV[3])
+end
+local encoded = cjson.encode(versions)
+redis.call('SET', KEYS[1], encoded .. '\\n' .. ARGV[3], 'EX', ttl)
+return encoded
+"""
+
+
+class SearchPage(NamedTuple):
+    """
+    A search result page with its entity tag.
+
+    :param body: The page encoded as JSON, sent as it is.
+    :type body: bytes
+    :param etag: The entity tag derived from the versions of the dependencies, or None if the
+        page could not be cached.
+    :type etag: str | None
+    """
+    body: bytes
+    etag: str | None
+
+
+class SearchLookup(NamedTuple):
+    """
+    The outcome of a cache lookup.
+
+    :param page: The cached page, or None on a miss.
+    :type page: SearchPage | None
+    :param generation: On a miss, the write generation to pass to :meth:`SearchCache.set`, or None
+        if the cache could not be read.
+    :type generation: str | None
+    """
+    page: SearchPage | None
+    generation: str | None
+
+
+def photo_dependency(photo_id: int) -> str:
+    """
+    Returns the dependency of the cached searches on the content of a photo.
+
+    :param photo_id: The ID of the photo.
+    :type photo_id: int
+    :return: The dependency name.
+    :rtype: str
+    """
+    return f"photo:{photo_id}"
+
+
+def tag_dependency(tag_id: int) -> str:
+    """
+    Returns the dependency of the cached searches on the set of photos with a tag.
+
+    :param tag_id: The ID of the tag.
+    :type tag_id: int
+    :return: The dependency name.
+    :rtype: str
+    """
+    return f"tag:{tag_id}"
+
+
+def description_dependency(query: str) -> str:
+    """
+    Returns the dependency of the cached searches on the set of photos whose description matches a query.
+
+    :param query: The normalized description query.
+    :type query: str
+    :return: The dependency name.
+    :rtype: str
+    """
+    return f"description:{query}"
+
+
+def like_matches(pattern: str, text: str) -> bool:
+    """
+    Tells whether ``text`` contains ``pattern`` the way ``ILIKE '%pattern%'`` does, honoring its wildcards.
+
+    :param pattern: The normalized query.
+    :type pattern: str
+    :param text: The text, in lower case.
+    :type text: str
+    :return: True if the text matches.
+    :rtype: bool
+    """
+    if "%" not in pattern and "_" not in pattern:
+        return pattern in text
+    regex = "".join(".*" if char == "%" else "." if char == "_" else re.escape(char) for char in pattern)
+    return re.search(regex, text, re.DOTALL) is not None
+
+
+class SearchCache:
+    """
+    Cache of search result pages, invalidated through dependency version counters.
+
+    Every entry lists the dependencies it was computed from (the photos it contains, the tag or
+    description query it searched) with their version at store time. A write increments the
+    counters of the dependencies it affects, which turns exactly the entries depending on them
+    stale, without scanning or flushing the others. Validation and storage are Lua scripts, so a lookup
+    is a single round trip. The scripts read the version keys by name, which assumes a single
+    Redis instance rather than a cluster. A page computed while any invalidation started may be
+    stamped with versions counting a write it missed, so it is only kept for a few seconds.
+
+    New photos cannot be tracked by the entries they would join, so the cached description
+    queries are kept in a sorted set, and a new or edited description only invalidates the
+    queries it matches.
+    """
+
+    def __init__(self):
+        self.ttl = settings.search_cache_ttl_seconds
+        self.race_ttl = settings.search_cache_race_ttl_seconds
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+        Normalizes a search text. The searches use ``ILIKE``, so only the case is irrelevant;
+        whitespace is kept, it changes the matches.
+
+        :param text: The search text.
+        :type text: str
+        :return: The normalized text.
+        :rtype: str
+        """
+        return text.lower()
+
+    @staticmethod
+    def key(kind: str, params: dict) -> str:
+        """
+        Builds the key of a result page from the search kind and its normalized parameters.
+
+        :param kind: The kind of search, e.g. ``tag``.
+        :type kind: str
+        :param params: The query, filters and cursor of the search.
+        :type params: dict
+        :return: The Redis key.
+        :rtype: str
+        """
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        return f"{ENTRY_KEY_PREFIX}{kind}:{digest}"
+
+    async def get(self, kind: str, params: dict) -> SearchLookup:
+        """
+        Returns a cached result page if none of its dependencies changed.
+
+        Call it before running the query: on a miss, it also returns the write generation that
+        :meth:`set` checks.
+
+        :param kind: The kind of search.
+        :type kind: str
+        :param params: The query, filters and cursor of the search.
+        :type params: dict
+        :return: The cached page, or the write generation on a miss.
+        :rtype: SearchLookup
+        """
+        key = self.key(kind, params)
+        try:
+            hit, raw = await run_script(_READ_SCRIPT, keys=[key, WRITES_KEY], args=[VERSION_KEY_PREFIX])
+        except RedisError as err:
+            logger.warning("Reading a %s search from the cache failed: %s", kind, err)
+            return SearchLookup(None, None)
+        if not hit:
+            return SearchLookup(None, raw)
+        versions, _, body = raw.partition("\n")
+        return SearchLookup(SearchPage(body.encode(), entity_tag(key, versions)), None)
+
+    async def set(self, kind: str, params: dict, value, dependencies: Iterable[str], generation: str | None):
+        """
+        Stores a result page with the current versions of its dependencies. If a write was
+        invalidated since the lookup, the page may miss it, so it is only stored for the race TTL.
+
+        :param kind: The kind of search.
+        :type kind: str
+        :param params: The query, filters and cursor of the search.
+        :type params: dict
+        :param value: The result page, e.g. projected with :func:`~fastapi_app.src.services.serialization.project`.
+        :param dependencies: The dependencies the page was computed from.
+        :type dependencies: Iterable[str]
+        :param generation: The write generation returned by :meth:`get` before the query.
+        :type generation: str | None
+        :return: The encoded page, without entity tag if it could not be stored.
+        :rtype: SearchPage
+        """
+        key = self.key(kind, params)
+        body = dumps(value)
+        if generation is None:
+            return SearchPage(body, None)
+        try:
+            versions = await run_script(_WRITE_SCRIPT, keys=[key, WRITES_KEY],
+                                        args=[self.ttl, VERSION_KEY_PREFIX, body, generation, self.race_ttl,
+                                              *sorted(set(dependencies))])
+        except RedisError as err:
+            logger.warning("Caching a %s search failed: %s", kind, err)
+            return SearchPage(body, None)
+        return SearchPage(body, entity_tag(key, versions))
+
+    async def track_description_query(self, query: str) -> None:
+        """
+        Registers a cached description query, so that new matching descriptions invalidate it.
+
+        :param query: The normalized description query.
+        :type query: str
+        """
+        try:
+            await get_redis().zadd(DESCRIPTION_QUERIES_KEY, {query: time.time()})
+        except RedisError as err:
+            logger.warning("Tracking the description query %r failed: %s", query, err)
+
+    async def invalidate_description(self, description: str | None) -> None:
+        """
+        Invalidates the cached description queries matching a new or edited description.
+
+        :param description: The new description.
+        :type description: str | None
+        """
+        if not description:
+            return
+        text = description.lower()
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                pipe.zremrangebyscore(DESCRIPTION_QUERIES_KEY, "-inf", time.time() - self.ttl)
+                pipe.zrange(DESCRIPTION_QUERIES_KEY, 0, -1)
+                _, queries = await pipe.execute()
+        except RedisError as err:
+            logger.warning("Reading the cached description queries failed: %s", err)
+            return
+        await self.invalidate(*(description_dependency(query) for query in queries if like_matches(query, text)))
+
+    async def invalidate(self, *dependencies: str) -> None:
+        """
+        Turns stale every cached page depending on the given dependencies; call it after committing.
+
+        :param dependencies: The changed dependencies.
+        :type dependencies: str
+        """
+        if not dependencies:
+            return
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                # first, so a page computed before this write is stored either with the old versions or briefly
+                pipe.incr(WRITES_KEY)
+                for dependency in dependencies:
+                    pipe.incr(f"{VERSION_KEY_PREFIX}{dependency}")
+                await pipe.execute()
+        except RedisError as err:
+            logger.warning("Invalidating searches depending on %s failed: %s", ", ".join(dependencies), err)
+
+
+search_cache = SearchCache()
@@ -0,0 +1,152 @@
+import functools
+from typing import Any, Callable, Iterable, Iterator
+
+import orjson
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_LIST, SHAPE_SEQUENCE, SHAPE_SINGLETON
+from sqlalchemy import inspect as sa_inspect
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class RawJSONResponse(Response):
+    """
+    JSON response whose content is already encoded, e.g. by :func:`dumps` or read from the cache.
+
+    Returning it from a route skips the validation against the response model and the encoding.
+    """
+    media_type = "application/json"
+
+
+def dumps(content) -> bytes:
+    """
+    Encodes content as JSON with orjson.
+
+    orjson encodes dicts, lists, datetimes and the other basic types itself, in the format of
+    ``jsonable_encoder``; anything else, e.g. a pydantic model, goes through ``jsonable_encoder``.
+
+    :param content: The content.
+    :return: The JSON document.
+    :rtype: bytes
+    """
+    return orjson.dumps(content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _columns(row) -> dict:
+    mapper = sa_inspect(row).mapper
+    return {column.key: getattr(row, column.key) for column in mapper.column_attrs}
+
+
+def _plain(value):
+    if isinstance(value, (list, tuple, set)):
+        return [_plain(item) for item in value]
+    if hasattr(value, "__table__"):
+        return _columns(value)
+    return value
+
+
+@functools.lru_cache(maxsize=None)
+def projector(model: type[BaseModel]) -> Callable[[Any], dict]:
+    """
+    Builds a function reading the fields of a response model from an ORM object.
+
+    It is the trusted counterpart of ``model.from_orm(row).dict()``: the values are copied as
+    they are, without validation or coercion, so only use it for rows whose column types already
+    match the model. Nested models are projected recursively, untyped lists of ORM objects become
+    lists of their columns, as ``jsonable_encoder`` would render them.
+
+    :param model: The response model.
+    :type model: type[BaseModel]
+    :return: The projection of one object.
+    :rtype: Callable
+    """
+    readers = []
+    for field in model.__fields__.values():
+        reader = None
+        if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+            nested = projector(field.type_)
+            if field.shape == SHAPE_SINGLETON:
+                reader = nested
+            elif field.shape in (SHAPE_LIST, SHAPE_SEQUENCE):
+                def reader(items, nested=nested):
+                    return [nested(item) for item in items]
+        elif field.shape != SHAPE_SINGLETON or field.type_ in (list, tuple, set):
+            reader = _plain
+        readers.append((field.alias, field.name, reader))
+
+    def project_one(row) -> dict:
+        item = {}
+        for alias, name, reader in readers:
+            value = getattr(row, name, None)
+            item[alias] = reader(value) if reader is not None and value is not None else value
+        return item
+
+    return project_one
+
+
+def project(rows: Iterable, model: type[BaseModel]) -> list[dict]:
+    """
+    Projects ORM objects on a response model without per-object validation, see :func:`projector`.
+
+    :param rows: The ORM objects.
+    :type rows: Iterable
+    :param model: The response model.
+    :type model: type[BaseModel]
+    :return: The fields of every object, ready for :func:`dumps`.
+    :rtype: list[dict]
+    """
+    project_one = projector(model)
+    return [project_one(row) for row in rows]
+
+
+def accepts_ndjson(accept: str | None) -> bool:
+    """
+    Tells whether a client asked for newline-delimited JSON with its ``Accept`` header.
+
+    :param accept: The ``Accept`` header.
+    :type accept: str | None
+    :return: True if NDJSON is acceptable, it is then preferred over a JSON array.
+    :rtype: bool
+    """
+    return bool(accept) and any(item.split(";")[0].strip() == NDJSON_MEDIA_TYPE for item in accept.split(","))
+
+
+def ndjson(batches: Iterable[Iterable], model: type[BaseModel]) -> Iterator[bytes]:
+    """
+    Encodes batches of ORM objects as newline-delimited JSON, one chunk per batch.
+
+    The objects are projected on the response model as in :func:`project`. Only one batch is held
+    at a time, so the memory stays flat whatever the number of rows.
+
+    :param batches: The batches of ORM objects, e.g. the partitions of a server-side cursor.
+    :type batches: Iterable[Iterable]
+    :param model: The response model.
+    :type model: type[BaseModel]
+    :return: The chunks of the body, every row on its own line.
+    :rtype: Iterator[bytes]
+    """
+    project_one = projector(model)
+    for batch in batches:
+        yield b"".join(dumps(project_one(row)) + b"\n" for row in batch)
+
+
+def multi_get_results(ids: list, values: list) -> list[dict]:
+    """
+    Builds the items of a batched lookup, one per requested ID and in the order of the request.
+
+    :param ids: The requested IDs.
+    :type ids: list
+    :param values: The found values, or the exceptions of the IDs that were not found, in the order of the IDs.
+    :type values: list
+    :return: ``{"id": ..., "status": 200, "data": ...}`` for the found values and
+        ``{"id": ..., "status": 404, "detail": ...}`` for the others.
+    :rtype: list[dict]
+    """
+    return [
+        {"id": item_id, "status": 404, "detail": str(value)} if isinstance(value, Exception)
+        else {"id": item_id, "status": 200, "data": value}
+        for item_id, value in zip(ids, values)
+    ]
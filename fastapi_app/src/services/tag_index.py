@@ -0,0 +1,243 @@
+import asyncio
+import fcntl
+import glob
+import heapq
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.db import SessionLocal
+from fastapi_app.src.repository.tags import tag_usage
+
+logger = logging.getLogger(__name__)
+
+# Sorts after every character, so the keys starting with a prefix are those in [prefix, prefix + _LAST).
+_LAST = chr(0x10FFFF)
+
+
+def _key(name: str) -> str:
+    return name.casefold()
+
+
+class TagIndex:
+    """
+    In-memory prefix index of the tag names, ranked by the number of photos of every tag.
+
+    The names are kept in an array sorted by their case-folded form, so the names starting with a
+    prefix are a range found by binary search, and the most used ones of the range are picked
+    with a heap. The answers are memoized per prefix, and a change of a tag only drops the
+    memoized prefixes of its name, so short prefixes, whose ranges are the widest, are mostly
+    served from the memo.
+
+    The workers share the index through a JSON snapshot file. One worker at a time, holding a
+    lock on ``<path>.lock``, rebuilds it from the database every ``rebuild_seconds``; the others
+    load it when its modification time changes. Between rebuilds, the changes of the usage counts
+    are appended to a journal, ``<path>.<generation>.log``, which every worker replays. A change
+    appended while a rebuild is published may only show up with the next rebuild.
+
+    :param path: The snapshot file.
+    :type path: str
+    :param refresh_seconds: Interval between checks of the snapshot and the journal.
+    :type refresh_seconds: float
+    :param rebuild_seconds: Age of the snapshot at which it is rebuilt.
+    :type rebuild_seconds: float
+    :param cache_size: Maximum number of memoized prefixes.
+    :type cache_size: int
+    """
+
+    def __init__(self, path: str, refresh_seconds: float, rebuild_seconds: float, cache_size: int):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self.cache_size = cache_size
+        self.generation = None
+        self._mtime = None
+        self._journal_offset = 0
+        self._keys: list[str] = []
+        self._names: list[str] = []
+        self._weights: list[int] = []
+        self._memo: OrderedDict[str, dict[int, list[dict]]] = OrderedDict()
+
+    def journal_path(self, generation) -> str:
+        """
+        Returns the journal of a generation of the snapshot, e.g. ``tag_index/tags.json.1722200000000.log``.
+        """
+        return f"{self.path}.{generation}.log"
+
+    def suggest(self, prefix: str, limit: int) -> list[dict]:
+        """
+        Returns the most used tags starting with a prefix, ignoring case.
+
+        :param prefix: The beginning of the tag names.
+        :type prefix: str
+        :param limit: Maximum number of tags.
+        :type limit: int
+        :return: The tags, most used first, as ``{"name": ..., "count": ...}``; ties are sorted by name.
+        :rtype: list[dict]
+        """
+        prefix = _key(prefix)
+        memo = self._memo.get(prefix)
+        if memo is None:
+            memo = self._memo[prefix] = {}
+            while len(self._memo) > self.cache_size:
+                self._memo.popitem(last=False)
+        else:
+            self._memo.move_to_end(prefix)
+        found = memo.get(limit)
+        if found is None:
+            start = bisect_left(self._keys, prefix)
+            end = bisect_left(self._keys, prefix + _LAST, start)
+            best = heapq.nlargest(limit, range(start, end), key=self._weights.__getitem__)
+            found = memo[limit] = [{"name": self._names[index], "count": self._weights[index]} for index in best]
+        return found
+
+    def _apply(self, name: str, delta: int) -> None:
+        key = _key(name)
+        index = bisect_left(self._keys, key)
+        while index < len(self._keys) and self._keys[index] == key and self._names[index] != name:
+            index += 1
+        if index < len(self._keys) and self._names[index] == name:
+            self._weights[index] = max(self._weights[index] + delta, 0)
+        else:
+            self._keys.insert(index, key)
+            self._names.insert(index, name)
+            self._weights.insert(index, max(delta, 0))
+        for length in range(len(key) + 1):
+            self._memo.pop(key[:length], None)
+
+    def _replay(self) -> None:
+        """
+        Applies the journal entries appended since the last replay.
+        """
+        if self.generation is None:
+            return
+        try:
+            with open(self.journal_path(self.generation), "rb") as journal:
+                journal.seek(self._journal_offset)
+                data = journal.read()
+        except FileNotFoundError:
+            return
+        # A line still being appended by another worker is left for the next replay.
+        complete = data[:data.rfind(b"\n") + 1]
+        self._journal_offset += len(complete)
+        for line in complete.splitlines():
+            name, delta = json.loads(line)
+            self._apply(name, delta)
+
+    def record(self, counts: dict[str, int]) -> None:
+        """
+        Changes the usage counts of some tags, e.g. when a photo is created or deleted, in every worker.
+
+        Unknown tags are added. The change is appended to the journal of the snapshot and
+        replayed at once by this worker, the other workers replay it on their next refresh.
+
+        :param counts: The changes of the counts by tag name.
+        :type counts: dict[str, int]
+        """
+        lines = b"".join(json.dumps([name, delta]).encode() + b"\n" for name, delta in counts.items() if name)
+        if not lines:
+            return
+        if self.generation is None:
+            for name, delta in counts.items():
+                if name:
+                    self._apply(name, delta)
+            return
+        try:
+            fd = os.open(self.journal_path(self.generation), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, lines)
+            finally:
+                os.close(fd)
+        except OSError as err:
+            logger.warning("Journaling tag counts failed: %s", err)
+            return
+        self._replay()
+
+    def _read_snapshot(self) -> tuple[int, list[list]]:
+        with open(self.path, "rb") as snapshot:
+            data = json.loads(snapshot.read())
+        return data["generation"], data["tags"]
+
+    def _load(self, generation: int, tags: list[list], mtime: float) -> None:
+        """
+        Replaces the index with a snapshot, already sorted by key, then replays its journal.
+        """
+        self._keys = [_key(name) for name, _ in tags]
+        self._names = [name for name, _ in tags]
+        self._weights = [count for _, count in tags]
+        self._memo.clear()
+        self.generation, self._mtime, self._journal_offset = generation, mtime, 0
+        self._replay()
+
+    def _rebuild(self) -> tuple[int, list[list], float] | None:
+        """
+        Writes a new snapshot from the database unless another worker is doing it or just did.
+
+        :return: The generation, the tags and the modification time of the new snapshot, or None.
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.lock", "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            if not self._stale():
+                return None
+            with SessionLocal() as db:
+                usage = tag_usage(db)
+            tags = sorted(([name, count] for name, count in usage), key=lambda tag: (_key(tag[0]), tag[0]))
+            generation = time.time_ns()
+            temporary = f"{self.path}.{os.getpid()}.tmp"
+            with open(temporary, "w") as snapshot:
+                json.dump({"generation": generation, "tags": tags}, snapshot, separators=(",", ":"))
+            os.replace(temporary, self.path)
+            for journal in glob.glob(glob.escape(self.path) + ".*.log"):
+                if journal != self.journal_path(generation):
+                    os.remove(journal)
+            return generation, tags, os.stat(self.path).st_mtime
+
+    def _stale(self) -> bool:
+        try:
+            return os.stat(self.path).st_mtime < time.time() - self.rebuild_seconds
+        except FileNotFoundError:
+            return True
+
+    async def refresh(self) -> None:
+        """
+        Rebuilds the snapshot when it is stale, loads it when another worker replaced it and
+        replays the journal. The file and database work runs in a thread.
+        """
+        try:
+            if self._stale():
+                rebuilt = await asyncio.to_thread(self._rebuild)
+                if rebuilt is not None:
+                    self._load(*rebuilt)
+                    return
+            mtime = os.stat(self.path).st_mtime
+            if mtime != self._mtime:
+                generation, tags = await asyncio.to_thread(self._read_snapshot)
+                self._load(generation, tags, mtime)
+            else:
+                self._replay()
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, SQLAlchemyError) as err:
+            logger.warning("Refreshing the tag index failed: %s", err)
+
+    async def run(self) -> None:
+        """
+        Refreshes the index periodically. Meant to run as a background task of a worker.
+        """
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_seconds)
+
+
+tag_index = TagIndex(settings.tag_index_path, settings.tag_index_refresh_seconds,
+                     settings.tag_index_rebuild_seconds, settings.tag_index_cache_size)
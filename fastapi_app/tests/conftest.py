@@ -10,6 +10,8 @@ from fastapi_app.src.conf.config import settings
 from fastapi_app.src.database.models import User, Photo
 
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
+# The route tests log in and upload far more often than the production limits allow.
+settings.rate_limit_enabled = False
 
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
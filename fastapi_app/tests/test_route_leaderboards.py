@@ -0,0 +1,75 @@
+import pytest
+import redis
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.models import User
+from fastapi_app.src.services.leaderboard import TRENDING_EPOCH_KEY, TRENDING_KEY, leaderboard_service
+
+
+def login(client, session, user):
+    client.post("/api/auth/signup", json=user)
+    current_user: User = session.query(User).filter(User.email == user.get('email')).first()
+    current_user.confirmed = True
+    session.commit()
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get('username'), "password": user.get('password')}
+    )
+    return response.json()["access_token"]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def empty_leaderboards():
+    client = redis.Redis(host=settings.redis_host, port=settings.redis_port, password=settings.redis_password)
+    keys = (TRENDING_KEY, TRENDING_EPOCH_KEY, leaderboard_service.top_rated_key())
+    client.delete(*keys)
+    yield
+    client.delete(*keys)
+    client.close()
+
+
+@pytest.fixture()
+def token(client, user, session):
+    # the first user signing up is the admin
+    return login(client, session, user)
+
+
+@pytest.fixture()
+def voter_token(client, session):
+    voter = {"username": "boardvoter", "email": "boardvoter@example.com", "password": "Voter!2"}
+    return login(client, session, voter)
+
+
+def test_voted_photo_is_on_both_leaderboards(client, token, voter_token):
+    response = client.post("/api/photos/photos/?description=garden&tags=pretty",
+                           headers={"Authorization": f"Bearer {token}"}, files={"file": "@Woda.jpeg;type=image/jpeg"})
+    assert response.status_code == 201, response.text
+    photo_id = response.json()["id"]
+    response = client.put(f"/api/opinions/photos/{photo_id}", json={"vote": 5},
+                          headers={"Authorization": f"Bearer {voter_token}"})
+    assert response.status_code == 200, response.text
+
+    response = client.get("/api/leaderboards/top-rated")
+    assert response.status_code == 200, response.text
+    [entry] = response.json()
+    assert entry["id"] == photo_id
+    assert entry["rating"] == 5.0
+    assert entry["score"] == pytest.approx(leaderboard_service.rating_score(5, 1))
+
+    response = client.get("/api/leaderboards/trending?limit=1")
+    assert response.status_code == 200, response.text
+    assert [entry["id"] for entry in response.json()] == [photo_id]
+
+
+def test_leaderboard_limit_is_bounded(client):
+    response = client.get("/api/leaderboards/trending?limit=1000")
+    assert response.status_code == 422, response.text
+
+
+def test_rebuild_requires_admin(client, token, voter_token):
+    response = client.post("/api/leaderboards/rebuild", headers={"Authorization": f"Bearer {voter_token}"})
+    assert response.status_code == 403, response.text
+
+    response = client.post("/api/leaderboards/rebuild", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 202, response.text
+    assert [entry["id"] for entry in client.get("/api/leaderboards/top-rated").json()] == [1]
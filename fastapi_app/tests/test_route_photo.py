@@ -1,9 +1,12 @@
 from fastapi.testclient import TestClient
 from fastapi import status
 from fastapi_app.main import app
-from unittest.mock import MagicMock, patch
 import pytest
+import redis
+from sqlalchemy import func
+from fastapi_app.src.conf.config import settings
 from fastapi_app.src.database.models import User, Photo
+from fastapi_app.src.services.cache import photo_cache
 from fastapi_app.src.services.auth import auth_service
 from fastapi_app.src.services.auth import Auth
 
@@ -26,9 +29,7 @@ def test_create_photo_unauthorized():
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
 @pytest.fixture()
-def token(client, user, session, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("fastapi_app.src.routes.auth.send_email", mock_send_email)
+def token(client, user, session):
     client.post("/api/auth/signup", json=user)
     current_user: User = session.query(User).filter(User.email == user.get('email')).first()
     current_user.confirmed = True
@@ -87,4 +88,52 @@ def test_delete_photo_not_found():
     Test about deleting photo by photo id
     """
     response = client.delete('http://localhost:8000/api/photos/photos/3')
-    assert response.status_code == 404, response.text
\ No newline at end of file
+    assert response.status_code == 404, response.text
+
+
+def test_read_photos_in_request_order(client, token):
+    """
+    Test about reading many photos at once, the missing ones get their own 404 item
+    """
+    created = client.post("http://localhost:8000/api/photos/photos/?description=lake&tags=blue calm",
+                          headers={"Authorization": f"Bearer {token}"}, files={"file": "@Woda.jpeg;type=image/jpeg"})
+    assert created.status_code == 201, created.text
+    photo_id = created.json()["id"]
+
+    response = client.get(f'http://localhost:8000/api/photos/photos/?ids=999&ids={photo_id}')
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert [item["id"] for item in data] == [999, photo_id]
+    assert data[0] == {"id": 999, "status": 404, "detail": "Photo with ID 999 not found"}
+    assert data[1]["status"] == 200
+    assert data[1]["data"]["description"] == "lake"
+    assert sorted(tag["name"] for tag in data[1]["data"]["tags"]) == ["blue", "calm"]
+
+
+def test_read_photos_too_many_ids(client):
+    """
+    Test about the limit of IDs of a batched read
+    """
+    response = client.get('http://localhost:8000/api/photos/photos/?' + '&'.join(f'ids={i}' for i in range(1, 200)))
+    assert response.status_code == 422, response.text
+
+
+def test_read_photo_created_after_a_miss(client, token, session):
+    """
+    Test that a photo can be read right after it is created, even if its ID was looked up before
+    """
+    next_id = (session.query(func.max(Photo.id)).scalar() or 0) + 1
+    # the cache outlives the test database
+    with redis.Redis(host=settings.redis_host, port=settings.redis_port, password=settings.redis_password) as cache:
+        cache.delete(photo_cache.key(next_id))
+    response = client.get(f'http://localhost:8000/api/photos/photos/{next_id}')
+    assert response.status_code == 404, response.text
+
+    created = client.post("http://localhost:8000/api/photos/photos/?description=meadow&tags=green",
+                          headers={"Authorization": f"Bearer {token}"}, files={"file": "@Woda.jpeg;type=image/jpeg"})
+    assert created.status_code == 201, created.text
+    assert created.json()["id"] == next_id
+
+    response = client.get(f'http://localhost:8000/api/photos/photos/{next_id}')
+    assert response.status_code == 200, response.text
+    assert response.json()["description"] == "meadow"
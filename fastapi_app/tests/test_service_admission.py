@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from fastapi_app.src.services.admission import (
+    BULK, CRITICAL, NORMAL, AdmissionController, AdmissionMiddleware, GradientLimit, classify
+)
+
+
+def test_classify():
+    assert classify("POST", "/api/auth/login") == CRITICAL
+    assert classify("GET", "/api/photos/photos/12") == CRITICAL
+    assert classify("GET", "/api/users/me/") == NORMAL
+    assert classify("GET", "/api/search_filter/photos/search/tag/sea") == BULK
+    assert classify("POST", "/api/photos/photos/") == BULK
+    assert classify("GET", "/api/realtime/photos/1/events") is None
+
+
+def test_limit_shrinks_when_latency_rises():
+    limit = GradientLimit(20, 4, 200, tolerance=2.0)
+    for _ in range(50):
+        limit.update(0.01, inflight=20)
+    healthy = limit.limit
+    for _ in range(50):
+        limit.update(0.2, inflight=20)
+
+    assert healthy > 20
+    assert limit.limit < 10
+
+
+def test_idle_worker_does_not_grow_the_limit():
+    limit = GradientLimit(20, 4, 200, tolerance=2.0)
+    for _ in range(50):
+        limit.update(0.01, inflight=1)
+
+    assert limit.limit == 20
+
+
+@pytest.mark.asyncio
+async def test_priorities_when_the_limit_is_reached():
+    controller = AdmissionController(GradientLimit(4, 1, 10, tolerance=2.0), queue_size=10, queue_timeout=0.05)
+    assert all([await controller.acquire(CRITICAL) for _ in range(4)])
+
+    assert not await controller.acquire(BULK)
+    normal = asyncio.create_task(controller.acquire(NORMAL))
+    critical = asyncio.create_task(controller.acquire(CRITICAL))
+    await asyncio.sleep(0)
+    controller.release()
+
+    assert await critical
+    assert not await normal
+    assert controller.inflight == 4
+    assert controller.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_middleware_sheds_with_retry_after():
+    controller = AdmissionController(GradientLimit(1, 1, 1, tolerance=2.0), queue_size=0, queue_timeout=0)
+    await controller.acquire(CRITICAL)
+
+    async def app(scope, receive, send):
+        raise AssertionError("the request should have been shed")
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/api/users/me/", "headers": []}
+    await AdmissionMiddleware(app, controller)(scope, None, send)
+
+    assert messages[0]["status"] == 503
+    assert (b"retry-after", b"1") in messages[0]["headers"]
@@ -0,0 +1,89 @@
+import asyncio
+import uuid
+
+import pytest
+
+from fastapi_app.src.database.redis_db import close_redis
+from fastapi_app.src.services.cache import Cache
+
+
+@pytest.fixture
+def cache():
+    return Cache(f"test-{uuid.uuid4().hex}", ttl=60)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_load_once(cache):
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"id": 1}
+
+    results = await asyncio.gather(*(cache.get_or_load(1, loader) for _ in range(10)))
+
+    assert results == [{"id": 1}] * 10
+    assert calls == 1
+    await close_redis()
+
+
+@pytest.mark.asyncio
+async def test_missing_rows_are_cached(cache):
+    calls = 0
+
+    def loader():
+        nonlocal calls
+        calls += 1
+        raise FileNotFoundError("Photo with ID 1 not found")
+
+    for _ in range(2):
+        with pytest.raises(FileNotFoundError, match="Photo with ID 1 not found"):
+            await cache.get_or_load(1, loader, not_found=FileNotFoundError)
+
+    assert calls == 1
+    await close_redis()
+
+
+@pytest.mark.asyncio
+async def test_get_many_loads_the_misses_at_once(cache):
+    batches = []
+
+    def loader(identifiers):
+        batches.append(identifiers)
+        return {identifier: {"id": identifier} for identifier in identifiers if identifier != 3}
+
+    await cache.get_or_load(1, lambda: {"id": 1})
+    results = await cache.get_many([2, 1, 3, 2], loader, FileNotFoundError)
+
+    assert results[:2] == [{"id": 2}, {"id": 1}]
+    assert isinstance(results[2], FileNotFoundError)
+    assert results[3] == {"id": 2}
+    assert batches == [[2, 3]]
+    cache._l1.clear()
+    assert (await cache.get_many([3, 2], loader, FileNotFoundError))[1] == {"id": 2}
+    assert batches == [[2, 3]]
+    await close_redis()
+
+
+@pytest.mark.asyncio
+async def test_invalidate_reloads(cache):
+    versions = iter([{"version": 1}, {"version": 2}])
+
+    assert await cache.get_or_load(1, lambda: next(versions)) == {"version": 1}
+    assert await cache.get_or_load(1, lambda: next(versions)) == {"version": 1}
+    await cache.invalidate(1)
+    assert await cache.get_or_load(1, lambda: next(versions)) == {"version": 2}
+    await close_redis()
+
+
+@pytest.mark.asyncio
+async def test_decorated_read_keeps_uncached(cache):
+    @cache.cached(key=lambda photo_id: photo_id)
+    def read(photo_id):
+        return {"id": photo_id}
+
+    assert await read(7) == {"id": 7}
+    assert read.uncached(7) == {"id": 7}
+    await close_redis()
@@ -1,32 +1,63 @@
 import pytest
-from unittest.mock import patch, AsyncMock
-from pydantic import EmailStr
-from fastapi_mail import FastMail
-from fastapi_app.src.services.email import send_email
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from fastapi_app.src.services.auth import auth_service
+from fastapi_app.src.services.email import EmailTemplates, confirmation_email, render_message, render_messages
+
+
+def test_confirmation_email():
+    email = confirmation_email("test@example.com", "testuser", "http://localhost/")
+
+    assert email.recipient == "test@example.com"
+    assert email.subject == "Confirm your email"
+    assert email.template == "email_template.html"
+    assert email.context["host"] == "http://localhost/"
+    assert email.context["username"] == "testuser"
+    assert "token" in email.context
+
 
 @pytest.mark.asyncio
-@patch("fastapi_app.src.services.email.FastMail", spec=FastMail)
-async def test_send_email(mock_fastmail):
-    email = EmailStr("test@example.com")
-    username = "testuser"
-    host = "localhost"
-    
-    mock_send_message = AsyncMock()
-    mock_fastmail.return_value.send_message = mock_send_message
-    
-    await send_email(email, username, host)
-    
-    mock_send_message.assert_called_once()
-    call_args = mock_send_message.call_args
-    
-    assert call_args[1]['template_name'] == "email_template.html"
-    
-    message = call_args[0][0]
-    assert message.subject == "Confirm your email"
-    assert message.recipients == [email]
-    assert message.template_body["host"] == host
-    assert message.template_body["username"] == username
-    assert "token" in message.template_body
-
-if __name__ == "__main__":
-    pytest.main()
\ No newline at end of file
+async def test_render_message():
+    email = confirmation_email("test@example.com", "<testuser>", "http://localhost/")
+
+    message = render_message(email)
+
+    body = message.get_content()
+    assert message["To"] == "test@example.com"
+    assert message["Subject"] == "Confirm your email"
+    assert message.get_content_subtype() == "html"
+    assert "&lt;testuser&gt;" in body
+    assert f'http://localhost/api/auth/confirmed_email/{email.context["token"]}' in body
+    assert await auth_service.get_email_from_token(email.context["token"]) == "test@example.com"
+
+
+def test_renders_share_the_cached_template(tmp_path):
+    (tmp_path / "hello.html").write_text("<p>Hi {{ username }}, see {{ host }}items/{{ token }}</p>")
+    templates = EmailTemplates(tmp_path, {"hello.html": ("username", "token")}, cache_size=10)
+    jinja = Environment(loader=FileSystemLoader(tmp_path), autoescape=select_autoescape())
+
+    contexts = [{"host": "http://localhost/", "username": username, "token": token}
+                for username, token in (("<alice>", "a.b"), ("bob & co", "c.d"))]
+    rendered = templates.render_many([("hello.html", context) for context in contexts])
+
+    assert rendered == [jinja.get_template("hello.html").render(**context) for context in contexts]
+    assert len(templates._renders) == 1
+
+
+def test_slots_used_in_conditions_are_rendered_every_time(tmp_path):
+    (tmp_path / "hello.html").write_text("{% if admin %}Hi boss{% else %}Hi {{ username }}{% endif %}")
+    templates = EmailTemplates(tmp_path, {"hello.html": ("admin", "username")}, cache_size=10)
+
+    assert templates.render("hello.html", {"admin": True, "username": "alice"}) == "Hi boss"
+    assert templates.render("hello.html", {"admin": False, "username": "bob"}) == "Hi bob"
+    assert len(templates._renders) == 0
+
+
+def test_render_messages_keeps_the_order():
+    emails = [confirmation_email(f"user{number}@example.com", f"user{number}", "http://localhost/")
+              for number in range(3)]
+
+    messages = render_messages(emails)
+
+    assert [message["To"] for message in messages] == [email.recipient for email in emails]
+    assert [message.get_content() for message in messages] == [render_message(email).get_content() for email in emails]
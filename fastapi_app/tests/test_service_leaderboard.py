@@ -0,0 +1,95 @@
+import time
+
+import pytest
+import pytest_asyncio
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.models import Comment, Opinion, Photo, User
+from fastapi_app.src.database.redis_db import close_redis, get_redis
+from fastapi_app.src.services.leaderboard import TRENDING_EPOCH_KEY, TRENDING_KEY, Leaderboard
+
+
+@pytest_asyncio.fixture
+async def leaderboard():
+    board = Leaderboard()
+    await get_redis().delete(TRENDING_KEY, TRENDING_EPOCH_KEY, board.top_rated_key())
+    yield board
+    await get_redis().delete(TRENDING_KEY, TRENDING_EPOCH_KEY, board.top_rated_key())
+    await close_redis()
+
+
+@pytest.mark.asyncio
+async def test_only_new_votes_boost_trending(leaderboard):
+    photo = Photo(id=1, rating_sum=4, rating_count=1)
+    await leaderboard.record_vote(photo, new_vote=True)
+    [(_, boost)] = await leaderboard.trending(10)
+
+    photo.rating_sum = 2
+    await leaderboard.record_vote(photo, new_vote=False)
+    photo.rating_sum, photo.rating_count = 0, 0
+    await leaderboard.record_vote(photo, new_vote=False)
+
+    assert await leaderboard.trending(10) == [(1, boost)]
+    assert await leaderboard.top_rated(10) == []
+    assert boost == pytest.approx(settings.trending_vote_weight, rel=1e-3)
+
+
+def test_rating_score_needs_votes_to_beat_the_prior():
+    one_perfect_vote = Leaderboard.rating_score(5, 1)
+    many_good_votes = Leaderboard.rating_score(450, 100)
+
+    assert many_good_votes > one_perfect_vote > Leaderboard.rating_score(1, 1)
+    assert Leaderboard.rating_score(0, 0) == settings.rating_prior_mean
+
+
+@pytest.mark.asyncio
+async def test_later_events_weigh_more_until_compacted(leaderboard):
+    now = time.time()
+    await get_redis().set(TRENDING_EPOCH_KEY, now - leaderboard.half_life)
+    await leaderboard.record_comment(1)
+    await get_redis().zadd(TRENDING_KEY, {2: settings.leaderboard_min_score})
+    [(photo_id, score), _] = await leaderboard.trending(10)
+    assert photo_id == 1
+    assert score == pytest.approx(2 * settings.trending_comment_weight, rel=1e-3)
+
+    assert await leaderboard.compact() == 1
+
+    [(photo_id, score)] = await leaderboard.trending(10)
+    assert photo_id == 1
+    assert score == pytest.approx(settings.trending_comment_weight, rel=1e-3)
+    assert float(await get_redis().get(TRENDING_EPOCH_KEY)) == pytest.approx(now, abs=5)
+
+
+@pytest.mark.asyncio
+async def test_rebuild_collects_this_week_votes(leaderboard, session):
+    session.add_all([
+        User(id=901, username="leaderboard1", email="leaderboard1@example.com", password="secret"),
+        Photo(id=901, user_id=901, url="http://example.com/901.jpg", rating_sum=9, rating_count=2),
+        Opinion(vote=5, user_id=902, photo_id=901),
+        Opinion(vote=4, user_id=903, photo_id=901),
+        Comment(content="nice", user_id=902, photo_id=901),
+    ])
+    session.commit()
+
+    await leaderboard.rebuild(session)
+
+    assert await leaderboard.top_rated(10) == [(901, pytest.approx(Leaderboard.rating_score(9, 2)))]
+    [(photo_id, score)] = await leaderboard.trending(10)
+    assert photo_id == 901
+    assert score == pytest.approx(2 * settings.trending_vote_weight + settings.trending_comment_weight, rel=1e-3)
+
+
+@pytest.mark.asyncio
+async def test_rebuild_if_empty_skips_existing_leaderboards(leaderboard, monkeypatch):
+    rebuilt = []
+
+    async def rebuild(db):
+        rebuilt.append(db)
+
+    monkeypatch.setattr(leaderboard, "rebuild", rebuild)
+    await leaderboard.rebuild_if_empty()
+    assert len(rebuilt) == 1
+
+    await leaderboard.record_comment(1)
+    await leaderboard.rebuild_if_empty()
+    assert len(rebuilt) == 1
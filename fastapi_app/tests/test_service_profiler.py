@@ -0,0 +1,44 @@
+import time
+
+import pytest
+
+from fastapi_app.src.services.profiler import ProfilerBusy, SamplingProfiler, sign_request, verify_request
+
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+def test_sampling_profiler_collapses_stacks():
+    profiler = SamplingProfiler(0.001)
+    profiler.start()
+    try:
+        spin(0.2)
+    finally:
+        profiler.stop()
+
+    lines = profiler.collapsed().splitlines()
+    assert profiler.samples > 0
+    assert any(line.startswith("MainThread;") and "spin (" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_only_one_profiler_runs():
+    first, second = SamplingProfiler(), SamplingProfiler()
+    first.start()
+    try:
+        with pytest.raises(ProfilerBusy):
+            second.start()
+    finally:
+        first.stop()
+
+
+def test_profile_signature():
+    value = sign_request("get", "/api/search_filter/description", ttl=60)
+
+    assert verify_request("GET", "/api/search_filter/description", value)
+    assert not verify_request("GET", "/api/search_filter/tag", value)
+    assert not verify_request("POST", "/api/search_filter/description", value)
+    assert not verify_request("GET", "/api/search_filter/description", "1:" + value.split(":")[1])
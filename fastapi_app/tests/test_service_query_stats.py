@@ -0,0 +1,37 @@
+from fastapi_app.src.services.query_stats import QueryStats, fingerprint
+
+
+def test_fingerprint_replaces_values():
+    assert fingerprint("SELECT * FROM users WHERE email = 'a@b.c' AND id = 42") == \
+        "SELECT * FROM users WHERE email = ? AND id = ?"
+    assert fingerprint("SELECT * FROM photos WHERE id = %(id_1)s LIMIT %(param_1)s") == \
+        "SELECT * FROM photos WHERE id = ? LIMIT ?"
+
+
+def test_fingerprint_collapses_value_lists():
+    assert fingerprint("SELECT * FROM photos WHERE id IN (%(id_1_1)s, %(id_1_2)s, %(id_1_3)s)") == \
+        fingerprint("SELECT * FROM photos WHERE id IN (%(id_1_1)s)") == \
+        "SELECT * FROM photos WHERE id IN (...)"
+
+
+def test_top_orders_and_aggregates():
+    stats = QueryStats()
+    stats.record("SELECT 1 FROM photos WHERE id = 1", 0.002)
+    stats.record("SELECT 1 FROM photos WHERE id = 2", 0.004)
+    stats.record("SELECT 1 FROM users", 0.005)
+
+    by_total, by_max = stats.top(order_by="total"), stats.top(order_by="max")
+
+    assert by_total[0]["fingerprint"] == "SELECT ? FROM photos WHERE id = ?"
+    assert by_total[0]["count"] == 2
+    assert by_total[0]["mean_ms"] == 3.0
+    assert by_total[0]["route"] == "background"
+    assert by_max[0]["fingerprint"] == "SELECT ? FROM users"
+
+
+def test_entries_are_bounded():
+    stats = QueryStats(max_entries=1)
+    stats.record("SELECT 1 FROM photos", 0.001)
+    stats.record("SELECT 1 FROM users", 0.001)
+
+    assert {entry["fingerprint"] for entry in stats.top()} == {"SELECT ? FROM photos", "<other>"}
@@ -0,0 +1,64 @@
+import uuid
+
+import pytest
+import redis
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.database.redis_db import close_redis
+from fastapi_app.src.services.rate_limit import (
+    LocalBuckets, Rule, local_buckets, parse_rules, rate_limit_rules, take_token
+)
+
+
+def test_parse_rules():
+    assert parse_rules("login=5/60, upload=20/3600,") == {"login": Rule(5, 60.0), "upload": Rule(20, 3600.0)}
+
+
+def test_local_bucket_refuses_after_the_burst_and_refills():
+    buckets, rule = LocalBuckets(max_size=10), Rule(2, 1)
+
+    assert [buckets.take("key", rule, 0).allowed for _ in range(3)] == [True, True, False]
+    refused = buckets.take("key", rule, 0)
+    assert refused.retry_after_ms == 500
+    assert buckets.take("key", rule, 500).allowed
+
+
+def test_local_buckets_drop_the_least_recently_used():
+    buckets, rule = LocalBuckets(max_size=2), Rule(1, 60)
+    buckets.take("first", rule, 0)
+    buckets.take("second", rule, 0)
+    buckets.take("third", rule, 0)
+
+    assert buckets.take("first", rule, 0).allowed
+
+
+@pytest.mark.asyncio
+async def test_shared_bucket_limits_across_workers():
+    identity, rule = f"ip:{uuid.uuid4().hex}", Rule(3, 60)
+
+    decisions = []
+    for _ in range(4):
+        decisions.append(await take_token("test", identity, rule))
+        # Another worker would not have seen the previous requests.
+        local_buckets._buckets.clear()
+
+    assert [decision.allowed for decision in decisions] == [True, True, True, False]
+    assert [decision.remaining for decision in decisions] == [2, 1, 0, 0]
+    assert decisions[-1].retry_after_ms > 0
+    await close_redis()
+
+
+def test_refused_login_carries_the_rate_limit_headers(client, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_enabled", True)
+    monkeypatch.setitem(rate_limit_rules, "login", Rule(2, 60))
+    local_buckets._buckets.clear()
+    with redis.Redis(host=settings.redis_host, port=settings.redis_port, password=settings.redis_password) as shared:
+        shared.delete("ratelimit:login:ip:testclient")
+
+    responses = [client.post("/api/auth/login", data={"username": "nobody@example.com", "password": "wrong"})
+                 for _ in range(3)]
+
+    assert [response.status_code for response in responses] == [401, 401, 429]
+    assert [response.headers["RateLimit-Remaining"] for response in responses] == ["1", "0", "0"]
+    assert responses[0].headers["RateLimit-Policy"] == "2;w=60"
+    assert "Retry-After" in responses[2].headers
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from fastapi_app.src.services.related_tags import RelatedTags
+
+
+@pytest.fixture
+def related(tmp_path):
+    return RelatedTags(str(tmp_path / "related_tags.npz"), refresh_seconds=1, batch_size=100, min_count=1,
+                       cache_size=100)
+
+
+def test_pairs_always_used_together_score_one(related):
+    related.apply(3, [(1, 1, "Sunset"), (1, 2, "beach"), (2, 1, "Sunset"), (2, 2, "beach"), (3, 3, "dog")])
+
+    assert related.suggest(["sunset"], 5) == [{"name": "beach", "score": 1.0, "count": 2}]
+    assert related.suggest(["dog"], 5) == []
+    assert related.suggest(["unknown"], 5) == []
+    assert related.last_photo_id == 3
+
+
+def test_snapshot_and_new_photos_add_up(related):
+    # Tags 1, 2 and 3 on photos {1, 2}, {1, 2}, {1, 3} and {3}.
+    np.savez(related.path, ids=np.array([1, 2, 3]), names=np.array(["sunset", "beach", "sea"]),
+             counts=np.array([3, 2, 2]), indptr=np.array([0, 2, 3, 4]), indices=np.array([1, 2, 0, 0]),
+             data=np.array([2, 1, 2, 1], dtype=np.int32), meta=np.array([4, 4]))
+    related._load(related._read_snapshot(), 0)
+    assert [tag["name"] for tag in related.suggest(["sunset"], 5)] == ["beach"]
+
+    related.apply(6, [(5, 1, "sunset"), (5, 3, "sea"), (6, 1, "sunset"), (6, 3, "sea"), (6, 4, "Waves")])
+
+    assert related.photos == 6
+    # Sea is on a smaller share of the photos of sunset than of all the photos, it is not related.
+    assert [tag["name"] for tag in related.suggest(["sunset"], 5)] == ["beach", "Waves"]
+    assert related.suggest(["SEA", "sunset"], 1)[0]["name"] == "Waves"
@@ -0,0 +1,81 @@
+import json
+import uuid
+
+import pytest
+
+from fastapi_app.src.database.redis_db import close_redis, get_redis
+from fastapi_app.src.services.search_cache import (
+    SearchCache, description_dependency, like_matches, photo_dependency, tag_dependency
+)
+
+
+def test_like_matches_honors_wildcards():
+    assert like_matches("sun", "red sunset")
+    assert not like_matches("sun", "red moon")
+    assert like_matches("s_n%t", "red sunset")
+    assert not like_matches("s_n", "red moon")
+
+
+@pytest.mark.asyncio
+async def test_invalidation_only_affects_dependent_pages():
+    cache = SearchCache()
+    first, second = {"query": uuid.uuid4().hex}, {"query": uuid.uuid4().hex}
+    photo, tag = photo_dependency(uuid.uuid4().int), tag_dependency(uuid.uuid4().int)
+    await cache.set("tag", first, [{"id": 1}], [photo, tag], (await cache.get("tag", first)).generation)
+    await cache.set("tag", second, [{"id": 2}], [photo_dependency(uuid.uuid4().int)],
+                    (await cache.get("tag", second)).generation)
+
+    assert json.loads((await cache.get("tag", first)).page.body) == [{"id": 1}]
+    await cache.invalidate(tag)
+
+    assert (await cache.get("tag", first)).page is None
+    assert json.loads((await cache.get("tag", second)).page.body) == [{"id": 2}]
+    await close_redis()
+
+
+@pytest.mark.asyncio
+async def test_etag_changes_with_the_dependencies():
+    cache = SearchCache()
+    params, photo = {"query": uuid.uuid4().hex}, photo_dependency(uuid.uuid4().int)
+    stored = await cache.set("tag", params, [{"id": 1}], [photo], (await cache.get("tag", params)).generation)
+
+    assert stored.etag is not None
+    assert (await cache.get("tag", params)).page.etag == stored.etag
+    await cache.invalidate(photo)
+    generation = (await cache.get("tag", params)).generation
+    assert (await cache.set("tag", params, [{"id": 1}], [photo], generation)).etag != stored.etag
+    await close_redis()
+
+
+@pytest.mark.asyncio
+async def test_new_description_invalidates_matching_queries():
+    cache = SearchCache()
+    word = uuid.uuid4().hex
+    params = {"description": word}
+    await cache.track_description_query(word)
+    await cache.set("description", params, [{"id": 1}], [description_dependency(word)],
+                    (await cache.get("description", params)).generation)
+
+    await cache.invalidate_description("unrelated words")
+    assert json.loads((await cache.get("description", params)).page.body) == [{"id": 1}]
+    await cache.invalidate_description(f"A photo of {word.upper()}")
+    assert (await cache.get("description", params)).page is None
+    await close_redis()
+
+
+@pytest.mark.asyncio
+async def test_page_computed_during_a_write_is_stored_briefly():
+    cache = SearchCache()
+    params, photo = {"query": uuid.uuid4().hex}, photo_dependency(uuid.uuid4().int)
+    settled = await cache.set("tag", params, [{"id": 1}], [photo], (await cache.get("tag", params)).generation)
+    await get_redis().delete(cache.key("tag", params))
+    lookup = await cache.get("tag", params)
+    # committed while the query ran, the page may not include it
+    await cache.invalidate(photo_dependency(uuid.uuid4().int))
+
+    stored = await cache.set("tag", params, [{"id": 2}], [photo], lookup.generation)
+    assert json.loads(stored.body) == [{"id": 2}]
+    assert stored.etag not in (None, settled.etag)
+    assert (await cache.get("tag", params)).page == stored
+    assert 0 < await get_redis().ttl(cache.key("tag", params)) <= cache.race_ttl
+    await close_redis()
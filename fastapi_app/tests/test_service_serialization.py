@@ -0,0 +1,50 @@
+import json
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+
+from fastapi_app.src.database.models import Photo, Tag
+from fastapi_app.src.schemas import DescriptionSearch, TagSearch
+from fastapi_app.src.services.serialization import accepts_ndjson, dumps, ndjson, project
+
+
+def make_photos():
+    tags = [Tag(id=1, name="sea", user_id=1), Tag(id=2, name="sunset", user_id=2)]
+    return [
+        Photo(id=1, user_id=1, url="uploads/1.jpg", description="red sunset", tags=tags,
+              created_at=datetime(2024, 7, 28, 22, 40, 48, 533017), updated_at=None, rating=4.5,
+              rating_count=2, comment_count=1),
+        Photo(id=2, user_id=2, url="uploads/2.jpg", description="calm sea", tags=[],
+              created_at=datetime(2024, 7, 29), updated_at=datetime(2024, 7, 30, 8, 0), rating=0.0,
+              rating_count=0, comment_count=0),
+    ]
+
+
+def test_projection_matches_validated_encoding():
+    photos = make_photos()
+    for model in (TagSearch, DescriptionSearch):
+        validated = jsonable_encoder([model.from_orm(photo) for photo in photos])
+
+        assert json.loads(dumps(project(photos, model))) == validated
+
+
+def test_dumps_falls_back_to_jsonable_encoder():
+    photo = TagSearch.from_orm(make_photos()[1])
+
+    assert json.loads(dumps({"photo": photo})) == {"photo": jsonable_encoder(photo)}
+
+
+def test_ndjson_writes_one_chunk_per_batch():
+    photos = make_photos()
+
+    chunks = list(ndjson([photos[:1], photos[1:]], TagSearch))
+
+    assert len(chunks) == 2
+    assert [json.loads(line) for line in b"".join(chunks).splitlines()] == json.loads(dumps(project(photos, TagSearch)))
+
+
+def test_accepts_ndjson():
+    assert accepts_ndjson("application/x-ndjson")
+    assert accepts_ndjson("application/json;q=0.5, application/x-ndjson;q=1")
+    assert not accepts_ndjson("application/json")
+    assert not accepts_ndjson(None)
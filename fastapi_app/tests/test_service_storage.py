@@ -0,0 +1,54 @@
+import os
+from io import BytesIO
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from fastapi_app.src.conf.config import settings
+from fastapi_app.src.services import storage
+from fastapi_app.src.services.storage import process_avatar, save_avatar
+
+
+def image_bytes(size, mode="RGB", image_format="JPEG", color="red"):
+    out = BytesIO()
+    Image.new(mode, size, color).save(out, image_format)
+    return out.getvalue()
+
+
+def test_process_avatar_crops_to_a_webp_square():
+    for data in (image_bytes((4000, 3000)), image_bytes((300, 900), "RGBA", "PNG")):
+        avatar = Image.open(BytesIO(process_avatar(data)))
+
+        assert avatar.format == "WEBP"
+        assert avatar.size == (250, 250)
+
+
+def test_process_avatar_rejects_other_files():
+    with pytest.raises(ValueError):
+        process_avatar(b"not an image")
+    with pytest.raises(ValueError):
+        process_avatar(image_bytes((1000, 1000))[:2000])
+
+
+@pytest.mark.asyncio
+async def test_save_avatar_replaces_the_previous_one(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "AVATAR_DIR", str(tmp_path))
+
+    first = await save_avatar(UploadFile(filename="a.jpg", file=BytesIO(image_bytes((500, 400)))), 7)
+    second = await save_avatar(UploadFile(filename="b.png", file=BytesIO(image_bytes((400, 500), "RGB", "PNG", "blue"))), 7)
+
+    assert first != second
+    assert os.listdir(tmp_path) == [os.path.basename(second)]
+
+
+@pytest.mark.asyncio
+async def test_save_avatar_refuses_large_uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "AVATAR_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "avatar_max_bytes", 1000)
+
+    with pytest.raises(HTTPException) as err:
+        await save_avatar(UploadFile(filename="a.jpg", file=BytesIO(image_bytes((1000, 1000)))), 7)
+
+    assert err.value.status_code == 413
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from fastapi_app.src.services.tag_index import TagIndex
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = tmp_path / "tags.json"
+    tags = [["beach", 3], ["sea", 1], ["Summer", 9], ["sun", 9], ["Sunset", 5]]
+    path.write_text(json.dumps({"generation": 1, "tags": tags}))
+    return str(path)
+
+
+@pytest.mark.asyncio
+async def test_suggest_ranks_by_usage(snapshot):
+    index = TagIndex(snapshot, refresh_seconds=1, rebuild_seconds=3600, cache_size=100)
+    await index.refresh()
+
+    assert index.suggest("SU", 2) == [{"name": "Summer", "count": 9}, {"name": "sun", "count": 9}]
+    assert [tag["name"] for tag in index.suggest("s", 10)] == ["Summer", "sun", "Sunset", "sea"]
+    assert index.suggest("x", 10) == []
+
+
+@pytest.mark.asyncio
+async def test_recorded_counts_reach_other_workers(snapshot):
+    first = TagIndex(snapshot, refresh_seconds=1, rebuild_seconds=3600, cache_size=100)
+    second = TagIndex(snapshot, refresh_seconds=1, rebuild_seconds=3600, cache_size=100)
+    await first.refresh()
+    await second.refresh()
+    assert second.suggest("sun", 1) == [{"name": "sun", "count": 9}]
+
+    first.record({"sun": -8, "Surf": 2})
+    await second.refresh()
+
+    for index in (first, second):
+        assert index.suggest("su", 10) == [
+            {"name": "Summer", "count": 9},
+            {"name": "Sunset", "count": 5},
+            {"name": "Surf", "count": 2},
+            {"name": "sun", "count": 1},
+        ]
@@ -0,0 +1,18 @@
+import pytest
+
+from fastapi_app.src.services.tag_query import TagQueryError, parse, tag_names
+
+
+def test_parse_precedence():
+    assert parse("sunset AND beach NOT people", 10) == (
+        "and", [("tag", "sunset"), ("tag", "beach"), ("not", ("tag", "people"))]
+    )
+    assert parse("a OR B c", 10) == ("or", [("tag", "a"), ("and", [("tag", "b"), ("tag", "c")])])
+    assert parse("NOT (a OR b)", 10) == ("not", ("or", [("tag", "a"), ("tag", "b")]))
+    assert tag_names(parse("a NOT (b OR c)", 10)) == {"a", "b", "c"}
+
+
+@pytest.mark.parametrize("query", ["", "a AND", "(a", "a )", "OR a", "a b c d"])
+def test_parse_rejects_malformed_queries(query):
+    with pytest.raises(TagQueryError):
+        parse(query, 3)